@@ -2,17 +2,28 @@ NETWORK_CONFIG = {
     'sepolia': {
         'chain_id': 11155111,
         'rpc_url': 'https://sepolia.infura.io/v3/',
+        'rpc_urls': [
+            'https://sepolia.infura.io/v3/',
+            'https://rpc.sepolia.org',
+        ],
         'block_explorer': 'https://sepolia.etherscan.io',
         'network_name': 'Sepolia',
         'currency_symbol': 'SEP',
-        'network_type': 'testnet'
+        'network_type': 'testnet',
+        # בלוקים אחרונים שעדיין עלולים להתבטל, האינדקס לא קורא אותם
+        'confirmations': 5
     },
     'local': {
         'chain_id': 1337,
         'rpc_url': 'http://127.0.0.1:7545',
+        # 8545 is usually a different local chain, not a replica of 7545
+        'rpc_urls': [
+            'http://127.0.0.1:7545',
+        ],
         'network_name': 'Local Network',
         'currency_symbol': 'ETH',
-        'network_type': 'local'
+        'network_type': 'local',
+        'confirmations': 0
     }
 }
 
@@ -21,4 +32,12 @@ def get_network_config(network_name='sepolia'):
     config = NETWORK_CONFIG.get(network_name)
     if not config:
         raise ValueError(f"Unsupported network: {network_name}")
-    return config
\ No newline at end of file
+    return config
+
+
+def network_for_chain(chain_id):
+    """שם הרשת המוגדרת עם ה-chainId הזה, או chain-<id> לרשת שאינה מוגדרת"""
+    for network_name, config in NETWORK_CONFIG.items():
+        if config['chain_id'] == chain_id:
+            return network_name
+    return f"chain-{chain_id}"
@@ -2,33 +2,43 @@
 pragma solidity ^0.8.0;
 
 contract MedicalRegistry {
+    // Fixed size fields share the last slot: registrationDate and both flags
     struct Doctor {
         string name;
         string specialization;
         string licenseNumber;
+        string email;
+        address[] patientList;
+        uint64 registrationDate;
         bool isRegistered;
         bool isApproved;
-        mapping(address => bool) patients;
-        address[] patientList;
-        uint256 patientCount;
-        string email;
-        uint256 registrationDate;
     }
     
+    // doctorAddress, registrationDate and age share one slot;
+    // a patient exists once doctorAddress is set.
+    // Patients registered by record hash keep name, medicalId and age off chain,
+    // recordHash is keccak256 of their encrypted record
     struct Patient {
         string name;
-        uint256 age;
-        bool exists;
         string medicalId;
         address doctorAddress;
-        uint256 registrationDate;
+        uint64 registrationDate;
+        uint8 age;
+        bytes32 recordHash;
     }
     
+    uint256 public constant MAX_PAGE_SIZE = 500;
+    // Batch bounds keep a full batch well under the block gas limit
+    uint256 public constant MAX_PATIENT_BATCH = 50;
+    uint256 public constant MAX_APPROVAL_BATCH = 200;
+    uint256 public constant MAX_RECORD_BATCH = 100;
+    
     address public admin;
     mapping(address => Doctor) public doctors;
     mapping(address => Patient) public patients;
-    mapping(string => bool) public usedLicenseNumbers;
-    mapping(string => bool) public usedEmails;
+    // Keyed by keccak256 of the license number / email
+    mapping(bytes32 => bool) public usedLicenseNumbers;
+    mapping(bytes32 => bool) public usedEmails;
     address[] public doctorAddresses;
     
     event DoctorRegistered(address indexed doctorAddress, string name);
@@ -58,28 +68,40 @@ contract MedicalRegistry {
         string memory _licenseNumber,
         string memory _email
     ) public onlyAdmin {
+        bytes32 licenseKey = keccak256(bytes(_licenseNumber));
+        bytes32 emailKey = keccak256(bytes(_email));
+        
         require(!doctors[_doctorAddress].isRegistered, "Doctor already registered");
-        require(!usedLicenseNumbers[_licenseNumber], "License number already in use");
-        require(!usedEmails[_email], "Email already in use");
+        require(!usedLicenseNumbers[licenseKey], "License number already in use");
+        require(!usedEmails[emailKey], "Email already in use");
         
         Doctor storage newDoctor = doctors[_doctorAddress];
         newDoctor.name = _name;
         newDoctor.specialization = _specialization;
         newDoctor.licenseNumber = _licenseNumber;
         newDoctor.email = _email;
+        newDoctor.registrationDate = uint64(block.timestamp);
         newDoctor.isRegistered = true;
-        newDoctor.isApproved = false;
-        newDoctor.patientCount = 0;
-        newDoctor.registrationDate = block.timestamp;
         
-        usedLicenseNumbers[_licenseNumber] = true;
-        usedEmails[_email] = true;
+        usedLicenseNumbers[licenseKey] = true;
+        usedEmails[emailKey] = true;
         doctorAddresses.push(_doctorAddress);
         
         emit DoctorRegistered(_doctorAddress, _name);
     }
     
     function approveDoctor(address _doctorAddress) public onlyAdmin {
+        _approveDoctor(_doctorAddress);
+    }
+    
+    function approveDoctors(address[] calldata _doctorAddresses) external onlyAdmin {
+        require(_doctorAddresses.length <= MAX_APPROVAL_BATCH, "Batch too large");
+        for (uint256 i = 0; i < _doctorAddresses.length; i++) {
+            _approveDoctor(_doctorAddresses[i]);
+        }
+    }
+    
+    function _approveDoctor(address _doctorAddress) internal {
         require(doctors[_doctorAddress].isRegistered, "Doctor not registered");
         require(!doctors[_doctorAddress].isApproved, "Doctor already approved");
         
@@ -93,24 +115,84 @@ contract MedicalRegistry {
         uint256 _age,
         string memory _medicalId
     ) public onlyRegisteredAndApproved {
-        require(!patients[_patientAddress].exists, "Patient already registered");
+        _registerPatient(_patientAddress, _name, _age, _medicalId);
+    }
+    
+    function registerPatients(
+        address[] calldata _patientAddresses,
+        string[] calldata _names,
+        uint256[] calldata _ages,
+        string[] calldata _medicalIds
+    ) external onlyRegisteredAndApproved {
+        uint256 count = _patientAddresses.length;
+        require(count <= MAX_PATIENT_BATCH, "Batch too large");
+        require(_names.length == count && _ages.length == count && _medicalIds.length == count,
+                "Array lengths do not match");
+        
+        for (uint256 i = 0; i < count; i++) {
+            _registerPatient(_patientAddresses[i], _names[i], _ages[i], _medicalIds[i]);
+        }
+    }
+    
+    function _registerPatient(
+        address _patientAddress,
+        string memory _name,
+        uint256 _age,
+        string memory _medicalId
+    ) internal {
+        require(patients[_patientAddress].doctorAddress == address(0), "Patient already registered");
+        // Stored as uint8: ages above 255 revert. Deployments made before the
+        // storage packing accepted any uint256 age.
+        require(_age <= type(uint8).max, "Age out of range");
         
         patients[_patientAddress] = Patient({
             name: _name,
-            age: _age,
-            exists: true,
             medicalId: _medicalId,
             doctorAddress: msg.sender,
-            registrationDate: block.timestamp
+            registrationDate: uint64(block.timestamp),
+            age: uint8(_age),
+            recordHash: bytes32(0)
         });
         
-        doctors[msg.sender].patients[_patientAddress] = true;
         doctors[msg.sender].patientList.push(_patientAddress);
-        doctors[msg.sender].patientCount++;
         
         emit PatientRegistered(_patientAddress, _name, msg.sender);
     }
     
+    function registerPatientRecord(address _patientAddress, bytes32 _recordHash) 
+        public onlyRegisteredAndApproved 
+    {
+        _registerPatientRecord(_patientAddress, _recordHash);
+    }
+    
+    function registerPatientRecords(
+        address[] calldata _patientAddresses,
+        bytes32[] calldata _recordHashes
+    ) external onlyRegisteredAndApproved {
+        uint256 count = _patientAddresses.length;
+        require(count <= MAX_RECORD_BATCH, "Batch too large");
+        require(_recordHashes.length == count, "Array lengths do not match");
+        
+        for (uint256 i = 0; i < count; i++) {
+            _registerPatientRecord(_patientAddresses[i], _recordHashes[i]);
+        }
+    }
+    
+    function _registerPatientRecord(address _patientAddress, bytes32 _recordHash) internal {
+        require(patients[_patientAddress].doctorAddress == address(0), "Patient already registered");
+        require(_recordHash != bytes32(0), "Record hash required");
+        
+        // Two storage slots per patient, nothing personal on chain
+        Patient storage patient = patients[_patientAddress];
+        patient.doctorAddress = msg.sender;
+        patient.registrationDate = uint64(block.timestamp);
+        patient.recordHash = _recordHash;
+        
+        doctors[msg.sender].patientList.push(_patientAddress);
+        
+        emit PatientRegistered(_patientAddress, "", msg.sender);
+    }
+    
     function getDoctorPatients(address _doctorAddress) public view returns (address[] memory) {
         require(msg.sender == admin || msg.sender == _doctorAddress, 
                 "Only admin or the doctor can view their patients");
@@ -121,6 +203,82 @@ contract MedicalRegistry {
         return doctorAddresses;
     }
     
+    function getDoctorCount() public view returns (uint256) {
+        return doctorAddresses.length;
+    }
+    
+    function getDoctorPatientCount(address _doctorAddress) public view returns (uint256) {
+        require(msg.sender == admin || msg.sender == _doctorAddress, 
+                "Only admin or the doctor can view their patients");
+        return doctors[_doctorAddress].patientList.length;
+    }
+    
+    function _pageBounds(uint256 _total, uint256 _offset, uint256 _limit) 
+        internal pure returns (uint256 start, uint256 count) 
+    {
+        require(_limit <= MAX_PAGE_SIZE, "Page size too large");
+        start = _offset < _total ? _offset : _total;
+        count = _total - start < _limit ? _total - start : _limit;
+    }
+    
+    function getDoctorsPage(uint256 _offset, uint256 _limit) public view returns (
+        address[] memory addresses,
+        string[] memory names,
+        string[] memory specializations,
+        string[] memory licenseNumbers,
+        bool[] memory approved
+    ) {
+        (uint256 start, uint256 count) = _pageBounds(doctorAddresses.length, _offset, _limit);
+        
+        addresses = new address[](count);
+        names = new string[](count);
+        specializations = new string[](count);
+        licenseNumbers = new string[](count);
+        approved = new bool[](count);
+        
+        for (uint256 i = 0; i < count; i++) {
+            Doctor storage doctor = doctors[doctorAddresses[start + i]];
+            addresses[i] = doctorAddresses[start + i];
+            names[i] = doctor.name;
+            specializations[i] = doctor.specialization;
+            licenseNumbers[i] = doctor.licenseNumber;
+            approved[i] = doctor.isApproved;
+        }
+    }
+    
+    function getPatientsPage(address _doctorAddress, uint256 _offset, uint256 _limit) 
+        public view returns (
+            address[] memory addresses,
+            string[] memory names,
+            uint256[] memory ages,
+            string[] memory medicalIds,
+            uint256[] memory registrationDates
+        ) 
+    {
+        require(msg.sender == admin || msg.sender == _doctorAddress, 
+                "Only admin or the doctor can view their patients");
+        
+        address[] storage patientList = doctors[_doctorAddress].patientList;
+        // The bounds overwrite _offset and _limit: with five return arrays,
+        // separate start and count locals leave the stack too deep
+        (_offset, _limit) = _pageBounds(patientList.length, _offset, _limit);
+        
+        addresses = new address[](_limit);
+        names = new string[](_limit);
+        ages = new uint256[](_limit);
+        medicalIds = new string[](_limit);
+        registrationDates = new uint256[](_limit);
+        
+        for (uint256 i = 0; i < _limit; i++) {
+            Patient storage patient = patients[patientList[_offset + i]];
+            addresses[i] = patientList[_offset + i];
+            names[i] = patient.name;
+            ages[i] = patient.age;
+            medicalIds[i] = patient.medicalId;
+            registrationDates[i] = patient.registrationDate;
+        }
+    }
+    
     function getDoctorDetails(address _doctorAddress) public view returns (
         string memory name,
         string memory specialization,
@@ -138,7 +296,7 @@ contract MedicalRegistry {
             doctor.licenseNumber,
             doctor.isRegistered,
             doctor.isApproved,
-            doctor.patientCount,
+            doctor.patientList.length,
             doctor.email,
             doctor.registrationDate
         );
@@ -149,7 +307,8 @@ contract MedicalRegistry {
         uint256 age,
         string memory medicalId,
         address doctorAddress,
-        uint256 registrationDate
+        uint256 registrationDate,
+        bytes32 recordHash
     ) {
         require(msg.sender == admin || 
                 msg.sender == patients[_patientAddress].doctorAddress,
@@ -161,7 +320,8 @@ contract MedicalRegistry {
             patient.age,
             patient.medicalId,
             patient.doctorAddress,
-            patient.registrationDate
+            patient.registrationDate,
+            patient.recordHash
         );
     }
 }
\ No newline at end of file
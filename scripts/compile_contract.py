@@ -1,48 +1,135 @@
+import argparse
+import hashlib
 import json
 import os
-from solcx import compile_standard, install_solc
+from solcx import compile_standard, get_installed_solc_versions, install_solc
 from pathlib import Path
 
-def compile_contract():
-    # התקנת גרסת solc
-    install_solc('0.8.0')
-    
+from src.artifacts import source_hash
+
+SOLC_VERSION = '0.8.0'
+
+# רק מה שהפריסה, הממשק והבדיקות קוראים בפועל
+OUTPUT_SELECTION = ["abi", "evm.bytecode.object", "evm.deployedBytecode.object"]
+
+DEFAULT_OPTIMIZER_RUNS = 200
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+CONTRACT_PATH = ROOT_DIR / "contracts" / "MedicalRegistry.sol"
+
+BUILD_DIR = ROOT_DIR / "build"
+# מפתח הקומפילציה האחרונה שנכתבה ל-build
+CACHE_PATH = BUILD_DIR / "compile_cache.json"
+
+# תוצרים שנשמרים במאגר, משמשים כשאין build (ורשת הבדיקה בלי solc)
+BUNDLED_ARTIFACT_PATH = ROOT_DIR / "src" / "MedicalRegistry.json"
+BUNDLED_ABI_PATHS = [ROOT_DIR / "contracts" / "contract_abi.json", ROOT_DIR / "src" / "contract_abi.json"]
+
+
+def compile_settings(optimizer_runs=DEFAULT_OPTIMIZER_RUNS):
+    """הגדרות solc: אופטימייזר פעיל ופלט מצומצם"""
+    return {
+        "optimizer": {"enabled": optimizer_runs > 0, "runs": max(optimizer_runs, 1)},
+        "outputSelection": {"*": {"*": OUTPUT_SELECTION}},
+    }
+
+
+def cache_key(source, settings, solc_version=SOLC_VERSION):
+    """גיבוב של הקוד, גרסת הקומפיילר וההגדרות"""
+    data = json.dumps(
+        {"source": source, "solc": solc_version, "settings": settings},
+        sort_keys=True
+    )
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def load_cached(key):
+    """החזרת תוצר הקומפילציה השמור אם המפתח זהה, אחרת None"""
+    artifact_path = BUILD_DIR / "MedicalRegistry.json"
+    try:
+        with open(CACHE_PATH, "r") as file:
+            if json.load(file).get("key") != key:
+                return None
+        with open(artifact_path, "r") as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_bundled(compiled_sol, source):
+    """עדכון התוצרים שבמאגר, יש להריץ ולשמור אותם בכל שינוי בחוזה.
+
+    גיבוב המקור נשמר ב-artifact, כך שהבדיקות מזהות artifact ישן גם בלי solc.
+    """
+    with open(BUNDLED_ARTIFACT_PATH, "w") as file:
+        json.dump(dict(compiled_sol, sourceHash=source_hash(source)), file, indent=4)
+    for abi_path in BUNDLED_ABI_PATHS:
+        with open(abi_path, "w") as file:
+            json.dump(compiled_sol["contracts"]["MedicalRegistry.sol"]["MedicalRegistry"]["abi"], file,
+                      separators=(",", ":"))
+    print(f"Updated {BUNDLED_ARTIFACT_PATH} and {', '.join(str(path) for path in BUNDLED_ABI_PATHS)}")
+
+
+def compile_contract(optimizer_runs=DEFAULT_OPTIMIZER_RUNS, force=False, bundle=False):
     # קריאת קובץ החוזה
-    contract_path = Path("contracts/MedicalRegistry.sol")
-    with open(contract_path, "r", encoding="utf-8") as file:
+    with open(CONTRACT_PATH, "r", encoding="utf-8") as file:
         contract_source = file.read()
 
+    settings = compile_settings(optimizer_runs)
+    key = cache_key(contract_source, settings)
+
+    # קלט זהה - אין צורך להריץ את הקומפיילר
+    if not force:
+        compiled_sol = load_cached(key)
+        if compiled_sol is not None:
+            print("Contract unchanged, using cached build")
+            if bundle:
+                write_bundled(compiled_sol, contract_source)
+            return compiled_sol
+
+    # התקנת גרסת solc רק אם חסרה
+    if SOLC_VERSION not in [str(version) for version in get_installed_solc_versions()]:
+        install_solc(SOLC_VERSION)
+
     # קומפילציה
     compiled_sol = compile_standard(
         {
             "language": "Solidity",
             "sources": {"MedicalRegistry.sol": {"content": contract_source}},
-            "settings": {
-                "outputSelection": {
-                    "*": {
-                        "*": ["abi", "metadata", "evm.bytecode", "evm.sourceMap"]
-                    }
-                }
-            },
+            "settings": settings,
         },
-        solc_version="0.8.0",
+        solc_version=SOLC_VERSION,
     )
 
     # יצירת תיקיית build אם לא קיימת
-    build_dir = Path("build")
-    build_dir.mkdir(exist_ok=True)
+    BUILD_DIR.mkdir(exist_ok=True)
 
-    # שמירת התוצאות
-    with open(build_dir / "MedicalRegistry.json", "w") as file:
-        json.dump(compiled_sol, file, indent=4)
+    # שמירת התוצאות בפורמט מצומצם
+    with open(BUILD_DIR / "MedicalRegistry.json", "w") as file:
+        json.dump(compiled_sol, file, separators=(",", ":"))
 
     # שמירת ה-ABI בנפרד
     contract_abi = compiled_sol["contracts"]["MedicalRegistry.sol"]["MedicalRegistry"]["abi"]
-    with open(build_dir / "contract_abi.json", "w") as file:
-        json.dump(contract_abi, file, indent=4)
+    with open(BUILD_DIR / "contract_abi.json", "w") as file:
+        json.dump(contract_abi, file, separators=(",", ":"))
+
+    # המפתח נכתב אחרון, כך שבנייה שנקטעה באמצע לא תיחשב תקינה
+    with open(CACHE_PATH, "w") as file:
+        json.dump({"key": key, "solc": SOLC_VERSION, "settings": settings}, file)
 
     print("Contract compiled successfully!")
+    if bundle:
+        write_bundled(compiled_sol, contract_source)
     return compiled_sol
 
 if __name__ == "__main__":
-    compile_contract()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="קומפילציית MedicalRegistry עם מטמון")
+    parser.add_argument('--runs', type=int,
+                        default=int(os.getenv('SOLC_OPTIMIZER_RUNS', DEFAULT_OPTIMIZER_RUNS)),
+                        help="ערך runs לאופטימייזר (0 מבטל אותו)")
+    parser.add_argument('--force', action='store_true', help="קומפילציה גם אם לא היה שינוי")
+    parser.add_argument('--bundle', action='store_true',
+                        help="עדכון src/MedicalRegistry.json וקובצי ה-ABI שבמאגר")
+    args = parser.parse_args()
+
+    compile_contract(args.runs, args.force, args.bundle)
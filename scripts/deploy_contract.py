@@ -1,103 +1,196 @@
-from web3 import Web3
-from eth_account import Account
-import json
+import argparse
 import os
+from datetime import datetime, timezone
 from dotenv import load_dotenv
-from pathlib import Path
-import time
+from web3 import Web3
+
+from config.network_config import NETWORK_CONFIG
+from src.artifacts import get_artifact, read_deployment, write_deployment
+from src.registry_service import admin_address
+from src.registry_writer import GAS_BUFFER
+from src.rpc_batch import send_batch, BatchCallError
+from src.rpc_provider import connect_network
+from src.tx_sender import (
+    TransactionSender, fees_from_history, quantity,
+    FEE_HISTORY_BLOCKS, FEE_PERCENTILES, DEFAULT_PERCENTILE_INDEX
+)
+
+DEFAULT_NETWORK = 'sepolia'
+
+
+def code_hash(code):
+    """גיבוב keccak של bytecode, כפי שמגיע מהצומת או מה-artifact"""
+    return Web3.to_hex(Web3.keccak(hexstr=code if isinstance(code, str) else Web3.to_hex(code)))
+
+
+def chain_state(w3, account, bytecode, deployment=None):
+    """כל מה שהפריסה צריכה מהצומת, בסבב אחד של JSON-RPC batch"""
+    calls = [
+        ('eth_chainId', []),
+        ('eth_getBalance', [account, 'latest']),
+        ('eth_getTransactionCount', [account, 'pending']),
+        ('eth_estimateGas', [{'from': account, 'data': bytecode}]),
+        ('eth_feeHistory', [hex(FEE_HISTORY_BLOCKS), 'latest', list(FEE_PERCENTILES)]),
+        ('eth_gasPrice', []),
+    ]
+    if deployment:
+        # הקוד בכתובת שנרשמה, לבדיקה אם צריך לפרוס מחדש
+        calls.append(('eth_getCode', [deployment['address'], 'latest']))
+
+    results = send_batch(w3, calls)
+    names = ['chain_id', 'balance', 'nonce', 'gas', 'fee_history', 'gas_price', 'code']
+    state = dict(zip(names, results))
+    for name in ('chain_id', 'balance', 'nonce', 'gas'):
+        if isinstance(state[name], BatchCallError):
+            raise Exception(f"שגיאה בקריאת {name}: {str(state[name])}")
+        state[name] = quantity(state[name])
+    return state
+
+
+def transaction_fees(state, percentile_index):
+    """עמלות EIP-1559 לפי אחוזוני היסטוריית העמלות, או gasPrice ברשת ללא base fee"""
+    fee_history = state['fee_history']
+    fees = None if isinstance(fee_history, BatchCallError) else fees_from_history(fee_history, percentile_index)
+    if fees is not None:
+        return fees
+    if isinstance(state['gas_price'], BatchCallError):
+        raise Exception(f"לא ניתן לקבל מחיר גז: {str(state['gas_price'])}")
+    return {'gasPrice': quantity(state['gas_price'])}
+
+
+def is_current(deployment, state, bytecode):
+    """האם הפריסה הרשומה היא של אותו קוד ועדיין קיימת ברשת"""
+    if not deployment or deployment.get('chainId') != state['chain_id']:
+        return False
+    code = state.get('code')
+    if isinstance(code, BatchCallError) or not code or code in ('0x', b''):
+        return False
+    return (deployment.get('bytecodeHash') == code_hash(bytecode)
+            and deployment.get('codeHash') == code_hash(code))
+
+
+def deploy_contract(network=None, rpc_urls=None, artifact_path=None, force=False,
+                    percentile_index=DEFAULT_PERCENTILE_INDEX):
+    print("מתחיל תהליך התקנת החוזה...\n")
 
-def deploy_contract():
-    print("מתחיל תהליך התקנת החוזה עם הגדרות גז מעודכנות...\n")
-    
     try:
         # טעינת משתני סביבה
         load_dotenv()
-        provider_url = os.getenv('PROVIDER_URL')
         private_key = os.getenv('ADMIN_PRIVATE_KEY')
-        
-        # התחברות לרשת
-        print("מתחבר לרשת...")
-        w3 = Web3(Web3.HTTPProvider(provider_url))
-        
-        # טעינת החשבון
-        account = Account.from_key(private_key)
-        print(f"משתמש בחשבון: {account.address}")
-        
-        # בדיקת יתרה
-        balance = w3.eth.get_balance(account.address)
-        balance_eth = w3.from_wei(balance, 'ether')
-        print(f"יתרה נוכחית: {balance_eth} ETH")
-        
+
+        # התחברות לרשת. דרך PROVIDER_URL שם הרשת נקבע לפי ה-chainId של הצומת,
+        # כך שהפריסה לא תירשם תחת רשת אחרת מזו שהותקנה בה
+        w3, network = connect_network(network, rpc_urls, default_network=DEFAULT_NETWORK)
+        print(f"מחובר לרשת {network}")
+
+        # טעינת החשבון, בלי מפתח פרטי הצומת חותם (רשת מקומית)
+        account = admin_address(w3)
+        print(f"משתמש בחשבון: {account}")
+
         # טעינת החוזה המקומפל
-        with open('build/MedicalRegistry.json', 'r') as file:
-            contract_json = json.load(file)
-            
-        # הכנת החוזה להתקנה
-        contract_interface = contract_json['contracts']['MedicalRegistry.sol']['MedicalRegistry']
-        abi = contract_interface['abi']
-        bytecode = contract_interface['evm']['bytecode']['object']
-        
-        print("\nמכין את החוזה להתקנה...")
-        MedicalRegistry = w3.eth.contract(abi=abi, bytecode=bytecode)
-        
-        # חישוב הערכת גז
-        gas_estimate = w3.eth.estimate_gas({
-            'from': account.address,
-            'data': bytecode
-        })
-        
-        gas_with_buffer = int(gas_estimate * 1.2)  # הוספת 20% באפר
-        print(f"הערכת גז: {gas_estimate}")
+        artifact = get_artifact(artifact_path)
+        bytecode = artifact.bytecode
+        if not bytecode:
+            raise ValueError(f"אין bytecode ב-{artifact.path}")
+        if not bytecode.startswith('0x'):
+            bytecode = '0x' + bytecode
+
+        deployment = read_deployment(network)
+        state = chain_state(w3, account, bytecode, deployment)
+        # רשת מוגדרת שהצומת שלה על שרשרת אחרת: הרישום היה מתייחס לשרשרת הלא נכונה
+        if network in NETWORK_CONFIG and NETWORK_CONFIG[network]['chain_id'] != state['chain_id']:
+            raise ValueError(f"הצומת על chainId {state['chain_id']}, "
+                             f"אבל הרשת {network} מוגדרת עם {NETWORK_CONFIG[network]['chain_id']}")
+
+        if not force and is_current(deployment, state, bytecode):
+            print(f"\n✅ החוזה כבר מותקן בכתובת {deployment['address']} עם אותו קוד, אין צורך בהתקנה")
+            return deployment['address']
+
+        balance_eth = w3.from_wei(state['balance'], 'ether')
+        print(f"יתרה נוכחית: {balance_eth} ETH")
+
+        gas_with_buffer = int(state['gas'] * GAS_BUFFER)
+        print(f"הערכת גז: {state['gas']}")
         print(f"גז עם באפר: {gas_with_buffer}")
-        
-        # קבלת מחיר גז נוכחי
-        gas_price = w3.eth.gas_price
-        gas_price_gwei = w3.from_wei(gas_price, 'gwei')
-        print(f"מחיר גז נוכחי: {gas_price_gwei} Gwei")
-        
-        # חישוב עלות משוערת
-        estimated_cost = w3.from_wei(gas_price * gas_with_buffer, 'ether')
-        print(f"עלות משוערת: {estimated_cost} ETH")
-        
-        if balance < (gas_price * gas_with_buffer):
-            raise ValueError(f"אין מספיק ETH! נדרש: {estimated_cost} ETH")
-        
-        # בניית טרנזקצית ההתקנה
-        print("\nבונה טרנזקציה...")
-        transaction = MedicalRegistry.constructor().build_transaction({
-            'from': account.address,
-            'nonce': w3.eth.get_transaction_count(account.address),
-            'gas': gas_with_buffer,
-            'gasPrice': gas_price
-        })
-        
-        # חתימה ושליחה
-        print("חותם ושולח את הטרנזקציה...")
-        signed_txn = w3.eth.account.sign_transaction(transaction, private_key)
-        tx_hash = w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-        
-        print(f"\nטרנזקציה נשלחה! מחכה לאישור...")
-        print(f"Hash: {tx_hash.hex()}")
-        
-        # המתנה לאישור
-        tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-        
-        if tx_receipt['status'] == 1:
-            contract_address = tx_receipt['contractAddress']
-            print(f"\n✅ החוזה הותקן בהצלחה!")
-            print(f"כתובת החוזה: {contract_address}")
-            
-            # שמירת כתובת החוזה
-            with open('.env', 'a') as f:
-                f.write(f'\nCONTRACT_ADDRESS={contract_address}')
-                
-            return contract_address
+
+        fees = transaction_fees(state, percentile_index)
+        max_fee = fees.get('maxFeePerGas', fees.get('gasPrice'))
+        if 'maxFeePerGas' in fees:
+            print(f"עמלה מקסימלית: {w3.from_wei(fees['maxFeePerGas'], 'gwei')} Gwei, "
+                  f"עמלת עדיפות: {w3.from_wei(fees['maxPriorityFeePerGas'], 'gwei')} Gwei")
         else:
+            print(f"מחיר גז נוכחי: {w3.from_wei(fees['gasPrice'], 'gwei')} Gwei")
+
+        # חישוב עלות מקסימלית
+        max_cost = max_fee * gas_with_buffer
+        print(f"עלות מקסימלית: {w3.from_wei(max_cost, 'ether')} ETH")
+        if state['balance'] < max_cost:
+            raise ValueError(f"אין מספיק ETH! נדרש: {w3.from_wei(max_cost, 'ether')} ETH")
+
+        # חתימה ושליחה דרך מנגנון השליחה המשותף (nonce מקומי, החלפה אם נתקעת)
+        print("\nחותם ושולח את הטרנזקציה...")
+        sender = TransactionSender(w3, private_keys=[private_key] if private_key else [])
+        try:
+            pending = sender.submit(artifact.factory(w3).constructor(), dict(
+                fees, **{
+                    'from': account,
+                    'gas': gas_with_buffer,
+                    'nonce': state['nonce'],
+                    'chainId': state['chain_id'],
+                }
+            ))
+
+            print("\nטרנזקציה נשלחה! מחכה לאישור...")
+
+            # המתנה לאישור
+            tx_receipt = pending.result()
+            print(f"Hash: {tx_receipt['transactionHash'].hex()}")
+        finally:
+            sender.close()
+
+        if tx_receipt['status'] != 1:
             raise Exception("התקנת החוזה נכשלה")
-            
+
+        contract_address = tx_receipt['contractAddress']
+        print("\n✅ החוזה הותקן בהצלחה!")
+        print(f"כתובת החוזה: {contract_address}")
+
+        # רישום הפריסה לפי רשת, הממשק קורא את הכתובת וה-ABI מכאן
+        write_deployment(network, {
+            'address': contract_address,
+            'chainId': state['chain_id'],
+            'blockNumber': tx_receipt['blockNumber'],
+            'transactionHash': Web3.to_hex(tx_receipt['transactionHash']),
+            'deployer': account,
+            'gasUsed': tx_receipt['gasUsed'],
+            'bytecodeHash': code_hash(bytecode),
+            'codeHash': code_hash(w3.eth.get_code(contract_address)),
+            'artifact': str(artifact.path),
+            'deployedAt': datetime.now(timezone.utc).isoformat(),
+            'abi': artifact.abi,
+        })
+        print(f"הפריסה נרשמה עבור הרשת {network}")
+        return contract_address
+
     except Exception as e:
         print(f"\n❌ שגיאה בהתקנה: {str(e)}")
         return None
 
+
 if __name__ == "__main__":
-    deploy_contract()
\ No newline at end of file
+    parser = argparse.ArgumentParser(
+        description="התקנת החוזה ורישום הפריסה (הרצה: python -m scripts.deploy_contract)"
+    )
+    parser.add_argument('--network', help=f"שם הרשת, גם המפתח ברישום הפריסות (ברירת מחדל: {DEFAULT_NETWORK})")
+    parser.add_argument('--rpc-url', action='append',
+                        help="כתובת RPC (ברירת מחדל: הגדרות הרשת, או PROVIDER_URL כשלא צוינה רשת, "
+                             "ואז הרשת נקבעת לפי ה-chainId)")
+    parser.add_argument('--artifact', help="נתיב לקובץ החוזה המקומפל")
+    parser.add_argument('--force', action='store_true', help="התקנה גם כשהקוד ברשת זהה")
+    parser.add_argument('--fee-percentile', type=int, choices=FEE_PERCENTILES,
+                        default=FEE_PERCENTILES[DEFAULT_PERCENTILE_INDEX],
+                        help="אחוזון עמלת העדיפות מתוך היסטוריית העמלות")
+    args = parser.parse_args()
+
+    deploy_contract(args.network, args.rpc_url, args.artifact, args.force,
+                    FEE_PERCENTILES.index(args.fee_percentile))
@@ -0,0 +1,94 @@
+import argparse
+import time
+from functools import partial
+from dotenv import load_dotenv
+
+from src.rpc_provider import connect_network
+from src.artifacts import deployed_contract
+from src.record_store import RecordStore, DEFAULT_KEY_PATH
+from src.registry_export import (
+    doctor_pages, patient_pages, index_pages, decrypted_pages, export_rows, checkpoint_path,
+    check_page_size, EXPORT_FORMATS
+)
+from src.registry_reader import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from src.registry_service import admin_address
+
+
+def export_registry(dataset, output_path, fmt=None, source='chain', resume=True,
+                    page_size=DEFAULT_PAGE_SIZE, caller=None, network=None, rpc_urls=None,
+                    address=None, decrypt=True):
+    # גודל עמוד שהחוזה דוחה נבדק לפני שמתחילים
+    check_page_size(page_size)
+
+    # טעינת משתני סביבה
+    load_dotenv()
+
+    # התחברות לרשת. דרך PROVIDER_URL שם הרשת נקבע לפי ה-chainId של הצומת
+    w3, network = connect_network(network, rpc_urls)
+    print(f"מחובר לרשת {network}")
+    if not w3.is_connected():
+        raise ConnectionError("לא מצליח להתחבר לרשת")
+
+    contract = deployed_contract(w3, address=address, network=network)
+    # קריאת מטופלים מותרת רק למנהל או לרופא, ברירת המחדל היא חשבון המנהל
+    caller = caller or admin_address(w3)
+
+    if source == 'index':
+        from src.registry_indexer import RegistryIndexer, network_confirmations
+        indexer = RegistryIndexer(w3, contract, confirmations=network_confirmations(network))
+        pages = partial(index_pages, indexer, dataset, page_size=page_size)
+    elif dataset == 'doctors':
+        pages = partial(doctor_pages, w3, contract, caller, page_size=page_size)
+    else:
+        pages = partial(patient_pages, w3, contract, caller, page_size=page_size)
+
+    # מטופלים שנרשמו לפי גיבוב רשומה: הפרטים מפוענחים מהמאגר המקומי, אחרת נשאר רק הגיבוב
+    record_store = None
+    read_pages = lambda position: pages(start=position)
+    if dataset == 'patients' and decrypt and DEFAULT_KEY_PATH.exists():
+        record_store = RecordStore()
+        read_pages = lambda position: decrypted_pages(pages(start=position), record_store)
+
+    if resume and checkpoint_path(output_path).exists():
+        print(f"ממשיך מנקודת שמירה: {checkpoint_path(output_path)}")
+
+    print(f"\nמייצא {dataset} אל: {output_path}")
+    start = time.time()
+    try:
+        rows = export_rows(read_pages, dataset, output_path, fmt, resume)
+    finally:
+        if record_store is not None:
+            record_store.close()
+    elapsed = time.time() - start
+
+    print(f"\nהייצוא הסתיים תוך {elapsed:.1f} שניות, {rows} שורות")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="ייצוא רופאים או מטופלים לקובץ (הרצה: python -m scripts.export_registry)"
+    )
+    parser.add_argument('dataset', choices=['doctors', 'patients'])
+    parser.add_argument('output', help="קובץ יעד (.csv / .jsonl), או תיקייה עבור parquet")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, help="ברירת מחדל: לפי סיומת הקובץ")
+    parser.add_argument('--source', choices=['chain', 'index'], default='chain',
+                        help="chain - קריאות מרוכזות מהחוזה, index - מהאינדקס המקומי")
+    parser.add_argument('--restart', action='store_true', help="התעלמות מנקודת שמירה קיימת")
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f"שורות בכל קריאה, עד {MAX_PAGE_SIZE}")
+    parser.add_argument('--caller', help="כתובת לקריאת מטופלים (מנהל או רופא)")
+    parser.add_argument('--network', help="שם הרשת, גם המפתח ברישום הפריסות (ברירת מחדל: local)")
+    parser.add_argument('--rpc-url', action='append',
+                        help="כתובת RPC (ברירת מחדל: הגדרות הרשת, או PROVIDER_URL כשלא צוינה רשת, "
+                             "ואז הרשת נקבעת לפי ה-chainId)")
+    parser.add_argument('--contract', help="כתובת החוזה (ברירת מחדל: הפריסה הרשומה לרשת)")
+    parser.add_argument('--no-decrypt', action='store_true',
+                        help="ייצוא גיבוב הרשומה בלי לפענח את פרטי המטופלים")
+    args = parser.parse_args()
+    if not 0 < args.page_size <= MAX_PAGE_SIZE:
+        parser.error(f"--page-size חייב להיות בין 1 ל-{MAX_PAGE_SIZE}")
+
+    export_registry(args.dataset, args.output, args.format, args.source,
+                    not args.restart, args.page_size, args.caller, args.network,
+                    args.rpc_url, args.contract, not args.no_decrypt)
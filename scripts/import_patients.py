@@ -0,0 +1,79 @@
+import argparse
+import os
+import time
+from dotenv import load_dotenv
+
+from src.rpc_provider import create_web3
+from src.artifacts import deployed_contract
+from src.bulk_import import PatientImporter, summarize, write_report
+from src.record_store import RecordStore, DEFAULT_KEY_PATH
+from src.registry_writer import supports_records
+
+
+def import_patients(file_path, doctor_address, report_path=None, records=True):
+    # טעינת משתני סביבה
+    load_dotenv()
+    provider_url = os.getenv('PROVIDER_URL', 'http://127.0.0.1:7545')
+    private_key = os.getenv('DOCTOR_PRIVATE_KEY')
+
+    # התחברות לרשת
+    print(f"מתחבר ל: {provider_url}")
+    w3 = create_web3(urls=provider_url.split(','))
+    if not w3.is_connected():
+        raise ConnectionError("לא מצליח להתחבר לרשת")
+
+    # טעינת החוזה
+    contract = deployed_contract(w3)
+
+    if private_key:
+        print("חותם מקומית עם DOCTOR_PRIVATE_KEY")
+    else:
+        print("אין DOCTOR_PRIVATE_KEY - הצומת יחתום עבור החשבון")
+
+    # פרטי המטופלים נשמרים מוצפנים במאגר המקומי ורק הגיבוב נשלח לחוזה
+    record_store = None
+    if records and DEFAULT_KEY_PATH.exists() and supports_records(contract):
+        record_store = RecordStore()
+        print("פרטי המטופלים יישמרו מוצפנים במאגר המקומי")
+
+    # קליטת המטופלים
+    print(f"\nמייבא מטופלים מ: {file_path}")
+    start = time.time()
+    try:
+        importer = PatientImporter(
+            w3, contract, doctor_address, private_key=private_key, record_store=record_store
+        )
+        results = importer.run(file_path)
+    finally:
+        if record_store is not None:
+            record_store.close()
+    elapsed = time.time() - start
+
+    # סיכום
+    print(f"\nהייבוא הסתיים תוך {elapsed:.1f} שניות")
+    for status, count in sorted(summarize(results).items()):
+        print(f"{status}: {count}")
+
+    for result in results:
+        if result['error']:
+            print(f"שורה {result['line']} ({result['wallet']}): {result['status']} - {result['error']}")
+
+    if report_path:
+        write_report(results, report_path)
+        print(f"\nדוח נשמר ב: {report_path}")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="ייבוא מטופלים מקובץ CSV או JSONL (הרצה: python -m scripts.import_patients)"
+    )
+    parser.add_argument('file', help="קובץ עם העמודות wallet,name,age,medicalId")
+    parser.add_argument('--doctor', required=True, help="כתובת הרופא המאושר")
+    parser.add_argument('--report', help="נתיב לדוח CSV עם סטטוס לכל שורה")
+    parser.add_argument('--no-records', action='store_true',
+                        help="לשלוח את פרטי המטופלים לחוזה גם כשקיים מפתח הצפנה")
+    args = parser.parse_args()
+
+    import_patients(args.file, args.doctor, args.report, records=not args.no_records)
@@ -0,0 +1,148 @@
+import argparse
+import os
+import time
+from dotenv import load_dotenv
+
+from src.artifacts import deployed_contract
+from src.bulk_import import RECEIPT_TIMEOUT
+from src.record_store import load_key, DEFAULT_KEY_PATH
+from src.registry_export import check_page_size
+from src.registry_reader import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from src.registry_service import admin_address, environment_private_keys
+from src.registry_snapshot import (
+    chain_records, index_records, write_snapshot, read_snapshot_header, verify_snapshot, restore_snapshot
+)
+from src.rpc_provider import connect_network
+from src.tx_sender import TransactionSender
+
+
+def connect(network, rpc_urls, address):
+    # טעינת משתני סביבה
+    load_dotenv()
+
+    # התחברות לרשת. דרך PROVIDER_URL שם הרשת נקבע לפי ה-chainId של הצומת
+    w3, network = connect_network(network, rpc_urls)
+    print(f"מחובר לרשת {network}")
+    if not w3.is_connected():
+        raise ConnectionError("לא מצליח להתחבר לרשת")
+
+    # כתובת מפורשת, או הפריסה הרשומה עבור הרשת
+    contract = deployed_contract(w3, address=address, network=network)
+    print(f"חוזה: {contract.address}")
+    return w3, contract, network
+
+
+def snapshot_key(key_path=None):
+    """מפתח ההצפנה: מהקובץ שצוין, או מפתח רשומות המטופלים אם קיים"""
+    if key_path is not None:
+        return load_key(key_path)
+    return load_key(DEFAULT_KEY_PATH) if DEFAULT_KEY_PATH.exists() else None
+
+
+def dump_registry(output_path, network=None, rpc_urls=None, address=None, source='chain',
+                  page_size=DEFAULT_PAGE_SIZE, key=None):
+    # גודל עמוד שהחוזה דוחה נבדק לפני שמתחילים
+    check_page_size(page_size)
+    # תמונת המצב כוללת פרטי מטופלים, בלי מפתח היא נשמרת כטקסט גלוי
+    if key is None:
+        print("⚠️ אזהרה: תמונת המצב לא תוצפן")
+
+    w3, contract, network = connect(network, rpc_urls, address)
+    caller = admin_address(w3)
+
+    if source == 'index':
+        from src.registry_indexer import RegistryIndexer, network_confirmations
+        indexer = RegistryIndexer(w3, contract, confirmations=network_confirmations(network))
+        records = index_records(indexer)
+    else:
+        indexer = None
+        records = chain_records(w3, contract, caller, page_size=page_size)
+
+    print(f"\nשומר את מצב הרישום אל: {output_path}")
+    start = time.time()
+    try:
+        header = write_snapshot(records, output_path, {
+            'network': network,
+            'contract': contract.address,
+            'chainId': w3.eth.chain_id,
+            # הקריאה מתחילה בבלוק הזה, שינויים מאוחרים יותר עשויים להיכלל
+            'blockNumber': w3.eth.block_number,
+            'source': source,
+        }, key=key)
+    finally:
+        if indexer is not None:
+            indexer.close()
+
+    counts = header['counts']
+    print(f"\n✅ נשמרו {counts['doctor']} רופאים ו-{counts['patient']} מטופלים "
+          f"תוך {time.time() - start:.1f} שניות ({os.path.getsize(output_path)} בתים)")
+    return header
+
+
+def read_keys(path):
+    """מפתחות פרטיים של רופאים, אחד בכל שורה"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def restore_registry(snapshot_path, network=None, rpc_urls=None, address=None, keys_path=None, key=None):
+    header = verify_snapshot(snapshot_path, key)
+    counts = header['counts']
+    print(f"תמונת מצב מ-{header['createdAt']}: חוזה {header.get('contract')} ברשת {header.get('network')}, "
+          f"{counts['doctor']} רופאים, {counts['patient']} מטופלים")
+
+    w3, contract, _ = connect(network, rpc_urls, address)
+    if contract.address == header.get('contract') and w3.eth.chain_id == header.get('chainId'):
+        print("שים לב: היעד הוא החוזה שממנו נשמרה תמונת המצב, רשומות קיימות ידולגו")
+
+    # מטופלים נרשמים רק ע"י הרופא שלהם, בלי מפתח הצומת צריך לחתום עבורו
+    private_keys = environment_private_keys() + (read_keys(keys_path) if keys_path else [])
+    sender = TransactionSender(w3, private_keys=private_keys, timeout=RECEIPT_TIMEOUT)
+
+    print("\nמשחזר: רופאים, אישורים ואז מטופלים...")
+    start = time.time()
+    try:
+        summary = restore_snapshot(w3, contract, snapshot_path, admin_address(w3), sender, key=key)
+    finally:
+        sender.close()
+
+    print(f"\nהשחזור הסתיים תוך {time.time() - start:.1f} שניות")
+    for phase, statuses in summary.items():
+        print(f"  {phase}: " + (", ".join(f"{status}: {count}" for status, count in statuses.items()) or "-"))
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="שמירה ושחזור של מצב הרישום (הרצה: python -m scripts.snapshot_registry)"
+    )
+    parser.add_argument('--network', help="שם הרשת, גם המפתח ברישום הפריסות (ברירת מחדל: local)")
+    parser.add_argument('--rpc-url', action='append',
+                        help="כתובת RPC (ברירת מחדל: הגדרות הרשת, או PROVIDER_URL כשלא צוינה רשת, "
+                             "ואז הרשת נקבעת לפי ה-chainId)")
+    parser.add_argument('--contract', help="כתובת החוזה (ברירת מחדל: הפריסה הרשומה לרשת)")
+    parser.add_argument('--key', help=f"קובץ מפתח ההצפנה (ברירת מחדל: {DEFAULT_KEY_PATH} אם קיים)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    dump_parser = commands.add_parser('dump', help="שמירת רופאים, אישורים ומטופלים לקובץ")
+    dump_parser.add_argument('output', help="קובץ יעד (.jsonl.gz)")
+    dump_parser.add_argument('--source', choices=['chain', 'index'], default='chain',
+                             help="chain - קריאות מרוכזות מהחוזה, index - מהאינדקס המקומי")
+    dump_parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                             help=f"שורות בכל קריאה, עד {MAX_PAGE_SIZE}")
+    dump_parser.add_argument('--plaintext', action='store_true', help="שמירה ללא הצפנה")
+
+    restore_parser = commands.add_parser('restore', help="שחזור תמונת מצב לחוזה, בדרך כלל פריסה חדשה")
+    restore_parser.add_argument('snapshot', help="קובץ תמונת המצב")
+    restore_parser.add_argument('--doctor-keys', help="קובץ מפתחות פרטיים של הרופאים, אחד בכל שורה")
+    args = parser.parse_args()
+
+    if args.command == 'dump':
+        if not 0 < args.page_size <= MAX_PAGE_SIZE:
+            parser.error(f"--page-size חייב להיות בין 1 ל-{MAX_PAGE_SIZE}")
+        key = None if args.plaintext else snapshot_key(args.key)
+        dump_registry(args.output, args.network, args.rpc_url, args.contract, args.source, args.page_size, key)
+    else:
+        # המפתח נדרש רק לתמונת מצב מוצפנת
+        key = snapshot_key(args.key) if read_snapshot_header(args.snapshot).get('encryption') else None
+        restore_registry(args.snapshot, args.network, args.rpc_url, args.contract, args.doctor_keys, key)
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+SOURCE_NAME = 'MedicalRegistry.sol'
+CONTRACT_NAME = 'MedicalRegistry'
+
+# Compiled output: a fresh build if there is one, otherwise the copy kept in src
+ARTIFACT_PATHS = [
+    ROOT_DIR / 'build' / 'MedicalRegistry.json',
+    ROOT_DIR / 'src' / 'MedicalRegistry.json',
+]
+
+# ABI and address of the contract currently deployed
+DEPLOYED_ABI_PATH = ROOT_DIR / 'contracts' / 'contract_abi.json'
+DEPLOYED_ADDRESS_PATH = ROOT_DIR / 'contracts' / 'contract_address.txt'
+
+# Deployments by network: address, block, code hashes and ABI, written by scripts/deploy_contract.py
+DEPLOYMENTS_PATH = ROOT_DIR / 'contracts' / 'deployments.json'
+
+# Compact copies holding only what is used, keyed by the source file's size and mtime
+CACHE_DIR = ROOT_DIR / 'data' / 'artifact_cache'
+
+
+def source_hash(source):
+    """sha256 of the contract source, recorded in the bundled artifact it was compiled from"""
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def find_artifact():
+    """Path of the compiled contract JSON"""
+    for path in ARTIFACT_PATHS:
+        if path.exists():
+            return path
+    raise FileNotFoundError("Compiled contract not found, run scripts/compile_contract.py first")
+
+
+class Artifact:
+    """A compiled contract file, parsed at most once.
+
+    Accepts either solc standard JSON output or a bare ABI list. ABI and
+    bytecode are read on first access, from the compact cache when it is
+    still current, and Contract objects are built once per web3 instance
+    and address.
+    """
+
+    def __init__(self, path, cache_dir=CACHE_DIR):
+        self.path = Path(path)
+        self.cache_path = Path(cache_dir) / f"{self.path.parent.name}_{self.path.stem}.json"
+        self._data = None
+        self._contracts = {}
+        self.lock = threading.Lock()
+
+    def _source_key(self):
+        stat = self.path.stat()
+        return [str(self.path), stat.st_size, stat.st_mtime_ns]
+
+    def _read_cache(self, source_key):
+        try:
+            with open(self.cache_path, 'r') as f:
+                cached = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return cached if cached.get('source') == source_key else None
+
+    def _write_cache(self, data):
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.cache_path.with_suffix('.tmp')
+            with open(temp_path, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            # The cache only saves time, a read-only checkout still works
+            print(f"Cannot write artifact cache {self.cache_path}: {str(e)}")
+
+    def _parse(self):
+        with open(self.path, 'r') as f:
+            compiled = json.load(f)
+        if isinstance(compiled, list):
+            return {'abi': compiled, 'bytecode': None, 'deployed_bytecode': None}
+
+        contract = compiled['contracts'][SOURCE_NAME][CONTRACT_NAME]
+        evm = contract.get('evm', {})
+        return {
+            'abi': contract['abi'],
+            'bytecode': evm.get('bytecode', {}).get('object'),
+            'deployed_bytecode': evm.get('deployedBytecode', {}).get('object'),
+        }
+
+    @property
+    def data(self):
+        if self._data is None:
+            with self.lock:
+                if self._data is None:
+                    source_key = self._source_key()
+                    data = self._read_cache(source_key)
+                    if data is None:
+                        data = dict(self._parse(), source=source_key)
+                        self._write_cache(data)
+                    self._data = data
+        return self._data
+
+    @property
+    def abi(self):
+        return self.data['abi']
+
+    @property
+    def bytecode(self):
+        return self.data['bytecode']
+
+    @property
+    def deployed_bytecode(self):
+        return self.data['deployed_bytecode']
+
+    def factory(self, w3):
+        """Contract factory for deploying this artifact"""
+        if not self.bytecode:
+            raise ValueError(f"{self.path} has no bytecode")
+        return w3.eth.contract(abi=self.abi, bytecode=self.bytecode)
+
+    def contract(self, w3, address):
+        """Contract object at address, built once per web3 instance"""
+        key = (id(w3), address)
+        contract = self._contracts.get(key)
+        if contract is None or contract.w3 is not w3:
+            contract = w3.eth.contract(address=address, abi=self.abi)
+            self._contracts[key] = contract
+        return contract
+
+
+@lru_cache(maxsize=None)
+def _artifact(path):
+    return Artifact(path)
+
+
+def get_artifact(path=None):
+    """Shared Artifact for a compiled contract file, the newest build by default"""
+    return _artifact(Path(path).resolve() if path else find_artifact())
+
+
+def read_deployed_address(path=DEPLOYED_ADDRESS_PATH):
+    """Address of the deployed contract"""
+    with open(path, 'r') as f:
+        return f.read().strip()
+
+
+def read_deployments(path=DEPLOYMENTS_PATH):
+    """Deployment records by network name"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def read_deployment(network, path=DEPLOYMENTS_PATH):
+    """The deployment recorded for a network, or None"""
+    return read_deployments(path).get(network)
+
+
+def write_deployment(network, deployment, path=DEPLOYMENTS_PATH):
+    """Record a network's deployment, other networks are kept"""
+    deployments = read_deployments(path)
+    deployments[network] = deployment
+    temp_path = Path(path).with_suffix('.tmp')
+    with open(temp_path, 'w') as f:
+        json.dump(deployments, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def deployed_contract(w3, address=None, network=None):
+    """The deployed MedicalRegistry.
+
+    Taken from the network's deployment record when there is one, otherwise
+    from the ABI saved alongside contract_address.txt. A record made on
+    another chain than w3 is connected to raises ValueError.
+    """
+    deployment = read_deployment(network) if network and not address else None
+    if deployment is not None:
+        chain_id = w3.eth.chain_id
+        if deployment.get('chainId') != chain_id:
+            raise ValueError(
+                f"The '{network}' deployment was made on chain {deployment.get('chainId')}, "
+                f"but the node is on chain {chain_id}"
+            )
+        return w3.eth.contract(address=deployment['address'], abi=deployment['abi'])
+    return get_artifact(DEPLOYED_ABI_PATH).contract(w3, address or read_deployed_address())
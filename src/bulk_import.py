@@ -0,0 +1,292 @@
+import csv
+import json
+from concurrent.futures import TimeoutError as FutureTimeout
+from pathlib import Path
+
+from eth_account import Account
+from web3 import Web3
+
+from src.rpc_batch import batch_call, BatchCallError, DEFAULT_BATCH_SIZE
+from src.registry_writer import (
+    chunked, estimate_gas, patient_batch_size, register_patients_function,
+    supports_records, register_records_function, MAX_RECORD_BATCH
+)
+from src.tx_sender import TransactionSender, TransactionRejected
+
+REQUIRED_FIELDS = ('wallet', 'name', 'age', 'medicalId')
+
+# Patient.age is stored as uint8
+MAX_AGE = 255
+
+RECEIPT_TIMEOUT = 120
+
+# Receipt waits re-check for cancellation at this interval, in seconds
+CANCEL_CHECK_INTERVAL = 1
+
+
+def read_patient_rows(path):
+    """Yield (line number, row) pairs from a CSV file with a header row or a JSONL file.
+
+    A JSONL line that cannot be parsed yields a ValueError as its row, so
+    prepare() reports that line as invalid and the rest of the file is imported.
+    """
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.suffix.lower() in ('.jsonl', '.ndjson'):
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    row = ValueError(f"Invalid JSON: {e.msg}")
+                yield line_number, row
+        else:
+            # Line 1 is the header
+            for line_number, row in enumerate(csv.DictReader(f), start=2):
+                yield line_number, row
+
+
+def parse_patient_row(row):
+    """Validate a row and return (wallet, name, age, medicalId)"""
+    missing = [field for field in REQUIRED_FIELDS if not str(row.get(field) or '').strip()]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+
+    wallet = str(row['wallet']).strip()
+    if not Web3.is_address(wallet):
+        raise ValueError("Invalid wallet address")
+
+    age = str(row['age']).strip()
+    if not age.isdigit() or int(age) <= 0:
+        raise ValueError("Age must be a positive number")
+    if int(age) > MAX_AGE:
+        raise ValueError(f"Age must be at most {MAX_AGE}")
+
+    return (
+        Web3.to_checksum_address(wallet),
+        str(row['name']).strip(),
+        int(age),
+        str(row['medicalId']).strip()
+    )
+
+
+def parse_record_row(row):
+    """Validate a row of a patient registered by record hash and return (wallet, recordHash)"""
+    wallet = str(row.get('wallet') or '').strip()
+    if not Web3.is_address(wallet):
+        raise ValueError("Invalid wallet address")
+    record_hash = str(row['recordHash']).strip()
+    if not Web3.is_hex(record_hash) or len(Web3.to_bytes(hexstr=record_hash)) != 32:
+        raise ValueError("Record hash must be 32 bytes of hex")
+    return Web3.to_checksum_address(wallet), record_hash
+
+
+class PatientImporter:
+    """Registers many patients for one doctor with pipelined transaction submission.
+
+    With a record_store and a contract that supports it, patient details are
+    stored encrypted off chain and only their record hashes are sent. Records
+    are written to the store once their transaction is mined, never for a
+    transaction that failed or reverted. Rows
+    with a recordHash, e.g. from a registry snapshot, already have their
+    details off chain and are registered by that hash.
+    """
+
+    def __init__(self, w3, contract, doctor_address, private_key=None,
+                 receipt_timeout=RECEIPT_TIMEOUT, batch_size=DEFAULT_BATCH_SIZE, sender=None,
+                 record_store=None):
+        self.w3 = w3
+        self.contract = contract
+        self.doctor_address = Web3.to_checksum_address(doctor_address)
+        self.batch_size = batch_size
+        self.record_store = record_store if record_store and supports_records(contract) else None
+
+        # A shared sender keeps nonces consistent with other writes from the same account
+        self.owns_sender = sender is None
+        self.sender = sender or TransactionSender(
+            w3, timeout=receipt_timeout, batch_size=batch_size
+        )
+        if private_key:
+            if Account.from_key(private_key).address != self.doctor_address:
+                raise ValueError("The private key does not belong to the doctor address")
+            self.sender.add_account(private_key)
+
+    def prepare(self, rows):
+        """Validate rows and mark patients that are duplicated or already registered"""
+        results = []
+        seen = set()
+        for line_number, row in rows:
+            result = {'line': line_number, 'wallet': row.get('wallet') if isinstance(row, dict) else None,
+                      'status': 'pending', 'tx_hash': None, 'error': None}
+            try:
+                if isinstance(row, ValueError):
+                    raise row
+                if not isinstance(row, dict):
+                    raise ValueError("Row must be a JSON object")
+                if row.get('recordHash'):
+                    wallet, result['record_hash'] = parse_record_row(row)
+                    result['args'] = (wallet,)
+                else:
+                    result['args'] = parse_patient_row(row)
+                if result['args'][0] in seen:
+                    raise ValueError("Duplicate wallet in file")
+                seen.add(result['args'][0])
+            except ValueError as e:
+                result['status'] = 'invalid'
+                result['error'] = str(e)
+            results.append(result)
+
+        # One batched lookup instead of letting already registered patients revert on chain.
+        # A patient exists once doctorAddress is set, in every storage layout of the contract
+        getter_outputs = self.contract.get_function_by_name('patients').abi['outputs']
+        doctor_column = [output['name'] for output in getter_outputs].index('doctorAddress')
+
+        to_check = [result for result in results if result['status'] == 'pending']
+        existing = batch_call(
+            self.w3, self.contract, 'patients',
+            [(result['args'][0],) for result in to_check],
+            batch_size=self.batch_size
+        )
+        for result, patient in zip(to_check, existing):
+            if isinstance(patient, BatchCallError):
+                continue
+            if int(patient[doctor_column], 16) != 0:
+                result['status'] = 'skipped'
+                result['error'] = "Patient already registered"
+        return results
+
+    def submit(self, results, cancel_event=None):
+        """Queue every pending row on the transaction sender without waiting for receipts.
+
+        Rows are grouped into registerPatients batches when the contract supports them.
+        """
+        pending = [result for result in results if result['status'] == 'pending']
+        hashed = [result for result in pending if result.get('record_hash')]
+        pending = [result for result in pending if not result.get('record_hash')]
+        if self.record_store is not None:
+            groups = chunked(pending, MAX_RECORD_BATCH)
+            contract_functions = [self._records_function(group) for group in groups]
+        else:
+            groups = chunked(pending, patient_batch_size(self.contract))
+            contract_functions = [
+                register_patients_function(self.contract, [result['args'] for result in group])
+                for group in groups
+            ]
+
+        if hashed and not supports_records(self.contract):
+            self._mark(hashed, 'failed', "Contract cannot register patients by record hash")
+        elif hashed:
+            for group in chunked(hashed, MAX_RECORD_BATCH):
+                groups.append(group)
+                contract_functions.append(register_records_function(
+                    self.contract, [result['args'][0] for result in group],
+                    [result['record_hash'] for result in group]
+                ))
+        if not groups:
+            return results
+
+        # Gas for every transaction in a few batched round trips
+        gas_limits = estimate_gas(
+            self.w3, self.contract, contract_functions, self.doctor_address, self.batch_size
+        )
+
+        for group, contract_function, gas in zip(groups, contract_functions, gas_limits):
+            if cancel_event is not None and cancel_event.is_set():
+                self._mark(group, 'cancelled')
+                continue
+            if isinstance(gas, BatchCallError):
+                self._mark(group, 'failed', str(gas))
+                continue
+
+            transaction = self.sender.submit(
+                contract_function, {'from': self.doctor_address, 'gas': gas}
+            )
+            for result in group:
+                result['status'] = 'submitted'
+                result['transaction'] = transaction
+        return results
+
+    def _records_function(self, group):
+        """Encrypt the group's records and build the call committing their hashes.
+
+        The encrypted rows are kept on the results until collect_receipts() stores them.
+        """
+        wallets = [result['args'][0] for result in group]
+        rows = self.record_store.encrypt_many(
+            (wallet, self.doctor_address, {'name': name, 'age': age, 'medicalId': medical_id})
+            for wallet, name, age, medical_id in (result['args'] for result in group)
+        )
+        for result, row in zip(group, rows):
+            result['record_row'] = row
+        return register_records_function(self.contract, wallets, [row[0] for row in rows])
+
+    def collect_receipts(self, results, cancel_event=None):
+        """Wait for all submitted transactions and record per row status"""
+        groups = {}
+        for result in results:
+            if result['status'] == 'submitted':
+                groups.setdefault(result['transaction'].id, []).append(result)
+
+        for group in groups.values():
+            transaction = group[0]['transaction']
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                try:
+                    receipt = transaction.result(timeout=CANCEL_CHECK_INTERVAL)
+                except FutureTimeout:
+                    continue
+                except TransactionRejected as e:
+                    self._mark(group, 'failed', str(e))
+                except Exception as e:
+                    self._mark(group, 'unconfirmed', str(e))
+                else:
+                    if receipt.status == 1:
+                        self._mark(group, 'confirmed')
+                    else:
+                        self._mark(group, 'reverted', "Transaction failed")
+                break
+
+            for result in group:
+                result['tx_hash'] = transaction.tx_hash
+
+            # A transaction still unconfirmed may yet be mined, so only a definite failure drops its records
+            rows = [result.pop('record_row') for result in group if 'record_row' in result]
+            if rows and group[0]['status'] not in ('failed', 'reverted'):
+                self.record_store.insert(rows)
+        return results
+
+    def _mark(self, group, status, error=None):
+        for result in group:
+            result['status'] = status
+            result['error'] = error
+
+    def run(self, path, cancel_event=None):
+        """Import a file and return one result per row"""
+        try:
+            results = self.prepare(read_patient_rows(path))
+            self.submit(results, cancel_event)
+            self.collect_receipts(results, cancel_event)
+        finally:
+            if self.owns_sender:
+                self.sender.close()
+        return results
+
+
+def summarize(results):
+    """Count results by status"""
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    return counts
+
+
+def write_report(results, path):
+    """Write per row status as CSV"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['line', 'wallet', 'status', 'tx_hash', 'error'])
+        for result in results:
+            tx_hash = result['tx_hash'].hex() if result['tx_hash'] else ''
+            writer.writerow([result['line'], result['wallet'], result['status'], tx_hash, result['error'] or ''])
@@ -0,0 +1,192 @@
+import threading
+import time
+from collections import OrderedDict
+
+from web3 import Web3
+
+from src.rpc_batch import batch_call, BatchCallError, DEFAULT_BATCH_SIZE
+from src.registry_indexer import fetch_registry_events, registry_events, DEFAULT_BLOCK_RANGE
+
+DEFAULT_MAX_ENTRIES = 5000
+
+# Minimum seconds between checks for new blocks, reads in between are served from memory
+DEFAULT_POLL_INTERVAL = 2.0
+
+# Events that change what getDoctorDetails / getPatientDetails return, and the
+# address arguments naming the entries they affect. A new patient changes its
+# doctor's patientCount as well
+INVALIDATING_EVENTS = {
+    'DoctorRegistered': ('doctorAddress',),
+    'DoctorApproved': ('doctorAddress',),
+    'PatientRegistered': ('patientAddress', 'doctorAddress'),
+}
+
+# Getters that check msg.sender, their entries are kept per caller so a result
+# read by the admin or one doctor is never served to anyone else
+CALLER_RESTRICTED = ('getPatientDetails', 'getPatientsPage')
+
+# Events that change rows of getDoctorsPage, every cached doctor page is
+# dropped on them. A getPatientsPage page goes with its doctor's entries
+DOCTOR_PAGE_EVENTS = ('DoctorRegistered', 'DoctorApproved')
+
+
+class DetailsCache:
+    """Read-through LRU cache for getDoctorDetails / getPatientDetails and their paged getters.
+
+    Entries are keyed by (function, address, caller) and remember the block
+    they were read at. Pages are keyed by (function, address, caller, args),
+    the address being the patients' doctor or, for doctor pages, the contract.
+    The caller is only part of the key for CALLER_RESTRICTED getters. New
+    blocks are scanned for registry events and any entry whose address
+    appears in a later block is dropped.
+    """
+
+    def __init__(self, w3, contract, max_entries=DEFAULT_MAX_ENTRIES,
+                 poll_interval=DEFAULT_POLL_INTERVAL, block_range=DEFAULT_BLOCK_RANGE,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        self.w3 = w3
+        self.contract = contract
+        self.max_entries = max_entries
+        self.poll_interval = poll_interval
+        self.block_range = block_range
+        self.batch_size = batch_size
+        self.events = registry_events(contract, tuple(INVALIDATING_EVENTS))
+
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.last_block = None
+        self.last_poll = None
+        self.hits = 0
+        self.misses = 0
+
+    def poll_changes(self):
+        """Drop entries touched by events mined since the last check"""
+        now = time.monotonic()
+        with self.lock:
+            if self.last_poll is not None and now - self.last_poll < self.poll_interval:
+                return
+            self.last_poll = now
+            last_block = self.last_block
+
+        block = self.w3.eth.block_number
+        if last_block is None:
+            # Nothing can be cached before the first check
+            with self.lock:
+                if self.last_block is None:
+                    self.last_block = block
+            return
+        if block <= last_block:
+            return
+
+        entries = fetch_registry_events(
+            self.w3, self.contract, last_block + 1, block, self.block_range, self.events
+        )
+        with self.lock:
+            for entry in entries:
+                for field in INVALIDATING_EVENTS[entry['event']]:
+                    self._invalidate(entry['args'][field], entry['blockNumber'])
+                if entry['event'] in DOCTOR_PAGE_EVENTS:
+                    self._invalidate(self.contract.address, entry['blockNumber'])
+            self.last_block = max(self.last_block, block)
+
+    def _invalidate(self, address, block=None):
+        """Drop entries for an address, only those read before block when given"""
+        address = Web3.to_checksum_address(address)
+        for key in [key for key in self.entries if key[1] == address]:
+            if block is None or self.entries[key][0] < block:
+                del self.entries[key]
+
+    def invalidate(self, addresses):
+        """Drop entries for addresses changed by our own transactions, and all doctor pages"""
+        with self.lock:
+            for address in addresses:
+                self._invalidate(address)
+            self._invalidate(self.contract.address)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def _caller(self, fn_name, tx_params):
+        if fn_name not in CALLER_RESTRICTED:
+            return None
+        caller = (tx_params or {}).get('from')
+        return Web3.to_checksum_address(caller) if caller else None
+
+    def get_many(self, fn_name, addresses, tx_params=None):
+        """Return fn_name(address) for each address, fetching only missing entries in one batch.
+
+        A failed call yields a BatchCallError in its position and is not cached.
+        """
+        addresses = [Web3.to_checksum_address(address) for address in addresses]
+        caller = self._caller(fn_name, tx_params)
+        return self._read(
+            fn_name, [(fn_name, address, caller) for address in addresses],
+            [(address,) for address in addresses], tx_params
+        )
+
+    def get_pages(self, fn_name, args_list, tx_params=None):
+        """Return fn_name(*args) of a paged getter for each args, fetching only missing pages in one batch"""
+        caller = self._caller(fn_name, tx_params)
+        keys = []
+        for args in args_list:
+            args = tuple(args)
+            if fn_name == 'getPatientsPage':
+                args = (Web3.to_checksum_address(args[0]),) + args[1:]
+            address = args[0] if fn_name == 'getPatientsPage' else self.contract.address
+            keys.append((fn_name, address, caller, args))
+        return self._read(fn_name, keys, [key[3] for key in keys], tx_params)
+
+    def _read(self, fn_name, keys, args_list, tx_params):
+        """Serve keys from memory and batch the calls for the missing ones"""
+        self.poll_changes()
+        found = {}
+        missing = {}
+        with self.lock:
+            for key, args in zip(keys, args_list):
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    found[key] = self.entries[key][1]
+                    self.hits += 1
+                elif key not in missing:
+                    missing[key] = args
+                    self.misses += 1
+
+        if missing:
+            with self.lock:
+                read_block = self.last_block
+            fetched = batch_call(
+                self.w3, self.contract, fn_name, list(missing.values()),
+                tx_params=tx_params,
+                batch_size=self.batch_size
+            )
+            with self.lock:
+                for key, value in zip(missing, fetched):
+                    found[key] = value
+                    if isinstance(value, BatchCallError) or read_block is None:
+                        continue
+                    self.entries[key] = (read_block, value)
+                    self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+
+        return [found[key] for key in keys]
+
+    def get_doctor_details(self, doctor_address):
+        """Cached getDoctorDetails(doctor_address)"""
+        details = self.get_many('getDoctorDetails', [doctor_address])[0]
+        if isinstance(details, BatchCallError):
+            raise details
+        return details
+
+    def get_patient_details(self, patient_address, caller):
+        """Cached getPatientDetails(patient_address), called as caller"""
+        details = self.get_many('getPatientDetails', [patient_address], {'from': caller})[0]
+        if isinstance(details, BatchCallError):
+            raise details
+        return details
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
@@ -1,34 +1,96 @@
+import time
+
+# Measured from module import, the earliest point the GUI can see
+STARTUP_STARTED = time.perf_counter()
+
 import tkinter as tk
-from tkinter import ttk, messagebox
-import json
+from tkinter import ttk, messagebox, filedialog
 import os
-from web3 import Web3
+from concurrent.futures import TimeoutError as FutureTimeout
 from datetime import datetime
+from src.task_runner import TaskRunner, TaskCancelled
+from src.metrics import METRICS, format_stats
+from src.search_index import (
+    SearchIndex, DOCTOR_SEARCH_FIELDS, PATIENT_SEARCH_FIELDS, doctor_search_values, patient_search_values
+)
+from src.virtual_table import VirtualTable
+
+# web3 and the modules built on it take seconds to import. They are imported
+# inside the methods that need them, after the login screen is on screen
+
+# Receipt waits re-check for cancellation at this interval, in seconds
+RECEIPT_CHECK_INTERVAL = 1
 
 class MedicalInterface:
-    def __init__(self):
+    def __init__(self, network='local'):
         self.root = tk.Tk()
         self.root.title("Decentralized Medical System")
         self.root.geometry("1024x768")
 
-        # Blockchain connection
-        self.w3 = Web3(Web3.HTTPProvider("http://127.0.0.1:7545"))
-        if not self.w3.is_connected():
-            messagebox.showerror("Error", "Cannot connect to blockchain")
-            raise Exception("No blockchain connection")
+        # Blockchain connection, filled in by connect_blockchain in the background
+        self.network = network
+        self.service = None
+        self.first_paint_seconds = None
 
-        # Contract loading
-        self.load_contract()
-        
-        # Admin account
-        self.admin_account = self.w3.eth.accounts[0]
+        # Doctors with an approval transaction in flight
+        self.approving_doctors = set()
         
         # Setup styles
         self.setup_styles()
+
+        # Background work, results are delivered back on the Tk thread
+        self.create_status_bar()
+        self.tasks = TaskRunner(self.root, on_change=self.update_status_bar)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
         
         # Create login screen
         self.create_login_screen()
 
+        # Connect once the window has been drawn
+        self.root.after_idle(self.on_first_paint)
+
+    def on_first_paint(self):
+        """Record time to first paint and start connecting"""
+        self.first_paint_seconds = time.perf_counter() - STARTUP_STARTED
+        self.start_connection()
+
+    def start_connection(self):
+        """Connect to the blockchain on a worker thread"""
+        self.connection_label.config(text="Connecting to blockchain...")
+        self.reconnect_button.pack_forget()
+        self.tasks.submit(
+            "Connecting to blockchain",
+            self.connect_blockchain,
+            on_success=self.on_connected,
+            on_error=self.on_connection_failed,
+            metric='connect'
+        )
+
+    def connect_blockchain(self):
+        """Connect, load the contract and open the local index, runs on a worker thread"""
+        from src.registry_service import RegistryService
+        service = RegistryService.connect(self.network)
+        return service, service.block_number
+
+    def on_connected(self, connection):
+        """Store the connection once it is ready"""
+        service, block_number = connection
+        if self.service is not None:
+            self.service.close()
+        self.service = service
+        self.connection_label.config(text=f"Connected ({self.network}, block {block_number})")
+
+    def on_connection_failed(self, error):
+        """Show the connection error and offer to retry"""
+        self.connection_label.config(text="Not connected")
+        self.reconnect_button.pack(side='left', padx=5)
+        messagebox.showerror("Error", f"Cannot connect to blockchain: {str(error)}")
+
+    def require_connection(self):
+        """Raise if the blockchain connection is not ready yet"""
+        if self.service is None:
+            raise ValueError("Not connected to the blockchain yet, please wait")
+
     def setup_styles(self):
         """Setup GUI styles"""
         style = ttk.Style()
@@ -36,23 +98,119 @@ class MedicalInterface:
         style.configure('Header.TLabel', font=('Helvetica', 14, 'bold'))
         style.configure('Info.TLabel', font=('Helvetica', 10))
 
-    def load_contract(self):
-        """Load smart contract"""
-        try:
-            # Read ABI and contract address
-            with open('contracts/contract_abi.json', 'r') as f:
-                contract_abi = json.load(f)
-            with open('contracts/contract_address.txt', 'r') as f:
-                contract_address = f.read().strip()
-
-            # Create contract object
-            self.contract = self.w3.eth.contract(
-                address=contract_address,
-                abi=contract_abi
+    def create_status_bar(self):
+        """Create status bar showing operations in progress"""
+        self.status_frame = ttk.Frame(self.root, padding="5")
+        self.status_frame.pack(side='bottom', fill='x')
+
+        self.connection_label = ttk.Label(self.status_frame, text="Starting...", style='Info.TLabel')
+        self.connection_label.pack(side='left', padx=5)
+        self.reconnect_button = ttk.Button(self.status_frame,
+                                           text="Reconnect",
+                                           command=self.start_connection)
+
+        self.status_label = ttk.Label(self.status_frame, text="Ready", style='Info.TLabel')
+        self.status_label.pack(side='left', padx=5)
+        self.operations_button = ttk.Button(self.status_frame,
+                                            text="Operations",
+                                            command=self.show_pending_operations)
+        self.operations_button.pack(side='right', padx=5)
+        ttk.Button(self.status_frame,
+                   text="Stats",
+                   command=self.show_stats).pack(side='right', padx=5)
+
+    def update_status_bar(self, pending):
+        """Show pending operations in the status bar"""
+        if not pending:
+            self.status_label.config(text="Ready")
+        elif len(pending) == 1:
+            self.status_label.config(text=f"In progress: {pending[0].label}...")
+        else:
+            self.status_label.config(text=f"{len(pending)} operations in progress")
+
+    def show_pending_operations(self):
+        """Show pending operations with an option to cancel them"""
+        ops_window = tk.Toplevel(self.root)
+        ops_window.title("Operations in Progress")
+        ops_window.geometry("400x300")
+
+        frame = ttk.Frame(ops_window, padding="10")
+        frame.pack(fill='both', expand=True)
+
+        listbox = tk.Listbox(frame, selectmode=tk.EXTENDED)
+        listbox.pack(fill='both', expand=True)
+
+        tasks = list(self.tasks.pending.values())
+        for task in tasks:
+            listbox.insert(tk.END, task.label)
+
+        def cancel_selected():
+            for index in listbox.curselection():
+                tasks[index].cancel()
+            ops_window.destroy()
+
+        button_frame = ttk.Frame(frame)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text="Cancel Selected",
+                  command=cancel_selected).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Close",
+                  command=ops_window.destroy).pack(side='left', padx=5)
+
+    def show_stats(self):
+        """Show RPC, operation and cache statistics"""
+        stats_window = tk.Toplevel(self.root)
+        stats_window.title("Statistics")
+        stats_window.geometry("900x500")
+
+        frame = ttk.Frame(stats_window, padding="10")
+        frame.pack(fill='both', expand=True)
+
+        text = tk.Text(frame, font=('Courier', 9), wrap='none')
+        text.pack(fill='both', expand=True)
+
+        def refresh():
+            text.delete('1.0', tk.END)
+            text.insert(tk.END, format_stats(METRICS.snapshot()))
+
+        def save(kind):
+            path = filedialog.asksaveasfilename(
+                parent=stats_window,
+                defaultextension='.json' if kind == 'json' else '.prom',
+                filetypes=[("JSON", "*.json")] if kind == 'json' else [("Prometheus text", "*.prom *.txt")]
             )
-        except Exception as e:
-            messagebox.showerror("Error", f"Error loading contract: {str(e)}")
-            raise
+            if not path:
+                return
+            try:
+                with open(path, 'w') as f:
+                    f.write(METRICS.to_json() if kind == 'json' else METRICS.to_prometheus())
+            except OSError as e:
+                messagebox.showerror("Error", f"Error saving statistics: {str(e)}", parent=stats_window)
+
+        button_frame = ttk.Frame(frame)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text="Refresh", command=refresh).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Reset",
+                  command=lambda: (METRICS.reset(), refresh())).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Save JSON...",
+                  command=lambda: save('json')).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Save Prometheus...",
+                  command=lambda: save('prometheus')).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Close",
+                  command=stats_window.destroy).pack(side='left', padx=5)
+        refresh()
+
+    def wait_for_transaction(self, pending, cancel_event):
+        """Wait for a submitted transaction's receipt, runs on a worker thread"""
+        # Wait in short steps so a cancelled task stops waiting promptly,
+        # the sender gives up by itself after RECEIPT_TIMEOUT
+        while True:
+            if cancel_event.is_set():
+                tx_hash = pending.tx_hash.hex() if pending.tx_hash else "(not sent yet)"
+                raise TaskCancelled(f"Stopped waiting for transaction {tx_hash}")
+            try:
+                return pending.result(timeout=RECEIPT_CHECK_INTERVAL)
+            except FutureTimeout:
+                continue
 
     def create_login_screen(self):
         """Create login screen"""
@@ -100,26 +258,44 @@ class MedicalInterface:
     def handle_login(self):
         """Handle login process"""
         try:
+            self.require_connection()
+            from web3 import Web3
+
             address = self.wallet_address_entry.get().strip()
             if not Web3.is_address(address):
                 raise ValueError("Invalid wallet address")
 
             if self.user_type.get() == "admin":
-                if address.lower() == self.admin_account.lower():
+                if address.lower() == self.service.admin_account.lower():
                     self.show_admin_dashboard()
                 else:
                     raise ValueError("Unauthorized address for admin")
             else:
-                # Check doctor
-                doctor_details = self.contract.functions.getDoctorDetails(address).call()
-                if not doctor_details[3]:  # isRegistered
-                    raise ValueError("Doctor not registered in the system")
-                if not doctor_details[4]:  # isApproved
-                    raise ValueError("Doctor account not yet approved")
-                
-                # Save current account
-                self.current_doctor_address = address
-                self.show_doctor_dashboard(address, doctor_details)
+                # Check doctor in the background
+                address = Web3.to_checksum_address(address)
+                self.tasks.submit(
+                    "Checking doctor account",
+                    self.service.get_doctor_details,
+                    address,
+                    on_success=lambda details: self.complete_doctor_login(address, details),
+                    on_error=lambda e: messagebox.showerror("Error", str(e)),
+                    metric='login'
+                )
+
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+
+    def complete_doctor_login(self, address, doctor_details):
+        """Finish doctor login once account details are loaded"""
+        try:
+            if not doctor_details[3]:  # isRegistered
+                raise ValueError("Doctor not registered in the system")
+            if not doctor_details[4]:  # isApproved
+                raise ValueError("Doctor account not yet approved")
+
+            # Save current account
+            self.current_doctor_address = address
+            self.show_doctor_dashboard(address, doctor_details)
 
         except Exception as e:
             messagebox.showerror("Error", str(e))
@@ -164,23 +340,19 @@ class MedicalInterface:
         patients_frame = ttk.LabelFrame(parent_frame, text="Patients List", padding="10")
         patients_frame.pack(fill='both', expand=True, pady=10)
         
+        # Filtered from a local index, typing never goes back to the chain
+        self.patient_index = SearchIndex(PATIENT_SEARCH_FIELDS, extract=patient_search_values)
+        self.patient_rows = []
+        self.patient_query, self.patient_count_label = self.create_search_box(
+            patients_frame, "e.g. name, medical ID, or med:A123", self.apply_patient_filter
+        )
+
         columns = ('Address', 'Name', 'Age', 'Medical ID', 'Registration Date')
-        self.patients_tree = ttk.Treeview(patients_frame, 
-                                        columns=columns, 
-                                        show='headings',
-                                        height=10)
-        
-        for col in columns:
-            self.patients_tree.heading(col, text=col)
-            self.patients_tree.column(col, width=120)
-
-        scrollbar = ttk.Scrollbar(patients_frame, 
-                                orient=tk.VERTICAL,
-                                command=self.patients_tree.yview)
-        self.patients_tree.configure(yscrollcommand=scrollbar.set)
-        
-        self.patients_tree.pack(side='left', fill='both', expand=True)
-        scrollbar.pack(side='right', fill='y')
+        self.patients_table = VirtualTable(patients_frame,
+                                           columns,
+                                           formatter=self.format_patient_row,
+                                           height=10)
+        self.patients_table.frame.pack(fill='both', expand=True)
 
     def create_add_patient_form(self, parent_frame):
         """Create add patient form"""
@@ -213,6 +385,9 @@ class MedicalInterface:
         ttk.Button(buttons_frame, 
                   text="Add Patient",
                   command=self.add_new_patient).pack(side='left', padx=5)
+        ttk.Button(buttons_frame, 
+                  text="Import Patients...",
+                  command=self.import_patients).pack(side='left', padx=5)
         ttk.Button(buttons_frame, 
                   text="Refresh List",
                   command=self.refresh_patients_list).pack(side='left', padx=5)
@@ -230,30 +405,34 @@ class MedicalInterface:
         ttk.Label(main_frame, text="System Administration",
                  style='Title.TLabel').pack(pady=20)
         
-        # Doctors table
+        # Filtered from a local index, typing never goes back to the chain
+        self.doctor_index = SearchIndex(DOCTOR_SEARCH_FIELDS, extract=doctor_search_values)
+        self.doctor_rows = []
+        self.doctor_query, self.doctor_count_label = self.create_search_box(
+            main_frame, "e.g. name, license, spec:cardio, status:pending", self.apply_doctor_filter
+        )
+
+        # Doctors table, rows are added as it scrolls
         columns = ('Address', 'Name', 'Specialization', 'License Number', 'Status')
-        self.doctors_tree = ttk.Treeview(main_frame, columns=columns, show='headings')
-        
-        for col in columns:
-            self.doctors_tree.heading(col, text=col)
-            self.doctors_tree.column(col, width=150)
-        
-        # Scrollbar
-        scrollbar = ttk.Scrollbar(main_frame, orient=tk.VERTICAL,
-                                command=self.doctors_tree.yview)
-        self.doctors_tree.configure(yscrollcommand=scrollbar.set)
-        
-        self.doctors_tree.pack(side='left', fill='both', expand=True)
-        scrollbar.pack(side='right', fill='y')
+        self.doctors_table = VirtualTable(main_frame,
+                                          columns,
+                                          widths=[150] * len(columns),
+                                          formatter=self.format_doctor_row)
+        self.doctors_table.frame.pack(fill='both', expand=True)
         
         # Action buttons
         button_frame = ttk.Frame(main_frame)
         button_frame.pack(pady=10)
         
-        ttk.Button(button_frame, text="Approve Doctor",
+        ttk.Button(button_frame, text="Approve Selected",
                   command=self.approve_selected_doctor).pack(side='left', padx=5)
         ttk.Button(button_frame, text="Refresh List",
                   command=self.refresh_doctors_list).pack(side='left', padx=5)
+        # The approval queue: doctors registered but not yet approved
+        self.pending_only = tk.BooleanVar(value=False)
+        ttk.Checkbutton(button_frame, text="Pending approval only",
+                        variable=self.pending_only,
+                        command=self.refresh_doctors_list).pack(side='left', padx=5)
         ttk.Button(button_frame, text="Logout",
                   command=self.create_login_screen).pack(side='left', padx=5)
         
@@ -286,182 +465,309 @@ class MedicalInterface:
             entry.pack(pady=5)
             entries[field] = entry
             
+        def on_registered(receipt):
+            register_button.config(state='normal')
+            if receipt.status != 1:
+                messagebox.showerror("Error", "Transaction failed")
+                return
+            messagebox.showinfo("Success", "Registration successful! Waiting for admin approval")
+            if reg_window.winfo_exists():
+                reg_window.destroy()
+
+        def on_failed(e):
+            register_button.config(state='normal')
+            messagebox.showerror("Error", str(e))
+
         def register():
             try:
-                wallet = entries['wallet'].get().strip()
-                if not Web3.is_address(wallet):
-                    raise ValueError("Invalid wallet address")
-                    
-                if not all(entries[f].get().strip() for f in ['name', 'specialization', 'license', 'email']):
-                    raise ValueError("All fields must be filled")
-                
-                tx_hash = self.contract.functions.registerDoctor(
-                    wallet,
+                self.require_connection()
+                pending = self.service.register_doctor(
+                    entries['wallet'].get().strip(),
                     entries['name'].get().strip(),
                     entries['specialization'].get().strip(),
                     entries['license'].get().strip(),
                     entries['email'].get().strip()
-                ).transact({'from': self.admin_account})
-                
-                self.w3.eth.wait_for_transaction_receipt(tx_hash)
-                
-                messagebox.showinfo("Success", "Registration successful! Waiting for admin approval")
-                reg_window.destroy()
+                )
+
+                # Wait in the background, the window stays usable meanwhile
+                register_button.config(state='disabled')
+                self.tasks.submit(
+                    f"Registering doctor {entries['name'].get().strip()}",
+                    self.wait_for_transaction,
+                    pending,
+                    on_success=on_registered,
+                    on_error=on_failed,
+                    cancellable=True,
+                    metric='register_doctor'
+                )
                 
             except Exception as e:
                 messagebox.showerror("Error", str(e))
                 
-        ttk.Button(frame, text="Register", command=register).pack(pady=20)
+        register_button = ttk.Button(frame, text="Register", command=register)
+        register_button.pack(pady=20)
+
+    def create_search_box(self, parent, hint, on_change):
+        """Filter entry above a table, returns its variable and the match count label"""
+        search_frame = ttk.Frame(parent)
+        search_frame.pack(fill='x', pady=5)
+
+        ttk.Label(search_frame, text="Search:").pack(side='left')
+        query = tk.StringVar()
+        ttk.Entry(search_frame, textvariable=query, width=40).pack(side='left', padx=5)
+        ttk.Label(search_frame, text=hint, style='Info.TLabel').pack(side='left', padx=5)
+        count_label = ttk.Label(search_frame, text="", style='Info.TLabel')
+        count_label.pack(side='right', padx=5)
+
+        # Answered from the index on every keystroke
+        query.trace_add('write', lambda *args: on_change())
+        return query, count_label
+
+    def show_filtered_rows(self, table, count_label, index, rows, query, metric):
+        """Show the rows matching query and how many there are"""
+        with METRICS.timed(metric):
+            shown = index.filter(rows, query)
+        # Only rows that changed since the last refresh or filter touch the table
+        table.set_rows(shown)
+        count_label.config(text=f"{len(shown)} of {len(rows)}" if query.strip() else f"{len(rows)} total")
+
+    def load_indexed_rows(self, index, load, *args):
+        """Load rows and index them on the worker thread"""
+        rows = load(*args)
+        index.update(rows)
+        return rows
 
     def refresh_patients_list(self):
         """Refresh patients list"""
-        try:
-            # Clear table
-            for item in self.patients_tree.get_children():
-                self.patients_tree.delete(item)
-
-            # Get patients list
-            patients = self.contract.functions.getDoctorPatients(
-                self.current_doctor_address
-            ).call({
-                'from': self.current_doctor_address
-            })
-
-            # Display patients
-            for patient_address in patients:
-                try:
-                    details = self.contract.functions.getPatientDetails(
-                        patient_address
-                    ).call({
-                        'from': self.current_doctor_address
-                    })
-                    
-                    # Convert timestamp
-                    registration_date = datetime.fromtimestamp(
-                        details[4]
-                    ).strftime('%Y-%m-%d %H:%M')
-                    
-                    # Add to table
-                    self.patients_tree.insert('', 'end', values=(
-                        patient_address,
-                        details[0],  # name
-                        details[1],  # age
-                        details[2],  # medicalId
-                        registration_date
-                    ))
-                except Exception as e:
-                    print(f"Error loading patient details {patient_address}: {str(e)}")
-                    continue
-                    
-        except Exception as e:
-            messagebox.showerror("Error", f"Error loading patients list: {str(e)}")
+        self.tasks.submit(
+            "Loading patients",
+            self.load_indexed_rows,
+            self.patient_index,
+            self.service.patient_rows,
+            self.current_doctor_address,
+            on_success=self.show_patient_rows,
+            on_error=lambda e: messagebox.showerror("Error", f"Error loading patients list: {str(e)}"),
+            metric='refresh_patients'
+        )
+
+    def format_patient_row(self, patient):
+        """Table values for a patient row"""
+        address, name, age, medical_id, registered_at = patient
+
+        # Convert timestamp
+        registration_date = datetime.fromtimestamp(
+            registered_at
+        ).strftime('%Y-%m-%d %H:%M')
+
+        return (address, name, age, medical_id, registration_date)
+
+    def show_patient_rows(self, patients):
+        """Fill patients table"""
+        # The dashboard may have been closed while loading
+        if not self.patients_table.tree.winfo_exists():
+            return
+
+        self.patient_rows = patients
+        self.apply_patient_filter()
+
+    def apply_patient_filter(self):
+        """Show the patients matching the search box"""
+        self.show_filtered_rows(self.patients_table, self.patient_count_label, self.patient_index,
+                                self.patient_rows, self.patient_query.get(), 'search_patients')
 
     def refresh_doctors_list(self):
         """Refresh doctors list"""
-        try:
-            # Clear table
-            for item in self.doctors_tree.get_children():
-                self.doctors_tree.delete(item)
-
-            # Get doctors list
-            doctors = self.contract.functions.getAllDoctors().call()
-            
-            # Display doctors
-            for address in doctors:
-                details = self.contract.functions.getDoctorDetails(address).call()
-                status = "Approved" if details[4] else "Pending Approval"
-                
-                self.doctors_tree.insert('', 'end', values=(
-                    address,
-                    details[0],  # name
-                    details[1],  # specialization
-                    details[2],  # licenseNumber
-                    status
-                ))
-                
-        except Exception as e:
-            messagebox.showerror("Error", f"Error loading doctors list: {str(e)}")
+        self.tasks.submit(
+            "Loading doctors",
+            self.load_indexed_rows,
+            self.doctor_index,
+            self.service.doctor_rows,
+            self.pending_only.get(),
+            on_success=self.show_doctor_rows,
+            on_error=lambda e: messagebox.showerror("Error", f"Error loading doctors list: {str(e)}"),
+            metric='refresh_doctors'
+        )
+
+    def format_doctor_row(self, doctor):
+        """Table values for a doctor row"""
+        address, name, specialization, license_number, is_approved = doctor
+        if is_approved:
+            status = "Approved"
+        elif address in self.approving_doctors:
+            status = "Approving..."
+        else:
+            status = "Pending Approval"
+        return (address, name, specialization, license_number, status)
+
+    def show_doctor_rows(self, doctors):
+        """Fill doctors table"""
+        # The dashboard may have been closed while loading
+        if not self.doctors_table.tree.winfo_exists():
+            return
+
+        self.doctor_rows = doctors
+        self.apply_doctor_filter()
+
+    def apply_doctor_filter(self):
+        """Show the doctors matching the search box"""
+        self.show_filtered_rows(self.doctors_table, self.doctor_count_label, self.doctor_index,
+                                self.doctor_rows, self.doctor_query.get(), 'search_doctors')
 
     def add_new_patient(self):
         """Add new patient"""
         try:
-            # Input validation
-            wallet = self.patient_entries['wallet'].get().strip()
-            if not Web3.is_address(wallet):
-                raise ValueError("Invalid wallet address")
-            
-            age = self.patient_entries['age'].get().strip()
-            if not age.isdigit() or int(age) <= 0:
-                raise ValueError("Age must be a positive number")
-            
             name = self.patient_entries['name'].get().strip()
-            medical_id = self.patient_entries['medical_id'].get().strip()
-            
-            if not all([name, medical_id]):
-                raise ValueError("All fields must be filled")
-
-            # Send transaction
-            tx_hash = self.contract.functions.registerPatient(
-                wallet,
+            pending = self.service.register_patient(
+                self.current_doctor_address,
+                self.patient_entries['wallet'].get().strip(),
                 name,
-                int(age),
-                medical_id
-            ).transact({
-                'from': self.current_doctor_address,
-                'gas': 300000
-            })
-            
-            # Wait for confirmation
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
-            
-            if receipt.status == 1:
-                messagebox.showinfo("Success", "Patient added successfully")
-                
-                # Clear fields
-                for entry in self.patient_entries.values():
-                    entry.delete(0, tk.END)
-                    
-                # Refresh list
-                self.refresh_patients_list()
-            else:
-                raise Exception("Transaction failed")
+                self.patient_entries['age'].get().strip(),
+                self.patient_entries['medical_id'].get().strip()
+            )
+
+            # Clear fields so the next patient can be entered while this one is pending
+            for entry in self.patient_entries.values():
+                entry.delete(0, tk.END)
+
+            # Wait for the transaction in the background
+            self.tasks.submit(
+                f"Adding patient {name}",
+                self.wait_for_transaction,
+                pending,
+                on_success=lambda receipt: self.on_patient_added(name, receipt),
+                on_error=lambda e: messagebox.showerror("Error", f"Error adding patient {name}: {str(e)}"),
+                cancellable=True,
+                metric='add_patient'
+            )
                 
         except Exception as e:
             messagebox.showerror("Error", f"Error adding patient: {str(e)}")
 
+    def on_patient_added(self, name, receipt):
+        """Handle confirmed patient registration"""
+        if receipt.status == 1:
+            messagebox.showinfo("Success", f"Patient {name} added successfully")
+            self.refresh_patients_list()
+        else:
+            messagebox.showerror("Error", f"Error adding patient {name}: Transaction failed")
+
+    def import_patients(self):
+        """Register patients in bulk from a CSV or JSONL file"""
+        path = filedialog.askopenfilename(
+            title="Import Patients",
+            filetypes=[("Patient files", "*.csv *.jsonl"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+
+        importer = self.service.patient_importer(self.current_doctor_address)
+        self.tasks.submit(
+            f"Importing patients from {os.path.basename(path)}",
+            importer.run,
+            path,
+            on_success=self.on_patients_imported,
+            on_error=lambda e: messagebox.showerror("Error", f"Error importing patients: {str(e)}"),
+            cancellable=True,
+            metric='import_patients'
+        )
+
+    def on_patients_imported(self, results):
+        """Show import summary and per row problems"""
+        from src.bulk_import import summarize
+
+        counts = summarize(results)
+        lines = [f"{status}: {count}" for status, count in sorted(counts.items())]
+
+        problems = [r for r in results if r['error']]
+        if problems:
+            lines.append("")
+            lines.extend(f"Line {r['line']}: {r['error']}" for r in problems[:20])
+            if len(problems) > 20:
+                lines.append(f"... and {len(problems) - 20} more")
+
+        messagebox.showinfo("Import Finished", "\n".join(lines))
+        self.refresh_patients_list()
+
     def approve_selected_doctor(self):
-        """Approve selected doctor"""
+        """Approve selected doctors"""
         try:
-            selected = self.doctors_tree.selection()
+            selected = self.doctors_table.selected_keys()
             if not selected:
                 raise ValueError("Please select a doctor from the list")
-            
-            doctor_address = self.doctors_tree.item(selected[0])['values'][0]
-            
-            # Send approval transaction
-            tx_hash = self.contract.functions.approveDoctor(
-                doctor_address
-            ).transact({
-                'from': self.admin_account,
-                'gas': 200000
-            })
-            
-            # Wait for confirmation
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
-            
-            if receipt.status == 1:
-                messagebox.showinfo("Success", "Doctor approved successfully")
-                self.refresh_doctors_list()
-            else:
-                raise Exception("Transaction failed")
+
+            # Skip doctors already approved or on their way
+            approved = {row[0] for row in self.doctor_rows if row[4]}
+            selected = [address for address in selected
+                        if address not in approved and address not in self.approving_doctors]
+            if not selected:
+                raise ValueError("The selected doctors are already approved")
+
+            # Approvals are batched when the contract allows and all submitted at once,
+            # rows are updated in place as each receipt lands
+            for chunk, pending in self.service.approve_doctors(selected):
+                self.approving_doctors.update(chunk)
+                label = f"Approving doctor {chunk[0]}" if len(chunk) == 1 else f"Approving {len(chunk)} doctors"
+                self.tasks.submit(
+                    label,
+                    self.wait_for_transaction,
+                    pending,
+                    on_success=lambda receipt, chunk=chunk: self.on_doctors_approved(chunk, receipt),
+                    on_error=lambda e, chunk=chunk: self.on_approval_failed(chunk, e),
+                    on_cancel=lambda chunk=chunk: self.on_approval_cancelled(chunk),
+                    cancellable=True,
+                    metric='approve_doctors'
+                )
+            self.doctors_table.refresh(selected)
             
         except Exception as e:
             messagebox.showerror("Error", f"Error approving doctor: {str(e)}")
 
+    def on_doctors_approved(self, doctor_addresses, receipt):
+        """Handle confirmed doctor approvals"""
+        if receipt.status != 1:
+            self.on_approval_failed(doctor_addresses, Exception("Transaction failed"))
+            return
+        self.approving_doctors.difference_update(doctor_addresses)
+
+        # The dashboard may have been closed while waiting
+        if not self.doctors_table.tree.winfo_exists():
+            return
+
+        # Update the loaded rows instead of reloading every doctor
+        approved = set(doctor_addresses)
+        if self.pending_only.get():
+            doctors = [row for row in self.doctor_rows if row[0] not in approved]
+        else:
+            doctors = [(*row[:4], True) if row[0] in approved else row for row in self.doctor_rows]
+        self.doctor_index.update(doctors)
+        self.show_doctor_rows(doctors)
+
+    def on_approval_cancelled(self, doctor_addresses):
+        """Nobody waits for the receipt any more, show the rows as they were loaded"""
+        self.approving_doctors.difference_update(doctor_addresses)
+        if self.doctors_table.tree.winfo_exists():
+            self.doctors_table.refresh(doctor_addresses)
+
+    def on_approval_failed(self, doctor_addresses, error):
+        """Put failed approvals back to pending"""
+        self.approving_doctors.difference_update(doctor_addresses)
+        if self.doctors_table.tree.winfo_exists():
+            self.doctors_table.refresh(doctor_addresses)
+        messagebox.showerror("Error", f"Error approving doctor: {str(error)}")
+
     def clear_screen(self):
         """Clear screen"""
         for widget in self.root.winfo_children():
-            widget.destroy()
+            # The status bar stays across screens
+            if widget is not getattr(self, 'status_frame', None):
+                widget.destroy()
+
+    def close(self):
+        """Stop background work and close the window"""
+        self.tasks.shutdown()
+        if self.service is not None:
+            self.service.close()
+        self.root.destroy()
 
     def run(self):
         """Run application"""
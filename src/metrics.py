@@ -0,0 +1,249 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in seconds, shared by every timing
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        # One extra bucket for everything above the last bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'avg': self.sum / self.count if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'max': self.max,
+        }
+
+
+class Metrics:
+    """Thread-safe registry of RPC and operation timings, traffic and cache hit rates.
+
+    RPC calls are keyed by JSON-RPC method, batches count as one round trip
+    under 'batch' and the calls inside them are counted per method.
+    Operations are application level timings such as a dashboard refresh.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.caches = {}
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.rpc = {}
+            self.rpc_errors = {}
+            self.batched_calls = {}
+            self.bytes_sent = {}
+            self.bytes_received = {}
+            self.operations = {}
+            self.started_at = time.time()
+
+    def observe_rpc(self, method, seconds, error=False):
+        with self.lock:
+            self.rpc.setdefault(method, Histogram()).observe(seconds)
+        if error:
+            self.count_error(method)
+
+    def count_error(self, method):
+        with self.lock:
+            self.rpc_errors[method] = self.rpc_errors.get(method, 0) + 1
+
+    def count_batched(self, method, count=1):
+        with self.lock:
+            self.batched_calls[method] = self.batched_calls.get(method, 0) + count
+
+    def add_bytes(self, method, sent, received):
+        with self.lock:
+            self.bytes_sent[method] = self.bytes_sent.get(method, 0) + sent
+            self.bytes_received[method] = self.bytes_received.get(method, 0) + received
+
+    def observe(self, operation, seconds):
+        with self.lock:
+            self.operations.setdefault(operation, Histogram()).observe(seconds)
+
+    @contextmanager
+    def timed(self, operation):
+        """Record how long the with block takes under operation"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(operation, time.perf_counter() - start)
+
+    def register_cache(self, name, cache):
+        """Report hit rates of an object with hits and misses counters"""
+        with self.lock:
+            self.caches[name] = cache
+
+    def _cache_stats(self):
+        stats = {}
+        for name, cache in self.caches.items():
+            total = cache.hits + cache.misses
+            stats[name] = {'hits': cache.hits, 'misses': cache.misses,
+                           'hit_rate': cache.hits / total if total else None}
+        return stats
+
+    def snapshot(self):
+        """Everything recorded so far as plain data"""
+        with self.lock:
+            methods = set(self.rpc) | set(self.batched_calls) | set(self.bytes_sent)
+            return {
+                'since': self.started_at,
+                'rpc': {
+                    method: dict(
+                        self.rpc[method].summary() if method in self.rpc else {'count': 0},
+                        errors=self.rpc_errors.get(method, 0),
+                        batched_calls=self.batched_calls.get(method, 0),
+                        bytes_sent=self.bytes_sent.get(method, 0),
+                        bytes_received=self.bytes_received.get(method, 0),
+                    )
+                    for method in sorted(methods)
+                },
+                'operations': {name: histogram.summary() for name, histogram in sorted(self.operations.items())},
+                'caches': self._cache_stats(),
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        """Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            _histogram_lines(lines, 'medical_rpc_request_seconds', 'method', self.rpc,
+                             "JSON-RPC round trip time by method, batches under 'batch'")
+            _counter_lines(lines, 'medical_rpc_errors_total', 'method', self.rpc_errors,
+                           "JSON-RPC requests answered with an error")
+            _counter_lines(lines, 'medical_rpc_batched_calls_total', 'method', self.batched_calls,
+                           "Calls sent inside JSON-RPC batches")
+            _counter_lines(lines, 'medical_rpc_sent_bytes_total', 'method', self.bytes_sent,
+                           "Request bytes sent to the node")
+            _counter_lines(lines, 'medical_rpc_received_bytes_total', 'method', self.bytes_received,
+                           "Response bytes received from the node")
+            _histogram_lines(lines, 'medical_operation_seconds', 'operation', self.operations,
+                             "Application operation time")
+            caches = self._cache_stats()
+        _counter_lines(lines, 'medical_cache_hits_total', 'cache',
+                       {name: stats['hits'] for name, stats in caches.items()}, "Cache hits")
+        _counter_lines(lines, 'medical_cache_misses_total', 'cache',
+                       {name: stats['misses'] for name, stats in caches.items()}, "Cache misses")
+        return '\n'.join(lines) + '\n'
+
+
+def _label(name, value):
+    escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return f'{name}="{escaped}"'
+
+
+def _counter_lines(lines, metric, label, values, description):
+    lines.append(f"# HELP {metric} {description}")
+    lines.append(f"# TYPE {metric} counter")
+    for key, value in sorted(values.items()):
+        lines.append(f"{metric}{{{_label(label, key)}}} {value}")
+
+
+def _histogram_lines(lines, metric, label, histograms, description):
+    lines.append(f"# HELP {metric} {description}")
+    lines.append(f"# TYPE {metric} histogram")
+    for key, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{{_label(label, key)},le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{{_label(label, key)},le="+Inf"}} {histogram.count}')
+        lines.append(f"{metric}_sum{{{_label(label, key)}}} {histogram.sum}")
+        lines.append(f"{metric}_count{{{_label(label, key)}}} {histogram.count}")
+
+
+def _ms(seconds):
+    return '-' if seconds is None else f"{seconds * 1000:.1f}"
+
+
+def _size(count):
+    for unit in ('B', 'KB', 'MB'):
+        if count < 1024:
+            return f"{count:.0f}{unit}"
+        count /= 1024
+    return f"{count:.1f}GB"
+
+
+def format_stats(snapshot):
+    """Plain text tables of a snapshot, for the stats panel"""
+    lines = [f"{'RPC method':<32}{'calls':>8}{'batched':>9}{'errors':>8}{'avg ms':>9}{'p95 ms':>9}"
+             f"{'sent':>10}{'received':>10}"]
+    for method, stats in snapshot['rpc'].items():
+        lines.append(
+            f"{method:<32}{stats['count']:>8}{stats['batched_calls']:>9}{stats['errors']:>8}"
+            f"{_ms(stats.get('avg')):>9}{_ms(stats.get('p95')):>9}"
+            f"{_size(stats['bytes_sent']):>10}{_size(stats['bytes_received']):>10}"
+        )
+
+    lines.append('')
+    lines.append(f"{'Operation':<32}{'count':>8}{'avg ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}")
+    for name, stats in snapshot['operations'].items():
+        lines.append(
+            f"{name:<32}{stats['count']:>8}{_ms(stats['avg']):>9}{_ms(stats['p50']):>9}"
+            f"{_ms(stats['p95']):>9}{_ms(stats['max']):>9}"
+        )
+
+    lines.append('')
+    lines.append(f"{'Cache':<32}{'hits':>8}{'misses':>9}{'hit rate':>10}")
+    for name, stats in snapshot['caches'].items():
+        rate = '-' if stats['hit_rate'] is None else f"{stats['hit_rate']:.0%}"
+        lines.append(f"{name:<32}{stats['hits']:>8}{stats['misses']:>9}{rate:>10}")
+    return '\n'.join(lines)
+
+
+# Shared by everything in the process
+METRICS = Metrics()
+
+
+def metrics_middleware(make_request, w3):
+    """web3 middleware timing every request that goes through the provider, by method"""
+    def middleware(method, params):
+        start = time.perf_counter()
+        try:
+            response = make_request(method, params)
+        except Exception:
+            METRICS.observe_rpc(method, time.perf_counter() - start, error=True)
+            raise
+        METRICS.observe_rpc(method, time.perf_counter() - start, error='error' in response)
+        return response
+    return middleware
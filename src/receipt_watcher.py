@@ -0,0 +1,182 @@
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from hexbytes import HexBytes
+from web3 import Web3
+from web3._utils.method_formatters import receipt_formatter
+from web3.datastructures import AttributeDict
+from web3.exceptions import TimeExhausted
+
+from src.rpc_batch import send_batch, BatchCallError, DEFAULT_BATCH_SIZE
+
+# Seconds between checks for a new block while something is being watched
+POLL_INTERVAL = 1.0
+
+# Most blocks read in one pass after falling behind, older ones are covered by direct lookups
+MAX_BLOCKS_PER_POLL = 50
+
+# JSON-RPC error code of a node without the requested method
+METHOD_NOT_FOUND = -32601
+
+
+def format_receipt(raw):
+    """Turn a raw JSON-RPC receipt into what w3.eth.get_transaction_receipt returns"""
+    return AttributeDict.recursive(receipt_formatter(raw))
+
+
+class ReceiptWatcher:
+    """Follows new blocks with one poller and resolves receipt futures for watched transactions.
+
+    Each new block costs one eth_getBlockReceipts call, or on nodes without it
+    one block lookup plus receipt lookups for the watched hashes it contains,
+    so the load does not grow with the number of transactions in flight.
+    Newly watched hashes are looked up directly once, in a batch, in case they
+    were mined before the watcher saw their block.
+    """
+
+    def __init__(self, w3, poll_interval=POLL_INTERVAL, batch_size=DEFAULT_BATCH_SIZE):
+        self.w3 = w3
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = False
+        self.watched = {}
+        self.unchecked = set()
+        self.last_block = None
+        # None until the node has been asked once
+        self.block_receipts_supported = None
+        self.thread = None
+
+    def watch(self, tx_hash):
+        """Future resolving to the receipt of tx_hash, shared by all watchers of the hash"""
+        tx_hash = HexBytes(tx_hash)
+        with self.lock:
+            future = self.watched.get(tx_hash)
+            if future is None:
+                future = Future()
+                self.watched[tx_hash] = future
+                self.unchecked.add(tx_hash)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='receipt-watcher', daemon=True)
+                self.thread.start()
+        self.wakeup.set()
+        return future
+
+    def unwatch(self, tx_hash):
+        """Stop following a transaction, its future is cancelled if still pending"""
+        with self.lock:
+            future = self.watched.pop(HexBytes(tx_hash), None)
+            self.unchecked.discard(HexBytes(tx_hash))
+        if future is not None:
+            future.cancel()
+
+    def wait(self, tx_hash, timeout=None):
+        """Block until tx_hash is mined and return its receipt"""
+        tx_hash = HexBytes(tx_hash)
+        future = self.watch(tx_hash)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            self.unwatch(tx_hash)
+            raise TimeExhausted(
+                f"Transaction {Web3.to_hex(tx_hash)} is not in the chain after {timeout} seconds"
+            )
+
+    def close(self):
+        self.stopped = True
+        self.wakeup.set()
+
+    def _run(self):
+        while not self.stopped:
+            with self.lock:
+                if not self.watched:
+                    # Exit when idle, watch() starts a new thread
+                    self.thread = None
+                    self.last_block = None
+                    return
+            try:
+                self._poll()
+            except Exception as e:
+                # Keep going, the node may be briefly unreachable
+                print(f"Receipt watcher poll failed: {str(e)}")
+            self.wakeup.wait(self.poll_interval)
+            self.wakeup.clear()
+
+    def _poll(self):
+        # Read the head first: anything mined later is in a block after it
+        head = self.w3.eth.block_number
+
+        with self.lock:
+            unchecked = list(self.unchecked)
+            self.unchecked.clear()
+        if unchecked:
+            self._resolve(self._fetch_receipts(unchecked))
+
+        if self.last_block is None:
+            # Anything mined up to here was covered by the direct lookups
+            self.last_block = head
+            return
+        if head <= self.last_block:
+            return
+
+        first = max(self.last_block + 1, head - MAX_BLOCKS_PER_POLL + 1)
+        if first > self.last_block + 1:
+            # Fell far behind, look up everything still watched directly
+            with self.lock:
+                self.unchecked.update(self.watched)
+        self._resolve(self._block_receipts(range(first, head + 1)))
+        self.last_block = head
+
+    def _block_receipts(self, block_numbers):
+        """Receipts of watched transactions mined in these blocks"""
+        if self.block_receipts_supported is not False:
+            results = send_batch(
+                self.w3, [('eth_getBlockReceipts', [hex(number)]) for number in block_numbers],
+                self.batch_size
+            )
+            errors = [result for result in results if isinstance(result, BatchCallError)]
+            if not errors:
+                self.block_receipts_supported = True
+                with self.lock:
+                    watched = set(self.watched)
+                return {
+                    HexBytes(raw['transactionHash']): format_receipt(raw)
+                    for receipts in results for raw in receipts or []
+                    if HexBytes(raw['transactionHash']) in watched
+                }
+            if not any(error.code == METHOD_NOT_FOUND for error in errors):
+                # Anything else may be transient, the next poll reads these blocks again
+                raise errors[0]
+            self.block_receipts_supported = False
+
+        # Nodes without eth_getBlockReceipts: read the block's hashes, then only our receipts
+        blocks = send_batch(
+            self.w3, [('eth_getBlockByNumber', [hex(number), False]) for number in block_numbers],
+            self.batch_size
+        )
+        with self.lock:
+            watched = set(self.watched)
+        mined = []
+        for block in blocks:
+            if isinstance(block, BatchCallError):
+                raise block
+            mined.extend(tx_hash for tx_hash in map(HexBytes, block['transactions']) if tx_hash in watched)
+        return self._fetch_receipts(mined)
+
+    def _fetch_receipts(self, tx_hashes):
+        """Direct receipt lookups in one batch, missing receipts are left out"""
+        calls = [('eth_getTransactionReceipt', [Web3.to_hex(tx_hash)]) for tx_hash in tx_hashes]
+        receipts = {}
+        for tx_hash, raw in zip(tx_hashes, send_batch(self.w3, calls, self.batch_size)):
+            if raw and not isinstance(raw, BatchCallError):
+                receipts[tx_hash] = format_receipt(raw)
+        return receipts
+
+    def _resolve(self, receipts):
+        for tx_hash, receipt in receipts.items():
+            with self.lock:
+                future = self.watched.pop(tx_hash, None)
+            if future is not None and not future.done():
+                future.set_result(receipt)
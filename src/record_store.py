@@ -0,0 +1,137 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from cryptography.fernet import Fernet, InvalidToken
+from web3 import Web3
+
+DATA_DIR = Path(__file__).resolve().parent.parent / 'data'
+DEFAULT_KEY_PATH = DATA_DIR / 'encryption.key'
+DEFAULT_STORE_PATH = DATA_DIR / 'patient_records.sqlite'
+
+# Fields kept off chain, encrypted
+RECORD_FIELDS = ('name', 'age', 'medicalId')
+
+# SQLite limits the number of parameters per statement
+LOOKUP_CHUNK = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    record_hash TEXT PRIMARY KEY,
+    patient_address TEXT NOT NULL,
+    doctor_address TEXT NOT NULL,
+    ciphertext BLOB NOT NULL,
+    created_at INTEGER NOT NULL
+);
+"""
+
+
+class RecordIntegrityError(Exception):
+    """A stored record does not match its hash or cannot be decrypted with the key"""
+
+
+def record_key(record_hash):
+    """Lowercase hex form of a record hash given as bytes or hex"""
+    if isinstance(record_hash, (bytes, bytearray)):
+        return Web3.to_hex(record_hash)
+    return Web3.to_hex(hexstr=record_hash)
+
+
+def load_key(path=DEFAULT_KEY_PATH):
+    """Fernet key from a key file"""
+    with open(path, 'rb') as f:
+        return f.read().strip()
+
+
+class RecordStore:
+    """Encrypted patient records kept locally, addressed by the hash committed on chain.
+
+    Records are Fernet-encrypted JSON. Their hash is keccak256 of the
+    ciphertext, so the commitment reveals nothing about the content and a
+    record read back can be checked against the chain. Rows are never
+    replaced.
+    """
+
+    def __init__(self, db_path=DEFAULT_STORE_PATH, key_path=DEFAULT_KEY_PATH):
+        self.fernet = Fernet(load_key(key_path))
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def encrypt(self, record):
+        """(record hash hex, ciphertext) for a record dict"""
+        plaintext = json.dumps(
+            {field: record[field] for field in RECORD_FIELDS}, separators=(',', ':')
+        ).encode('utf-8')
+        ciphertext = self.fernet.encrypt(plaintext)
+        return Web3.to_hex(Web3.keccak(ciphertext)), ciphertext
+
+    def encrypt_many(self, items):
+        """Encrypted rows for (patient address, doctor address, record) items, not yet stored.
+
+        The first field of each row is the record hash. Callers that commit the
+        hashes on chain store the rows with insert() once the transaction succeeds.
+        """
+        rows = []
+        for patient_address, doctor_address, record in items:
+            record_hash, ciphertext = self.encrypt(record)
+            rows.append((record_hash, Web3.to_checksum_address(patient_address),
+                         Web3.to_checksum_address(doctor_address), ciphertext, int(time.time())))
+        return rows
+
+    def insert(self, rows):
+        """Store rows from encrypt_many()"""
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO records VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self.db.commit()
+
+    def delete(self, record_hashes):
+        """Remove records whose commitment never made it on chain"""
+        with self.lock:
+            self.db.executemany(
+                "DELETE FROM records WHERE record_hash = ?",
+                [(record_key(record_hash),) for record_hash in record_hashes]
+            )
+            self.db.commit()
+
+    def put_many(self, items):
+        """Encrypt and store (patient address, doctor address, record) items, returns their hashes"""
+        rows = self.encrypt_many(items)
+        self.insert(rows)
+        return [row[0] for row in rows]
+
+    def put(self, patient_address, doctor_address, record):
+        return self.put_many([(patient_address, doctor_address, record)])[0]
+
+    def get_many(self, record_hashes):
+        """Decrypted records by hash, hashes not stored here are left out"""
+        record_hashes = list({record_key(record_hash) for record_hash in record_hashes if record_hash})
+        stored = []
+        with self.lock:
+            for start in range(0, len(record_hashes), LOOKUP_CHUNK):
+                chunk = record_hashes[start:start + LOOKUP_CHUNK]
+                stored.extend(self.db.execute(
+                    "SELECT record_hash, ciphertext FROM records "
+                    f"WHERE record_hash IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall())
+
+        records = {}
+        for record_hash, ciphertext in stored:
+            if Web3.to_hex(Web3.keccak(ciphertext)) != record_hash:
+                raise RecordIntegrityError(f"Record {record_hash} does not match its hash")
+            try:
+                records[record_hash] = json.loads(self.fernet.decrypt(ciphertext))
+            except InvalidToken:
+                raise RecordIntegrityError(f"Record {record_hash} cannot be decrypted with this key")
+        return records
@@ -0,0 +1,315 @@
+import argparse
+import asyncio
+import hmac
+import os
+
+from aiohttp import web
+from web3 import Web3
+
+from src.metrics import METRICS
+from src.registry_reader import DEFAULT_PAGE_SIZE
+from src.registry_service import RegistryService
+from src.tx_sender import TransactionRejected
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+
+# Largest page a client can ask for
+MAX_PAGE_LIMIT = 1000
+
+# Bulk registration bodies can be large
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+
+SERVICE_KEY = web.AppKey('service', RegistryService)
+TOKENS_KEY = web.AppKey('tokens', dict)
+
+# Routes anyone can read, everything else needs a bearer token
+PUBLIC_ROUTES = ('/status', '/metrics')
+
+DOCTOR_COLUMNS = ('address', 'name', 'specialization', 'licenseNumber', 'isApproved')
+PATIENT_COLUMNS = ('address', 'name', 'age', 'medicalId', 'registrationDate')
+
+
+def _page_params(request):
+    try:
+        offset = int(request.query.get('offset', 0))
+        limit = int(request.query.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("offset and limit must be integers")
+    if offset < 0 or not 0 < limit <= MAX_PAGE_LIMIT:
+        raise ValueError(f"offset must be >= 0 and limit between 1 and {MAX_PAGE_LIMIT}")
+    return offset, limit
+
+
+def _page(offset, limit, total, rows, columns, key):
+    return {
+        'total': total,
+        'offset': offset,
+        'limit': limit,
+        key: [dict(zip(columns, row)) for row in rows],
+    }
+
+
+def _tx_hash(tx_hash):
+    return Web3.to_hex(tx_hash) if tx_hash else None
+
+
+async def _outcome(pending):
+    """Receipt summary of a PendingTransaction, or its error"""
+    try:
+        receipt = await asyncio.wrap_future(pending.future)
+    except Exception as e:
+        return {'txHash': _tx_hash(pending.tx_hash), 'status': None, 'error': str(e)}
+    return {
+        'txHash': _tx_hash(receipt['transactionHash']),
+        'status': receipt['status'],
+        'blockNumber': receipt['blockNumber'],
+        'gasUsed': receipt['gasUsed'],
+        'error': None if receipt['status'] == 1 else "Transaction failed",
+    }
+
+
+async def _run(fn, *args):
+    """Run blocking service calls off the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+async def _json_body(request, field):
+    body = await request.json()
+    items = body.get(field) if isinstance(body, dict) else None
+    if not isinstance(items, list):
+        raise ValueError(f"Body must be a JSON object with a '{field}' list")
+    return items
+
+
+# Authentication
+
+def parse_api_tokens(value):
+    """Map tokens to accounts from 'token=address,token=address'"""
+    tokens = {}
+    for item in filter(None, (part.strip() for part in (value or '').split(','))):
+        token, _, address = item.partition('=')
+        if not token or not Web3.is_address(address.strip()):
+            raise ValueError("API tokens must be given as token=address pairs")
+        tokens[token] = Web3.to_checksum_address(address.strip())
+    return tokens
+
+
+def _token_account(tokens, token):
+    """Account of a bearer token, every token is compared in constant time"""
+    account = None
+    for known, address in tokens.items():
+        if hmac.compare_digest(known.encode('utf-8'), token.encode('utf-8')):
+            account = address
+    return account
+
+
+def _forbidden(message):
+    return web.HTTPForbidden(text=f'{{"error": "{message}"}}', content_type='application/json')
+
+
+def _require_admin(request):
+    if request['caller'] != request.app[SERVICE_KEY].admin_account:
+        raise _forbidden("Admin only")
+
+
+@web.middleware
+async def auth_middleware(request, handler):
+    """Resolve the caller's account from its bearer token, it signs and reads as that account"""
+    if request.path in PUBLIC_ROUTES:
+        return await handler(request)
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    account = _token_account(request.app[TOKENS_KEY], token.strip()) if scheme.lower() == 'bearer' else None
+    if account is None:
+        raise web.HTTPUnauthorized(
+            text='{"error": "A valid bearer token is required"}', content_type='application/json',
+            headers={'WWW-Authenticate': 'Bearer'}
+        )
+    request['caller'] = account
+    return await handler(request)
+
+
+@web.middleware
+async def error_middleware(request, handler):
+    """Invalid input is a 400, a forbidden read a 403, anything else a 500, all as JSON.
+    Requests are timed per route"""
+    resource = request.match_info.route.resource
+    route = resource.canonical if resource is not None else 'unmatched'
+    try:
+        with METRICS.timed(f"api {request.method} {route}"):
+            return await handler(request)
+    except web.HTTPException:
+        raise
+    except (ValueError, TransactionRejected) as e:
+        return web.json_response({'error': str(e)}, status=400)
+    except PermissionError as e:
+        return web.json_response({'error': str(e)}, status=403)
+    except Exception as e:
+        print(f"Error handling {request.method} {request.path}: {str(e)}")
+        return web.json_response({'error': str(e)}, status=500)
+
+
+async def get_status(request):
+    service = request.app[SERVICE_KEY]
+    return web.json_response({
+        'network': service.network,
+        'contract': service.contract.address,
+        'blockNumber': await _run(lambda: service.block_number),
+        'indexed': service.indexer is not None,
+        'cacheHitRate': service.details_cache.hit_rate,
+    })
+
+
+async def list_doctors(request):
+    """All doctors, or with ?pending=true only those waiting for approval"""
+    pending_only = request.query.get('pending', '').lower() in ('1', 'true', 'yes')
+    offset, limit = _page_params(request)
+    total, rows = await _run(request.app[SERVICE_KEY].doctors_page, offset, limit, pending_only)
+    return web.json_response(_page(offset, limit, total, rows, DOCTOR_COLUMNS, 'doctors'))
+
+
+async def get_doctor(request):
+    address = request.match_info['address']
+    if not Web3.is_address(address):
+        raise ValueError("Invalid doctor address")
+    details = await _run(request.app[SERVICE_KEY].get_doctor_details, address)
+    name, specialization, license_number, is_registered, is_approved = details[:5]
+    if not is_registered:
+        raise web.HTTPNotFound(text='{"error": "Doctor not registered"}', content_type='application/json')
+    return web.json_response({
+        'address': Web3.to_checksum_address(address),
+        'name': name,
+        'specialization': specialization,
+        'licenseNumber': license_number,
+        'isApproved': is_approved,
+    })
+
+
+async def list_patients(request):
+    """A doctor's patients, for the admin or that doctor"""
+    address = request.match_info['address']
+    if not Web3.is_address(address):
+        raise ValueError("Invalid doctor address")
+    offset, limit = _page_params(request)
+    total, rows = await _run(request.app[SERVICE_KEY].patients_page, address, offset, limit, request['caller'])
+    return web.json_response(_page(offset, limit, total, rows, PATIENT_COLUMNS, 'patients'))
+
+
+async def register_doctors(request):
+    """Register many doctors, all transactions are in flight at once"""
+    _require_admin(request)
+    service = request.app[SERVICE_KEY]
+    doctors = await _json_body(request, 'doctors')
+
+    submitted = []
+    for doctor in doctors:
+        try:
+            if not isinstance(doctor, dict):
+                raise ValueError("Each doctor must be a JSON object")
+            pending = service.register_doctor(
+                doctor.get('wallet'), doctor.get('name'), doctor.get('specialization'),
+                doctor.get('licenseNumber'), doctor.get('email')
+            )
+        except ValueError as e:
+            submitted.append(({'wallet': doctor.get('wallet') if isinstance(doctor, dict) else None}, e))
+            continue
+        submitted.append(({'wallet': doctor['wallet']}, pending))
+
+    results = []
+    for item, pending in submitted:
+        if isinstance(pending, Exception):
+            results.append(dict(item, txHash=None, status=None, error=str(pending)))
+        else:
+            results.append(dict(item, **await _outcome(pending)))
+    return web.json_response({'results': results})
+
+
+async def approve_doctors(request):
+    """Approve doctors, batched into as few transactions as the contract allows"""
+    _require_admin(request)
+    addresses = await _json_body(request, 'addresses')
+    submitted = request.app[SERVICE_KEY].approve_doctors(addresses)
+    outcomes = await asyncio.gather(*[_outcome(pending) for _, pending in submitted])
+    return web.json_response({
+        'results': [dict(outcome, addresses=chunk) for (chunk, _), outcome in zip(submitted, outcomes)]
+    })
+
+
+async def register_patients(request):
+    """Register many patients for a doctor, batched and pipelined like the file import.
+
+    Sent from the caller's account, which must be the doctor in the URL.
+    """
+    address = request.match_info['address']
+    if not Web3.is_address(address):
+        raise ValueError("Invalid doctor address")
+    if Web3.to_checksum_address(address) != request['caller']:
+        raise _forbidden("Patients can only be registered by their doctor")
+    patients = await _json_body(request, 'patients')
+    if not all(isinstance(patient, dict) for patient in patients):
+        raise ValueError("Each patient must be a JSON object")
+
+    results = await _run(request.app[SERVICE_KEY].register_patients, request['caller'], patients)
+    return web.json_response({
+        'results': [
+            {
+                'index': result['line'] - 1,
+                'wallet': result['wallet'],
+                'status': result['status'],
+                'txHash': _tx_hash(result['tx_hash']),
+                'error': result['error'],
+            }
+            for result in results
+        ]
+    })
+
+
+async def get_metrics(request):
+    """Prometheus text format, or JSON with ?format=json"""
+    if request.query.get('format') == 'json':
+        return web.json_response(METRICS.snapshot())
+    return web.Response(text=METRICS.to_prometheus(), content_type='text/plain', charset='utf-8')
+
+
+def create_app(service, tokens):
+    """aiohttp application serving the registry through service.
+
+    tokens maps bearer tokens to the accounts their callers act as.
+    """
+    app = web.Application(middlewares=[auth_middleware, error_middleware], client_max_size=MAX_REQUEST_BYTES)
+    app[SERVICE_KEY] = service
+    app[TOKENS_KEY] = tokens
+    app.router.add_get('/status', get_status)
+    app.router.add_get('/metrics', get_metrics)
+    app.router.add_get('/doctors', list_doctors)
+    app.router.add_post('/doctors', register_doctors)
+    app.router.add_post('/doctors/approve', approve_doctors)
+    app.router.add_get('/doctors/{address}', get_doctor)
+    app.router.add_get('/doctors/{address}/patients', list_patients)
+    app.router.add_post('/doctors/{address}/patients', register_patients)
+    return app
+
+
+def main():
+    """Serve the registry over HTTP (run with: python -m src.registry_api)"""
+    parser = argparse.ArgumentParser(description="Local HTTP API for the medical registry")
+    parser.add_argument('--network', default='local')
+    parser.add_argument('--host', default=DEFAULT_HOST,
+                        help="Writes are signed with the keys in the environment, keep this local")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    # One token per caller, e.g. REGISTRY_API_TOKENS="admin-token=0x...,doctor-token=0x..."
+    tokens = parse_api_tokens(os.getenv('REGISTRY_API_TOKENS'))
+    if not tokens:
+        parser.error("Set REGISTRY_API_TOKENS to token=address pairs, one per caller")
+
+    service = RegistryService.connect(args.network)
+    try:
+        web.run_app(create_app(service, tokens), host=args.host, port=args.port)
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+import csv
+import json
+import os
+from pathlib import Path
+
+from web3 import Web3
+
+from src.record_store import record_key
+from src.registry_reader import has_function, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from src.registry_writer import chunked, supports_records
+from src.rpc_batch import batch_call, BatchCallError, DEFAULT_BATCH_SIZE
+
+DOCTOR_FIELDS = ('address', 'name', 'specialization', 'licenseNumber', 'isApproved', 'patientCount')
+PATIENT_FIELDS = ('doctorAddress', 'address', 'name', 'age', 'medicalId', 'registrationDate', 'recordHash')
+DATASET_FIELDS = {'doctors': DOCTOR_FIELDS, 'patients': PATIENT_FIELDS}
+
+EXPORT_FORMATS = ('csv', 'jsonl', 'parquet')
+
+# Page calls sent per round trip, bounds how many rows are held at once
+PAGES_PER_REQUEST = 5
+
+# Parquet rows are buffered into parts of this size, each part is a checkpoint
+PARQUET_ROWS_PER_PART = 50000
+
+# pyarrow types of the non-string columns, every part file gets the same schema
+# even when a column is all empty in it
+PARQUET_TYPES = {'isApproved': 'bool_', 'patientCount': 'int64', 'age': 'int64', 'registrationDate': 'int64'}
+
+
+def raise_errors(results, what):
+    for result in results:
+        if isinstance(result, BatchCallError):
+            raise Exception(f"Error loading {what}: {str(result)}")
+    return results
+
+
+def check_page_size(page_size):
+    """Reject page sizes the contract would revert on, before anything is read"""
+    if not 0 < page_size <= MAX_PAGE_SIZE:
+        raise ValueError(f"Page size must be between 1 and {MAX_PAGE_SIZE}, got {page_size}")
+
+
+# Sources: generators of (position to resume from, rows)
+
+def doctor_pages(w3, contract, caller, start=0, page_size=DEFAULT_PAGE_SIZE, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield (next offset, doctor rows) from the contract, a few pages per round trip.
+
+    The doctor list only grows at the end, so an offset stays valid between runs.
+    """
+    check_page_size(page_size)
+    tx_params = {'from': caller}
+    if not has_function(contract, 'getDoctorsPage'):
+        yield from _legacy_doctor_pages(w3, contract, start, page_size, batch_size)
+        return
+
+    total = contract.functions.getDoctorCount().call()
+    step = page_size * PAGES_PER_REQUEST
+    for offset in range(start or 0, total, step):
+        offsets = range(offset, min(offset + step, total), page_size)
+        pages = raise_errors(batch_call(
+            w3, contract, 'getDoctorsPage', [(page_offset, page_size) for page_offset in offsets],
+            batch_size=batch_size
+        ), "doctors page")
+
+        for page_offset, page in zip(offsets, pages):
+            rows = list(zip(*page))
+            counts = raise_errors(batch_call(
+                w3, contract, 'getDoctorPatientCount', [(row[0],) for row in rows],
+                tx_params=tx_params, batch_size=batch_size
+            ), "patient counts")
+            yield page_offset + len(rows), [
+                dict(zip(DOCTOR_FIELDS, (*row, count))) for row, count in zip(rows, counts)
+            ]
+
+
+def _legacy_doctor_pages(w3, contract, start, page_size, batch_size):
+    """Contracts deployed before paging: the address list, then batched details"""
+    addresses = contract.functions.getAllDoctors().call()
+    for offset in range(start or 0, len(addresses), page_size):
+        page = addresses[offset:offset + page_size]
+        details = raise_errors(batch_call(
+            w3, contract, 'getDoctorDetails', [(address,) for address in page], batch_size=batch_size
+        ), "doctor details")
+        yield offset + len(page), [
+            dict(zip(DOCTOR_FIELDS, (address, d[0], d[1], d[2], d[4], d[5])))
+            for address, d in zip(page, details)
+        ]
+
+
+def patient_pages(w3, contract, caller, start=None, page_size=DEFAULT_PAGE_SIZE,
+                  batch_size=DEFAULT_BATCH_SIZE):
+    """Yield ([doctor index, patient offset], patient rows) for every doctor's patients.
+
+    caller must be the admin, patient reads are restricted to the admin and
+    the patient's doctor. Patients registered by record hash have no details
+    on chain, their rows carry the recordHash instead.
+    """
+    check_page_size(page_size)
+    doctor_index, patient_offset = start or (0, 0)
+    tx_params = {'from': caller}
+    paged = has_function(contract, 'getPatientsPage')
+    records = supports_records(contract)
+
+    for next_doctor, doctors in doctor_pages(w3, contract, caller, doctor_index, page_size, batch_size):
+        first_index = next_doctor - len(doctors)
+        tasks = []
+        for index, doctor in enumerate(doctors, start=first_index):
+            first = patient_offset if index == doctor_index else 0
+            if paged:
+                tasks.extend((index, doctor['address'], offset)
+                             for offset in range(first, doctor['patientCount'], page_size))
+            elif first < doctor['patientCount']:
+                # Contracts deployed before paging: one doctor at a time
+                for next_offset, rows in _legacy_patient_pages(
+                        w3, contract, doctor['address'], first, tx_params, page_size, batch_size):
+                    yield [index, next_offset], rows
+
+        # Pages of several doctors share a round trip
+        for chunk in chunked(tasks, PAGES_PER_REQUEST):
+            pages = raise_errors(batch_call(
+                w3, contract, 'getPatientsPage',
+                [(doctor_address, offset, page_size) for _, doctor_address, offset in chunk],
+                tx_params=tx_params, batch_size=batch_size
+            ), "patients page")
+            rows = []
+            for (_, doctor_address, _), page in zip(chunk, pages):
+                rows.extend(dict(zip(PATIENT_FIELDS, (doctor_address, *row, None))) for row in zip(*page))
+            if records:
+                add_record_hashes(w3, contract, caller, rows, batch_size)
+            index, _, offset = chunk[-1]
+            yield [index, offset + page_size], rows
+
+        # Every doctor of this page is done
+        yield [next_doctor, 0], []
+
+
+def _legacy_patient_pages(w3, contract, doctor_address, start, tx_params, page_size, batch_size):
+    addresses = contract.functions.getDoctorPatients(doctor_address).call(tx_params)
+    for offset in range(start, len(addresses), page_size):
+        page = addresses[offset:offset + page_size]
+        details = raise_errors(batch_call(
+            w3, contract, 'getPatientDetails', [(address,) for address in page],
+            tx_params=tx_params, batch_size=batch_size
+        ), "patient details")
+        yield offset + len(page), [
+            dict(zip(PATIENT_FIELDS, (doctor_address, address, d[0], d[1], d[2], d[4], None)))
+            for address, d in zip(page, details)
+        ]
+
+
+def add_record_hashes(w3, contract, caller, patients, batch_size=DEFAULT_BATCH_SIZE):
+    """Set recordHash on patients registered by record hash, one batched pass"""
+    hashed = [patient for patient in patients if not patient['name'] and not patient['medicalId']]
+    if not hashed:
+        return
+    details = raise_errors(batch_call(
+        w3, contract, 'getPatientDetails', [(patient['address'],) for patient in hashed],
+        tx_params={'from': caller}, batch_size=batch_size
+    ), "patient details")
+    for patient, patient_details in zip(hashed, details):
+        if any(patient_details[5]):
+            patient['recordHash'] = Web3.to_hex(patient_details[5])
+
+
+def decrypted_pages(pages, record_store):
+    """Fill in name, age and medical ID of record-hash patients from record_store.
+
+    Records missing from the local store keep their blank fields and recordHash.
+    """
+    for position, rows in pages:
+        hashed = [row for row in rows if row.get('recordHash')]
+        records = record_store.get_many([row['recordHash'] for row in hashed]) if hashed else {}
+        for row in hashed:
+            record = records.get(record_key(row['recordHash']))
+            if record is not None:
+                row.update(name=record['name'], age=record['age'], medicalId=record['medicalId'])
+        yield position, rows
+
+
+def index_pages(indexer, dataset, start=0, page_size=DEFAULT_PAGE_SIZE):
+    """Yield (next offset, rows) from the local event index, synced once at the start"""
+    indexer.sync()
+    read_page = indexer.get_doctors_page if dataset == 'doctors' else indexer.get_all_patients_page
+    fields = DATASET_FIELDS[dataset]
+    offset = start or 0
+    while True:
+        rows = read_page(offset, page_size)
+        if not rows:
+            return
+        offset += len(rows)
+        yield offset, [dict(zip(fields, row)) for row in rows]
+
+
+# Writers: rows are appended, flush() makes them durable and returns the state to resume from
+
+class CsvExportWriter:
+    def __init__(self, path, fields, state=None):
+        self.fields = fields
+        self.file = _open_for_resume(path, state)
+        self.writer = csv.DictWriter(self.file, fieldnames=fields)
+        if state is None:
+            self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def flush(self):
+        return {'bytes': _sync(self.file)}
+
+    def close(self):
+        self.file.close()
+
+
+class JsonlExportWriter:
+    def __init__(self, path, fields, state=None):
+        self.file = _open_for_resume(path, state)
+
+    def write(self, rows):
+        for row in rows:
+            self.file.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    def flush(self):
+        return {'bytes': _sync(self.file)}
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetExportWriter:
+    """Writes a directory of part files, a part is only written once it is full"""
+
+    def __init__(self, path, fields, state=None):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Parquet export needs pyarrow (pip install pyarrow)")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+
+        self.directory = Path(path)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.fields = fields
+        self.schema = pyarrow.schema([
+            (field, getattr(pyarrow, PARQUET_TYPES.get(field, 'string'))()) for field in fields
+        ])
+        self.parts = state['parts'] if state else 0
+        # Parts after the checkpoint were written by the interrupted run
+        for part in self.directory.glob('part-*.parquet'):
+            if int(part.stem.split('-')[1]) >= self.parts:
+                part.unlink()
+        self.buffer = []
+
+    def write(self, rows):
+        self.buffer.extend(rows)
+
+    def _write_part(self):
+        columns = {field: [row[field] for row in self.buffer] for field in self.fields}
+        self.pq.write_table(
+            self.pa.table(columns, schema=self.schema), self.directory / f"part-{self.parts:05d}.parquet"
+        )
+        self.parts += 1
+        self.buffer = []
+
+    def flush(self):
+        if len(self.buffer) < PARQUET_ROWS_PER_PART:
+            return None
+        self._write_part()
+        return {'parts': self.parts}
+
+    def close(self):
+        if self.buffer:
+            self._write_part()
+
+
+EXPORT_WRITERS = {'csv': CsvExportWriter, 'jsonl': JsonlExportWriter, 'parquet': ParquetExportWriter}
+
+
+def _open_for_resume(path, state):
+    if state is None:
+        return open(path, 'w', encoding='utf-8', newline='')
+    # Drop anything written after the last checkpoint
+    f = open(path, 'r+', encoding='utf-8', newline='')
+    f.seek(state['bytes'])
+    f.truncate()
+    return f
+
+
+def _sync(f):
+    f.flush()
+    os.fsync(f.fileno())
+    return f.tell()
+
+
+# Checkpoints
+
+def checkpoint_path(output_path):
+    return Path(f"{output_path}.checkpoint.json")
+
+
+def load_checkpoint(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path, state):
+    temp_path = path.with_suffix('.tmp')
+    with open(temp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(temp_path, path)
+
+
+def export_format(path, fmt=None):
+    """Format given explicitly or taken from the file extension"""
+    fmt = fmt or Path(path).suffix.lstrip('.').lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', use one of: {', '.join(EXPORT_FORMATS)}")
+    return fmt
+
+
+def export_rows(pages, dataset, path, fmt=None, resume=True):
+    """Stream rows from pages(start) into path, checkpointing as they become durable.
+
+    pages is called with the position to resume from (None for a fresh
+    export) and yields (position after the rows, rows). An interrupted export
+    continues from its last checkpoint. Returns the number of rows written.
+    """
+    fmt = export_format(path, fmt)
+    checkpoint = checkpoint_path(path)
+    state = load_checkpoint(checkpoint) if resume else None
+    if state is not None and (state['dataset'], state['format']) != (dataset, fmt):
+        raise ValueError(f"{checkpoint} belongs to a different export, remove it or export without resuming")
+
+    writer = EXPORT_WRITERS[fmt](path, DATASET_FIELDS[dataset], state and state['writer'])
+    rows_written = state['rows'] if state else 0
+    try:
+        for position, rows in pages(state['position'] if state else None):
+            writer.write(rows)
+            rows_written += len(rows)
+            writer_state = writer.flush()
+            if writer_state is not None:
+                save_checkpoint(checkpoint, {
+                    'dataset': dataset, 'format': fmt, 'position': position,
+                    'rows': rows_written, 'writer': writer_state,
+                })
+        writer.close()
+    except BaseException:
+        # Keep the checkpoint, the next run picks up from there
+        if fmt != 'parquet':
+            writer.close()
+        raise
+
+    checkpoint.unlink(missing_ok=True)
+    return rows_written
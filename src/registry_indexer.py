@@ -0,0 +1,396 @@
+import sqlite3
+import threading
+from pathlib import Path
+
+from eth_utils.abi import event_abi_to_log_topic
+from web3 import Web3
+from web3.exceptions import BlockNotFound
+
+from config.network_config import NETWORK_CONFIG
+from src.rpc_batch import batch_call, BatchCallError, DEFAULT_BATCH_SIZE
+
+DEFAULT_INDEX_PATH = Path(__file__).resolve().parent.parent / 'data' / 'registry_index.sqlite'
+
+# Maximum number of blocks requested per eth_getLogs call, most providers cap the range
+DEFAULT_BLOCK_RANGE = 2000
+
+INDEXED_EVENTS = ('DoctorRegistered', 'DoctorApproved', 'PatientRegistered')
+
+# Blocks left unindexed below the head, they may still be reorganized away
+DEFAULT_CONFIRMATIONS = 0
+
+# Blocks re-read when the last synced block is no longer on the chain, deeper reorgs are not repaired
+REORG_DEPTH = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_state (
+    contract TEXT PRIMARY KEY,
+    last_block INTEGER NOT NULL,
+    last_block_hash TEXT
+);
+CREATE TABLE IF NOT EXISTS doctors (
+    contract TEXT NOT NULL,
+    address TEXT NOT NULL,
+    name TEXT,
+    specialization TEXT,
+    license_number TEXT,
+    email TEXT,
+    is_approved INTEGER NOT NULL DEFAULT 0,
+    registration_date INTEGER,
+    registered_block INTEGER,
+    approved_block INTEGER,
+    PRIMARY KEY (contract, address)
+);
+CREATE TABLE IF NOT EXISTS patients (
+    contract TEXT NOT NULL,
+    address TEXT NOT NULL,
+    doctor_address TEXT NOT NULL,
+    name TEXT,
+    age INTEGER,
+    medical_id TEXT,
+    registration_date INTEGER,
+    registered_block INTEGER,
+    record_hash TEXT,
+    PRIMARY KEY (contract, address)
+);
+CREATE INDEX IF NOT EXISTS patients_by_doctor ON patients (contract, doctor_address);
+CREATE INDEX IF NOT EXISTS pending_doctors ON doctors (contract, registered_block) WHERE is_approved = 0;
+"""
+
+
+def network_confirmations(network):
+    """Confirmations configured for a network, DEFAULT_CONFIRMATIONS for networks not configured"""
+    return NETWORK_CONFIG.get(network, {}).get('confirmations', DEFAULT_CONFIRMATIONS)
+
+
+def registry_events(contract, names=INDEXED_EVENTS):
+    """Map topic0 to event objects so one eth_getLogs filter covers several events"""
+    events = {}
+    for item in contract.abi:
+        if item.get('type') == 'event' and item.get('name') in names:
+            events[event_abi_to_log_topic(item)] = getattr(contract.events, item['name'])()
+    return events
+
+
+def fetch_registry_events(w3, contract, from_block, to_block,
+                          block_range=DEFAULT_BLOCK_RANGE, events=None):
+    """Fetch and decode registry events in block order, block_range blocks per request"""
+    events = events or registry_events(contract)
+    # Hex strings, raw bytes cannot be serialized by HTTP providers
+    topics = [[Web3.to_hex(topic) for topic in events]]
+
+    decoded = []
+    for range_start in range(from_block, to_block + 1, block_range):
+        range_end = min(range_start + block_range - 1, to_block)
+        logs = w3.eth.get_logs({
+            'address': contract.address,
+            'fromBlock': range_start,
+            'toBlock': range_end,
+            'topics': topics
+        })
+        for log in logs:
+            event = events.get(log['topics'][0])
+            if event is not None:
+                decoded.append(event.process_log(log))
+
+    decoded.sort(key=lambda entry: (entry['blockNumber'], entry['logIndex']))
+    return decoded
+
+
+DOCTOR_ORDER_COLUMNS = ('registered_block', 'address', 'name', 'specialization', 'license_number', 'is_approved')
+PATIENT_ORDER_COLUMNS = ('registered_block', 'address', 'name', 'age', 'medical_id', 'registration_date')
+
+
+class RegistryIndexer:
+    """Replays MedicalRegistry events into a local SQLite store and syncs new blocks incrementally.
+
+    Only blocks with confirmations blocks on top of them are indexed. The hash
+    of the last synced block is kept, and when the chain no longer has it the
+    last REORG_DEPTH blocks are dropped from the index and synced again.
+    """
+
+    def __init__(self, w3, contract, db_path=DEFAULT_INDEX_PATH, start_block=0,
+                 block_range=DEFAULT_BLOCK_RANGE, batch_size=DEFAULT_BATCH_SIZE,
+                 confirmations=DEFAULT_CONFIRMATIONS):
+        self.w3 = w3
+        self.contract = contract
+        self.contract_key = contract.address.lower()
+        self.start_block = start_block
+        self.confirmations = confirmations
+        self.block_range = block_range
+        self.batch_size = batch_size
+
+        self.events = registry_events(contract)
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Add columns introduced after an index file was created"""
+        added = {'patients': ('record_hash', 'TEXT'), 'doctors': ('approved_block', 'INTEGER'),
+                 'sync_state': ('last_block_hash', 'TEXT')}
+        for table, (column, column_type) in added.items():
+            if column not in [row[1] for row in self.db.execute(f"PRAGMA table_info({table})")]:
+                self.db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+        self.db.commit()
+
+    def close(self):
+        """Close the underlying database"""
+        with self.lock:
+            self.db.close()
+
+    @property
+    def last_block(self):
+        """Last block fully applied to the index, or start_block - 1 before the first sync"""
+        row = self.db.execute(
+            "SELECT last_block FROM sync_state WHERE contract = ?", (self.contract_key,)
+        ).fetchone()
+        return row[0] if row else self.start_block - 1
+
+    def fetch_logs(self, from_block, to_block):
+        """Fetch and decode indexed events in block order"""
+        return fetch_registry_events(
+            self.w3, self.contract, from_block, to_block, self.block_range, self.events
+        )
+
+    def sync(self):
+        """Apply events from blocks confirmed since the last sync, returns the set of changed addresses"""
+        with self.lock:
+            try:
+                # A reorg can replace the last synced block without the chain growing
+                changed = self._rewind_if_reorganized()
+                from_block = self.last_block + 1
+                to_block = self.w3.eth.block_number - self.confirmations
+                if from_block > to_block:
+                    self.db.commit()
+                    return changed
+
+                new_doctors = {}
+                new_patients = {}
+                approved = {}
+                for entry in self.fetch_logs(from_block, to_block):
+                    args = entry['args']
+                    if entry['event'] == 'DoctorRegistered':
+                        new_doctors[args['doctorAddress']] = entry['blockNumber']
+                    elif entry['event'] == 'DoctorApproved':
+                        approved[args['doctorAddress']] = entry['blockNumber']
+                    elif entry['event'] == 'PatientRegistered':
+                        new_patients[args['patientAddress']] = (args['doctorAddress'], entry['blockNumber'])
+
+                # Events only carry addresses and names, load the remaining fields in batches
+                self._store_doctors(new_doctors)
+                self._store_patients(new_patients)
+                self.db.executemany(
+                    "UPDATE doctors SET is_approved = 1, approved_block = ? WHERE contract = ? AND address = ?",
+                    [(block, self.contract_key, address) for address, block in approved.items()]
+                )
+
+                self.db.execute(
+                    "INSERT OR REPLACE INTO sync_state (contract, last_block, last_block_hash) VALUES (?, ?, ?)",
+                    (self.contract_key, to_block, Web3.to_hex(self.w3.eth.get_block(to_block)['hash']))
+                )
+                self.db.commit()
+            except Exception:
+                # Leave the index at the last fully applied block
+                self.db.rollback()
+                raise
+
+            return changed | set(new_doctors) | set(new_patients) | set(approved)
+
+    def _rewind_if_reorganized(self):
+        """Drop the last REORG_DEPTH blocks from the index when the last synced block was replaced.
+
+        Returns the addresses whose rows were dropped or changed, the caller commits.
+        """
+        row = self.db.execute(
+            "SELECT last_block, last_block_hash FROM sync_state WHERE contract = ?", (self.contract_key,)
+        ).fetchone()
+        if row is None or row[1] is None:
+            return set()
+        last_block, last_block_hash = row
+        try:
+            if Web3.to_hex(self.w3.eth.get_block(last_block)['hash']) == last_block_hash:
+                return set()
+        except BlockNotFound:
+            # The replacing chain is shorter than the synced one
+            pass
+
+        from_block = max(self.start_block, last_block - REORG_DEPTH + 1)
+        params = (self.contract_key, from_block)
+        changed = {address for (address,) in self.db.execute(
+            "SELECT address FROM doctors WHERE contract = ? AND (registered_block >= ? OR approved_block >= ?)",
+            params + (from_block,)
+        )}
+        changed |= {address for (address,) in self.db.execute(
+            "SELECT address FROM patients WHERE contract = ? AND registered_block >= ?", params
+        )}
+        self.db.execute("DELETE FROM doctors WHERE contract = ? AND registered_block >= ?", params)
+        self.db.execute("DELETE FROM patients WHERE contract = ? AND registered_block >= ?", params)
+        self.db.execute(
+            "UPDATE doctors SET is_approved = 0, approved_block = NULL WHERE contract = ? AND approved_block >= ?",
+            params
+        )
+        self.db.execute(
+            "UPDATE sync_state SET last_block = ?, last_block_hash = NULL WHERE contract = ?",
+            (from_block - 1, self.contract_key)
+        )
+        return changed
+
+    def _store_doctors(self, new_doctors):
+        """Fetch details for newly registered doctors, as of their registration block, and insert them"""
+        addresses = list(new_doctors)
+        doctors_details = batch_call(
+            self.w3, self.contract, 'getDoctorDetails',
+            [(address,) for address in addresses],
+            batch_size=self.batch_size,
+            blocks=[new_doctors[address] for address in addresses]
+        )
+        for address, details in zip(addresses, doctors_details):
+            if isinstance(details, BatchCallError):
+                raise Exception(f"Error loading doctor details {address}: {str(details)}")
+            self.db.execute(
+                "INSERT OR REPLACE INTO doctors VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.contract_key, address, details[0], details[1], details[2],
+                 details[6], int(details[4]), details[7], new_doctors[address],
+                 new_doctors[address] if details[4] else None)
+            )
+
+    def _store_patients(self, new_patients):
+        """Fetch details for newly registered patients, as of their registration block, and insert them"""
+        addresses = list(new_patients)
+
+        # getPatientDetails only answers the admin or the patient's doctor, so call as the doctor
+        calls_by_doctor = {}
+        for address in addresses:
+            calls_by_doctor.setdefault(new_patients[address][0], []).append(address)
+
+        for doctor_address, patient_addresses in calls_by_doctor.items():
+            patients_details = batch_call(
+                self.w3, self.contract, 'getPatientDetails',
+                [(address,) for address in patient_addresses],
+                tx_params={'from': doctor_address},
+                batch_size=self.batch_size,
+                blocks=[new_patients[address][1] for address in patient_addresses]
+            )
+            for address, details in zip(patient_addresses, patients_details):
+                if isinstance(details, BatchCallError):
+                    raise Exception(f"Error loading patient details {address}: {str(details)}")
+                # Contracts with off-chain records also return the record hash
+                record_hash = details[5] if len(details) > 5 and any(details[5]) else None
+                self.db.execute(
+                    "INSERT OR REPLACE INTO patients VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (self.contract_key, address, doctor_address, details[0], details[1],
+                     details[2], details[4], new_patients[address][1],
+                     Web3.to_hex(record_hash) if record_hash else None)
+                )
+
+    def get_doctors(self, order_by='registered_block', descending=False, pending_only=False):
+        """Return (address, name, specialization, licenseNumber, isApproved) rows from the index.
+
+        pending_only keeps doctors whose DoctorRegistered event was not followed by DoctorApproved.
+        """
+        if order_by not in DOCTOR_ORDER_COLUMNS:
+            raise ValueError(f"Cannot sort doctors by {order_by}")
+        direction = 'DESC' if descending else 'ASC'
+        pending = " AND is_approved = 0" if pending_only else ""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT address, name, specialization, license_number, is_approved "
+                f"FROM doctors WHERE contract = ?{pending} ORDER BY {order_by} {direction}, address",
+                (self.contract_key,)
+            ).fetchall()
+        return [(address, name, spec, license_number, bool(approved))
+                for address, name, spec, license_number, approved in rows]
+
+    def get_patients(self, doctor_address, order_by='registered_block', descending=False):
+        """Return (address, name, age, medicalId, registrationDate) rows for a doctor from the index"""
+        if order_by not in PATIENT_ORDER_COLUMNS:
+            raise ValueError(f"Cannot sort patients by {order_by}")
+        direction = 'DESC' if descending else 'ASC'
+        with self.lock:
+            return self.db.execute(
+                "SELECT address, name, age, medical_id, registration_date "
+                "FROM patients WHERE contract = ? AND doctor_address = ? "
+                f"ORDER BY {order_by} {direction}, address",
+                (self.contract_key, Web3.to_checksum_address(doctor_address))
+            ).fetchall()
+
+    def count_patients(self, doctor_address):
+        with self.lock:
+            return self.db.execute(
+                "SELECT COUNT(*) FROM patients WHERE contract = ? AND doctor_address = ?",
+                (self.contract_key, Web3.to_checksum_address(doctor_address))
+            ).fetchone()[0]
+
+    def get_patients_page(self, doctor_address, offset, limit):
+        """(address, name, age, medicalId, registrationDate) rows for a doctor in registration order"""
+        with self.lock:
+            return self.db.execute(
+                "SELECT address, name, age, medical_id, registration_date "
+                "FROM patients WHERE contract = ? AND doctor_address = ? "
+                "ORDER BY registered_block, address LIMIT ? OFFSET ?",
+                (self.contract_key, Web3.to_checksum_address(doctor_address), limit, offset)
+            ).fetchall()
+
+    def get_record_hashes(self, doctor_address):
+        """Map patient address to the record hash committed on chain, for a doctor's patients"""
+        with self.lock:
+            return dict(self.db.execute(
+                "SELECT address, record_hash FROM patients "
+                "WHERE contract = ? AND doctor_address = ? AND record_hash IS NOT NULL",
+                (self.contract_key, Web3.to_checksum_address(doctor_address))
+            ).fetchall())
+
+    def count_doctors(self, pending_only=False):
+        pending = " AND is_approved = 0" if pending_only else ""
+        with self.lock:
+            return self.db.execute(
+                f"SELECT COUNT(*) FROM doctors WHERE contract = ?{pending}", (self.contract_key,)
+            ).fetchone()[0]
+
+    def get_doctors_page(self, offset, limit, pending_only=False):
+        """(address, name, specialization, licenseNumber, isApproved, patientCount) rows in registration order"""
+        pending = " AND d.is_approved = 0" if pending_only else ""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT d.address, d.name, d.specialization, d.license_number, d.is_approved, "
+                "(SELECT COUNT(*) FROM patients p WHERE p.contract = d.contract AND p.doctor_address = d.address) "
+                f"FROM doctors d WHERE d.contract = ?{pending} "
+                "ORDER BY d.registered_block, d.address LIMIT ? OFFSET ?",
+                (self.contract_key, limit, offset)
+            ).fetchall()
+        return [(address, name, spec, license_number, bool(approved), count)
+                for address, name, spec, license_number, approved, count in rows]
+
+    def get_all_patients_page(self, offset, limit):
+        """(doctorAddress, address, name, age, medicalId, registrationDate, recordHash) rows in registration order"""
+        with self.lock:
+            return self.db.execute(
+                "SELECT doctor_address, address, name, age, medical_id, registration_date, record_hash "
+                "FROM patients WHERE contract = ? ORDER BY registered_block, address LIMIT ? OFFSET ?",
+                (self.contract_key, limit, offset)
+            ).fetchall()
+
+    def get_doctor_records(self):
+        """(address, name, specialization, licenseNumber, email, isApproved) rows in registration order"""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT address, name, specialization, license_number, email, is_approved "
+                "FROM doctors WHERE contract = ? ORDER BY registered_block, address",
+                (self.contract_key,)
+            ).fetchall()
+        return [(*row[:5], bool(row[5])) for row in rows]
+
+    def get_patient_records_page(self, offset, limit):
+        """(doctorAddress, address, name, age, medicalId, recordHash) rows, each doctor's patients together"""
+        with self.lock:
+            return self.db.execute(
+                "SELECT p.doctor_address, p.address, p.name, p.age, p.medical_id, p.record_hash "
+                "FROM patients p JOIN doctors d ON d.contract = p.contract AND d.address = p.doctor_address "
+                "WHERE p.contract = ? ORDER BY d.registered_block, d.address, p.registered_block, p.address "
+                "LIMIT ? OFFSET ?",
+                (self.contract_key, limit, offset)
+            ).fetchall()
@@ -0,0 +1,133 @@
+from src.rpc_batch import batch_call, BatchCallError, DEFAULT_BATCH_SIZE
+
+# Rows requested per paged view call, must not exceed MAX_PAGE_SIZE
+DEFAULT_PAGE_SIZE = 200
+# Largest page the contract serves, must match MAX_PAGE_SIZE in MedicalRegistry.sol
+MAX_PAGE_SIZE = 500
+
+
+def has_function(contract, fn_name):
+    """Check whether the loaded contract ABI exposes a function"""
+    return any(
+        item.get('type') == 'function' and item.get('name') == fn_name
+        for item in contract.abi
+    )
+
+
+def _page_args(total, page_size, *prefix, start=0):
+    """Build (prefix..., offset, limit) arguments covering rows start..total"""
+    return [(*prefix, offset, min(page_size, total - offset)) for offset in range(start, total, page_size)]
+
+
+def _read_pages(w3, contract, fn_name, args_list, tx_params, batch_size, cache):
+    """Call a paged getter for each args, through cache (a DetailsCache) when given"""
+    if cache is not None:
+        return cache.get_pages(fn_name, args_list, tx_params)
+    return batch_call(w3, contract, fn_name, args_list, tx_params=tx_params, batch_size=batch_size)
+
+
+def _collect_pages(pages):
+    """Turn paged parallel arrays into a flat list of row tuples"""
+    rows = []
+    for page in pages:
+        if isinstance(page, BatchCallError):
+            raise page
+        rows.extend(zip(*page))
+    return rows
+
+
+def load_doctors(w3, contract, page_size=DEFAULT_PAGE_SIZE, batch_size=DEFAULT_BATCH_SIZE, cache=None):
+    """Load (address, name, specialization, licenseNumber, isApproved) rows for all doctors.
+
+    Page and per-doctor detail reads go through cache (a DetailsCache) when given.
+    """
+    if has_function(contract, 'getDoctorsPage'):
+        total = contract.functions.getDoctorCount().call()
+        return _collect_pages(_read_pages(
+            w3, contract, 'getDoctorsPage', _page_args(total, page_size), None, batch_size, cache
+        ))
+
+    # Contracts deployed before paging: one detail call per doctor, batched
+    doctors = contract.functions.getAllDoctors().call()
+    if cache is not None:
+        doctors_details = cache.get_many('getDoctorDetails', doctors)
+    else:
+        doctors_details = batch_call(
+            w3, contract, 'getDoctorDetails',
+            [(address,) for address in doctors],
+            batch_size=batch_size
+        )
+
+    rows = []
+    for address, details in zip(doctors, doctors_details):
+        if isinstance(details, BatchCallError):
+            print(f"Error loading doctor details {address}: {str(details)}")
+            continue
+        rows.append((address, details[0], details[1], details[2], details[4]))
+    return rows
+
+
+def load_patients(w3, contract, doctor_address, caller=None,
+                  page_size=DEFAULT_PAGE_SIZE, batch_size=DEFAULT_BATCH_SIZE, cache=None):
+    """Load (address, name, age, medicalId, registrationDate) rows for a doctor's patients.
+
+    Page and per-patient detail reads go through cache (a DetailsCache) when given.
+    """
+    tx_params = {'from': caller or doctor_address}
+
+    if has_function(contract, 'getPatientsPage'):
+        total = contract.functions.getDoctorPatientCount(doctor_address).call(tx_params)
+        return _collect_pages(_read_pages(
+            w3, contract, 'getPatientsPage', _page_args(total, page_size, doctor_address),
+            tx_params, batch_size, cache
+        ))
+
+    # Contracts deployed before paging: one detail call per patient, batched
+    patients = contract.functions.getDoctorPatients(doctor_address).call(tx_params)
+    if cache is not None:
+        patients_details = cache.get_many('getPatientDetails', patients, tx_params)
+    else:
+        patients_details = batch_call(
+            w3, contract, 'getPatientDetails',
+            [(patient_address,) for patient_address in patients],
+            tx_params=tx_params,
+            batch_size=batch_size
+        )
+
+    rows = []
+    for patient_address, details in zip(patients, patients_details):
+        if isinstance(details, BatchCallError):
+            print(f"Error loading patient details {patient_address}: {str(details)}")
+            continue
+        rows.append((patient_address, details[0], details[1], details[2], details[4]))
+    return rows
+
+
+def load_doctors_page(w3, contract, offset, limit, page_size=DEFAULT_PAGE_SIZE,
+                      batch_size=DEFAULT_BATCH_SIZE, cache=None):
+    """(total, rows) for limit doctors from offset, rows as in load_doctors.
+
+    Only the requested rows are read, the contract must have getDoctorsPage.
+    """
+    total = contract.functions.getDoctorCount().call()
+    pages = _read_pages(
+        w3, contract, 'getDoctorsPage', _page_args(min(offset + limit, total), page_size, start=offset),
+        None, batch_size, cache
+    )
+    return total, _collect_pages(pages)
+
+
+def load_patients_page(w3, contract, doctor_address, offset, limit, caller=None,
+                       page_size=DEFAULT_PAGE_SIZE, batch_size=DEFAULT_BATCH_SIZE, cache=None):
+    """(total, rows) for limit of a doctor's patients from offset, rows as in load_patients.
+
+    Only the requested rows are read, the contract must have getPatientsPage.
+    """
+    tx_params = {'from': caller or doctor_address}
+    total = contract.functions.getDoctorPatientCount(doctor_address).call(tx_params)
+    pages = _read_pages(
+        w3, contract, 'getPatientsPage',
+        _page_args(min(offset + limit, total), page_size, doctor_address, start=offset),
+        tx_params, batch_size, cache
+    )
+    return total, _collect_pages(pages)
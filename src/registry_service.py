@@ -0,0 +1,315 @@
+import os
+
+from eth_account import Account
+from web3 import Web3
+
+from src.artifacts import deployed_contract, read_deployment
+from src.bulk_import import PatientImporter, parse_patient_row, RECEIPT_TIMEOUT
+from src.details_cache import DetailsCache
+from src.metrics import METRICS
+from src.record_store import RecordStore, record_key, DEFAULT_KEY_PATH
+from src.registry_indexer import RegistryIndexer, network_confirmations
+from src.registry_reader import (
+    has_function, load_doctors, load_patients, load_doctors_page, load_patients_page, DEFAULT_PAGE_SIZE
+)
+from src.registry_writer import approval_calls, supports_records, register_records_function
+from src.rpc_batch import BatchCallError, DEFAULT_BATCH_SIZE
+from src.rpc_provider import create_web3
+from src.tx_sender import TransactionSender, TransactionRejected
+
+# Gas limits for single registrations and approvals, batches are estimated
+PATIENT_GAS = 300000
+APPROVAL_GAS = 200000
+
+
+def environment_private_keys():
+    """Admin and doctor keys from the environment, signed locally when present"""
+    return [key for key in (os.getenv('ADMIN_PRIVATE_KEY'), os.getenv('DOCTOR_PRIVATE_KEY')) if key]
+
+
+def admin_address(w3):
+    """Admin account: from ADMIN_PRIVATE_KEY, or the node's first account when no key is set"""
+    private_key = os.getenv('ADMIN_PRIVATE_KEY')
+    if private_key:
+        return Account.from_key(private_key).address
+    # Remote nodes (Infura, Alchemy) manage no accounts
+    accounts = w3.eth.accounts
+    if not accounts:
+        raise ValueError("Set ADMIN_PRIVATE_KEY, the node has no accounts to sign with")
+    return accounts[0]
+
+
+class RegistryService:
+    """MedicalRegistry operations shared by the GUI and the HTTP API.
+
+    Holds one web3 connection, the local event index, the details cache and
+    the transaction sender. Reads may be called from any thread. Writes are
+    validated, queued on the sender and returned as PendingTransaction
+    handles. Cached details of the addresses involved are dropped once the
+    transaction is confirmed.
+
+    With a record_store and a contract that supports it, patient details are
+    kept encrypted off chain and patient rows are decrypted as they are read.
+    """
+
+    def __init__(self, w3, contract, indexer=None, details_cache=None, tx_sender=None,
+                 admin_account=None, network=None, batch_size=DEFAULT_BATCH_SIZE,
+                 page_size=DEFAULT_PAGE_SIZE, record_store=None):
+        self.w3 = w3
+        self.contract = contract
+        self.indexer = indexer
+        self.record_store = record_store
+        self.details_cache = details_cache or DetailsCache(w3, contract, batch_size=batch_size)
+        METRICS.register_cache('details', self.details_cache)
+        self.tx_sender = tx_sender or TransactionSender(w3, timeout=RECEIPT_TIMEOUT, batch_size=batch_size)
+        self.admin_account = admin_account or admin_address(w3)
+        self.network = network
+        self.batch_size = batch_size
+        self.page_size = page_size
+
+    @classmethod
+    def connect(cls, network='local', private_keys=None):
+        """Connect to a network and open the deployed contract, its index and caches"""
+        w3 = create_web3(network)
+        if not w3.is_connected():
+            raise ConnectionError("Cannot connect to blockchain")
+
+        # ABI and address of the contract deployed on this network, parsed once
+        contract = deployed_contract(w3, network=network)
+        deployment = read_deployment(network)
+
+        # Local event index, reads fall back to the contract without it.
+        # Nothing happens before the deployment block, the first sync starts there
+        try:
+            indexer = RegistryIndexer(
+                w3, contract, start_block=deployment['blockNumber'] if deployment else 0,
+                batch_size=DEFAULT_BATCH_SIZE, confirmations=network_confirmations(network)
+            )
+        except Exception as e:
+            print(f"Event index unavailable, reading directly from contract: {str(e)}")
+            indexer = None
+
+        # Off-chain patient records, only when the key is present
+        record_store = RecordStore() if DEFAULT_KEY_PATH.exists() else None
+
+        if private_keys is None:
+            private_keys = environment_private_keys()
+        return cls(
+            w3,
+            contract,
+            indexer=indexer,
+            # All writes go through one sender, nonces stay consistent across callers
+            tx_sender=TransactionSender(
+                w3, private_keys=private_keys, timeout=RECEIPT_TIMEOUT, batch_size=DEFAULT_BATCH_SIZE
+            ),
+            network=network,
+            record_store=record_store
+        )
+
+    def close(self):
+        """Stop the transaction sender and close the index"""
+        self.tx_sender.close()
+        if self.indexer is not None:
+            self.indexer.close()
+        if self.record_store is not None:
+            self.record_store.close()
+
+    # Reads
+
+    @property
+    def block_number(self):
+        return self.w3.eth.block_number
+
+    def get_doctor_details(self, address):
+        """getDoctorDetails result, served from the details cache"""
+        return self.details_cache.get_doctor_details(Web3.to_checksum_address(address))
+
+    def doctor_rows(self, pending_only=False):
+        """(address, name, specialization, licenseNumber, isApproved) rows for all doctors,
+        or only those still waiting for approval"""
+        if self.indexer is not None:
+            # Apply new blocks to the local index, then read from it
+            self.indexer.sync()
+            return self.indexer.get_doctors(pending_only=pending_only)
+
+        # Doctors in pages, batched into a few round trips
+        rows = load_doctors(
+            self.w3, self.contract,
+            page_size=self.page_size, batch_size=self.batch_size, cache=self.details_cache
+        )
+        return [row for row in rows if not row[4]] if pending_only else rows
+
+    def patient_rows(self, doctor_address, caller=None):
+        """(address, name, age, medicalId, registrationDate) rows for a doctor's patients.
+
+        With a caller, only the admin and the doctor themselves may read them,
+        like on chain. The index has no such check, it is enforced here.
+        """
+        doctor_address = Web3.to_checksum_address(doctor_address)
+        self._check_patient_reader(doctor_address, caller)
+        if self.indexer is not None:
+            self.indexer.sync()
+            rows = self.indexer.get_patients(doctor_address)
+        else:
+            rows = load_patients(
+                self.w3, self.contract, doctor_address, caller=caller,
+                page_size=self.page_size, batch_size=self.batch_size, cache=self.details_cache
+            )
+        return self._decrypt_rows(doctor_address, rows, caller)
+
+    def _check_patient_reader(self, doctor_address, caller):
+        if caller is not None and Web3.to_checksum_address(caller) not in (self.admin_account, doctor_address):
+            raise PermissionError("Only the admin or the patients' doctor can read them")
+
+    def doctors_page(self, offset, limit, pending_only=False):
+        """(total, rows) for one page of doctor_rows, only that page is read"""
+        if self.indexer is not None:
+            self.indexer.sync()
+            rows = self.indexer.get_doctors_page(offset, limit, pending_only=pending_only)
+            return self.indexer.count_doctors(pending_only), [row[:5] for row in rows]
+        if pending_only or not has_function(self.contract, 'getDoctorsPage'):
+            # The contract cannot filter by approval, and older deployments cannot page
+            rows = self.doctor_rows(pending_only)
+            return len(rows), rows[offset:offset + limit]
+        return load_doctors_page(
+            self.w3, self.contract, offset, limit,
+            page_size=self.page_size, batch_size=self.batch_size, cache=self.details_cache
+        )
+
+    def patients_page(self, doctor_address, offset, limit, caller=None):
+        """(total, rows) for one page of patient_rows, only that page is read and decrypted"""
+        doctor_address = Web3.to_checksum_address(doctor_address)
+        self._check_patient_reader(doctor_address, caller)
+        if self.indexer is not None:
+            self.indexer.sync()
+            total = self.indexer.count_patients(doctor_address)
+            rows = self.indexer.get_patients_page(doctor_address, offset, limit)
+        elif has_function(self.contract, 'getPatientsPage'):
+            total, rows = load_patients_page(
+                self.w3, self.contract, doctor_address, offset, limit, caller=caller,
+                page_size=self.page_size, batch_size=self.batch_size, cache=self.details_cache
+            )
+        else:
+            rows = self.patient_rows(doctor_address, caller)
+            return len(rows), rows[offset:offset + limit]
+        return total, self._decrypt_rows(doctor_address, rows, caller)
+
+    def _record_hashes(self, doctor_address, addresses, caller=None):
+        """Record hashes committed on chain for these patients"""
+        if self.indexer is not None:
+            return self.indexer.get_record_hashes(doctor_address)
+
+        details = self.details_cache.get_many(
+            'getPatientDetails', addresses, {'from': caller or doctor_address}
+        )
+        return {
+            address: patient[5] for address, patient in zip(addresses, details)
+            if not isinstance(patient, BatchCallError) and len(patient) > 5 and any(patient[5])
+        }
+
+    def _decrypt_rows(self, doctor_address, rows, caller=None):
+        """Fill in name, age and medical ID of patients whose details are kept off chain"""
+        if self.record_store is None:
+            return rows
+        # Registered by record hash: nothing but the address and date on chain
+        committed = [row[0] for row in rows if not row[1] and not row[3]]
+        if not committed:
+            return rows
+
+        record_hashes = self._record_hashes(doctor_address, committed, caller)
+        # One lookup for the whole list, records missing locally stay blank
+        records = self.record_store.get_many(record_hashes.values())
+        decrypted = []
+        for row in rows:
+            record_hash = record_hashes.get(row[0])
+            record = records.get(record_key(record_hash)) if record_hash else None
+            if record is not None:
+                row = (row[0], record['name'], record['age'], record['medicalId'], row[4])
+            decrypted.append(row)
+        return decrypted
+
+    # Writes
+
+    def _invalidate_when_confirmed(self, pending, addresses):
+        def on_done(future):
+            if not future.cancelled() and future.exception() is None and future.result().status == 1:
+                self.details_cache.invalidate(addresses)
+        pending.future.add_done_callback(on_done)
+        return pending
+
+    def _drop_record_when_failed(self, pending, record_hash):
+        # Rejected or reverted, the hash is never committed. An unconfirmed one may still be mined
+        def on_done(future):
+            if future.cancelled():
+                return
+            error = future.exception()
+            if isinstance(error, TransactionRejected) or (error is None and future.result().status != 1):
+                self.record_store.delete([record_hash])
+        pending.future.add_done_callback(on_done)
+
+    def register_doctor(self, wallet, name, specialization, license_number, email):
+        """Queue a doctor registration from the admin account"""
+        if not Web3.is_address(str(wallet).strip()):
+            raise ValueError("Invalid wallet address")
+        fields = [str(value or '').strip() for value in (name, specialization, license_number, email)]
+        if not all(fields):
+            raise ValueError("All fields must be filled")
+
+        wallet = Web3.to_checksum_address(str(wallet).strip())
+        contract_function = self.contract.functions.registerDoctor(wallet, *fields)
+        pending = self.tx_sender.submit(contract_function, {'from': self.admin_account})
+        return self._invalidate_when_confirmed(pending, [wallet])
+
+    def register_patient(self, doctor_address, wallet, name, age, medical_id):
+        """Queue a patient registration signed by the doctor"""
+        doctor_address = Web3.to_checksum_address(doctor_address)
+        args = parse_patient_row({'wallet': wallet, 'name': name, 'age': age, 'medicalId': medical_id})
+
+        if self.record_store is not None and supports_records(self.contract):
+            # Details go to the local store, only their hash goes on chain
+            record_hash = self.record_store.put(
+                args[0], doctor_address, {'name': args[1], 'age': args[2], 'medicalId': args[3]}
+            )
+            contract_function = register_records_function(self.contract, [args[0]], [record_hash])
+        else:
+            record_hash = None
+            contract_function = self.contract.functions.registerPatient(*args)
+        pending = self.tx_sender.submit(contract_function, {'from': doctor_address, 'gas': PATIENT_GAS})
+        if record_hash is not None:
+            self._drop_record_when_failed(pending, record_hash)
+        # The doctor's patient count changed
+        return self._invalidate_when_confirmed(pending, [doctor_address])
+
+    def patient_importer(self, doctor_address):
+        """PatientImporter for a doctor that sends through this service's sender"""
+        return PatientImporter(
+            self.w3, self.contract, doctor_address, batch_size=self.batch_size,
+            sender=self.tx_sender, record_store=self.record_store
+        )
+
+    def register_patients(self, doctor_address, rows, cancel_event=None):
+        """Register many patient dicts for a doctor and wait for them, returns one result per row"""
+        importer = self.patient_importer(doctor_address)
+        results = importer.prepare(enumerate(rows, start=1))
+        importer.submit(results, cancel_event)
+        importer.collect_receipts(results, cancel_event)
+        if any(result['status'] == 'confirmed' for result in results):
+            self.details_cache.invalidate([importer.doctor_address])
+        return results
+
+    def approve_doctors(self, doctor_addresses):
+        """Queue approvals, batched when the contract allows. Returns (addresses, pending) pairs"""
+        if not doctor_addresses:
+            raise ValueError("No doctors to approve")
+        if not all(Web3.is_address(address) for address in doctor_addresses):
+            raise ValueError("Invalid doctor address")
+        doctor_addresses = [Web3.to_checksum_address(address) for address in doctor_addresses]
+
+        submitted = []
+        for chunk, contract_function in approval_calls(self.contract, doctor_addresses):
+            tx_params = {'from': self.admin_account}
+            if len(chunk) == 1:
+                tx_params['gas'] = APPROVAL_GAS
+            pending = self.tx_sender.submit(contract_function, tx_params)
+            submitted.append((chunk, self._invalidate_when_confirmed(pending, chunk)))
+        return submitted
@@ -0,0 +1,295 @@
+import gzip
+import json
+import os
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from src.bulk_import import PatientImporter, summarize
+from src.registry_export import doctor_pages, patient_pages, raise_errors
+from src.registry_reader import DEFAULT_PAGE_SIZE
+from src.registry_writer import approval_calls
+from src.rpc_batch import batch_call, BatchCallError, DEFAULT_BATCH_SIZE
+
+SNAPSHOT_FORMAT = 'medical-registry-snapshot'
+SNAPSHOT_VERSION = 1
+
+# Records are JSON arrays, the header lists their columns
+SNAPSHOT_FIELDS = {
+    'doctor': ('address', 'name', 'specialization', 'licenseNumber', 'email', 'isApproved'),
+    'patient': ('doctorAddress', 'address', 'name', 'age', 'medicalId', 'recordHash'),
+}
+
+# Records read from the index per query
+INDEX_PAGE_SIZE = 1000
+
+# Records per encrypted block, each block is one Fernet token line
+ENCRYPTED_BLOCK_RECORDS = 1000
+
+
+# Sources: generators of (kind, record dict), all doctors before any patient
+
+def chain_records(w3, contract, caller, page_size=DEFAULT_PAGE_SIZE, batch_size=DEFAULT_BATCH_SIZE):
+    """Read the registry from the contract with batched calls.
+
+    caller must be the admin. Emails are only in getDoctorDetails, they are
+    fetched per page of doctors in one round trip.
+    """
+    for _, doctors in doctor_pages(w3, contract, caller, page_size=page_size, batch_size=batch_size):
+        details = raise_errors(batch_call(
+            w3, contract, 'getDoctorDetails', [(doctor['address'],) for doctor in doctors],
+            batch_size=batch_size
+        ), "doctor details")
+        for doctor, doctor_details in zip(doctors, details):
+            yield 'doctor', dict(doctor, email=doctor_details[6])
+
+    # Patients registered by record hash come with their recordHash
+    for _, patients in patient_pages(w3, contract, caller, page_size=page_size, batch_size=batch_size):
+        for patient in patients:
+            yield 'patient', patient
+
+
+def index_records(indexer):
+    """Read the registry from the local event index, synced once at the start"""
+    indexer.sync()
+    for row in indexer.get_doctor_records():
+        yield 'doctor', dict(zip(SNAPSHOT_FIELDS['doctor'], row))
+
+    offset = 0
+    while True:
+        rows = indexer.get_patient_records_page(offset, INDEX_PAGE_SIZE)
+        if not rows:
+            return
+        offset += len(rows)
+        for row in rows:
+            yield 'patient', dict(zip(SNAPSHOT_FIELDS['patient'], row))
+
+
+# File format: gzip JSON lines, a header object, one array per record, an end marker.
+# Encrypted snapshots keep the header readable, the record lines and the end
+# marker are compressed and Fernet-encrypted in blocks, one token per line.
+
+def write_snapshot(records, path, metadata=None, key=None):
+    """Write records to a snapshot file atomically, returns the header with the counts.
+
+    With key (a Fernet key, e.g. data/encryption.key) the records are encrypted.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    header = dict(
+        metadata or {},
+        format=SNAPSHOT_FORMAT,
+        version=SNAPSHOT_VERSION,
+        fields=SNAPSHOT_FIELDS,
+        createdAt=datetime.now(timezone.utc).isoformat(),
+    )
+    if key is not None:
+        header['encryption'] = 'fernet'
+    counts = {kind: 0 for kind in SNAPSHOT_FIELDS}
+
+    temp_path = path.with_name(path.name + '.tmp')
+    with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+        f.write(json.dumps(header, ensure_ascii=False) + '\n')
+        write_lines = _encrypted_writer(f, Fernet(key)) if key is not None else f.writelines
+        block = []
+        for kind, record in records:
+            values = [record.get(field) for field in SNAPSHOT_FIELDS[kind]]
+            block.append(json.dumps([kind, *values], ensure_ascii=False, separators=(',', ':')) + '\n')
+            counts[kind] += 1
+            if len(block) == ENCRYPTED_BLOCK_RECORDS:
+                write_lines(block)
+                block = []
+        # A file without the marker was cut short
+        block.append(json.dumps(['end', counts]) + '\n')
+        write_lines(block)
+    os.replace(temp_path, path)
+
+    header['counts'] = counts
+    return header
+
+
+def _encrypted_writer(f, fernet):
+    def write_lines(lines):
+        token = fernet.encrypt(zlib.compress(''.join(lines).encode('utf-8')))
+        f.write(token.decode('ascii') + '\n')
+    return write_lines
+
+
+def read_snapshot_header(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+    if not isinstance(header, dict) or header.get('format') != SNAPSHOT_FORMAT:
+        raise ValueError(f"{path} is not a registry snapshot")
+    if header.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {header.get('version')}")
+    if header.get('encryption') not in (None, 'fernet'):
+        raise ValueError(f"Unsupported snapshot encryption {header['encryption']}")
+    return header
+
+
+def _record_lines(f, header, key):
+    """Record lines after the header, decrypted block by block when encrypted"""
+    if header.get('encryption') is None:
+        yield from f
+        return
+    if key is None:
+        raise ValueError("Snapshot is encrypted, its key is needed to read it")
+    fernet = Fernet(key)
+    for token in f:
+        try:
+            block = zlib.decompress(fernet.decrypt(token.strip().encode('ascii')))
+        except InvalidToken:
+            raise ValueError("Snapshot cannot be decrypted with this key")
+        yield from block.decode('utf-8').splitlines()
+
+
+def read_snapshot(path, key=None):
+    """Yield (kind, record dict) from a snapshot file, raises if it is incomplete"""
+    header = read_snapshot_header(path)
+    fields = header['fields']
+    counts = {kind: 0 for kind in fields}
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        f.readline()
+        for line in _record_lines(f, header, key):
+            kind, *values = json.loads(line)
+            if kind == 'end':
+                if values[0] != counts:
+                    raise ValueError(f"Snapshot counts do not match: {values[0]} != {counts}")
+                return
+            if kind not in fields:
+                raise ValueError(f"Unknown snapshot record type {kind}")
+            counts[kind] += 1
+            yield kind, dict(zip(fields[kind], values))
+    raise ValueError(f"Snapshot {path} is incomplete")
+
+
+def verify_snapshot(path, key=None):
+    """Read a snapshot through once, returns its header with the record counts"""
+    header = read_snapshot_header(path)
+    counts = {kind: 0 for kind in header['fields']}
+    for kind, _ in read_snapshot(path, key):
+        counts[kind] += 1
+    header['counts'] = counts
+    return header
+
+
+# Restore
+
+def _wait(submitted, cancel_event=None):
+    """Wait for (items, PendingTransaction) pairs, returns a status per item"""
+    results = []
+    for items, pending in submitted:
+        if cancel_event is not None and cancel_event.is_set():
+            status = 'cancelled'
+        else:
+            try:
+                status = 'confirmed' if pending.result().status == 1 else 'reverted'
+            except Exception as e:
+                print(f"Restore transaction failed: {str(e)}")
+                status = 'failed'
+        results.extend({'item': item, 'status': status} for item in items)
+    return results
+
+
+def restore_snapshot(w3, contract, path, admin, sender, batch_size=DEFAULT_BATCH_SIZE, cancel_event=None,
+                     key=None):
+    """Register a snapshot's doctors, approvals and patients on contract.
+
+    Runs in three phases, each with all of its transactions in flight at once
+    on the shared sender: doctor registrations from admin, batched approvals,
+    then patient batches sent by their doctors. Doctors and patients already
+    on the target are skipped, so an interrupted restore can simply be rerun.
+    Patients can only be registered by their own doctor, sender needs the
+    doctors' keys unless the node signs for them. key decrypts an encrypted
+    snapshot.
+
+    Returns a dict of status counts per phase.
+    """
+    verify_snapshot(path, key)
+    doctors = [record for kind, record in read_snapshot(path, key) if kind == 'doctor']
+
+    # What the target already has, in one batched pass
+    existing = batch_call(
+        w3, contract, 'getDoctorDetails', [(doctor['address'],) for doctor in doctors],
+        batch_size=batch_size
+    )
+    registered, approved = set(), set()
+    for doctor, details in zip(doctors, existing):
+        if isinstance(details, BatchCallError):
+            continue
+        if details[3]:
+            registered.add(doctor['address'])
+        if details[4]:
+            approved.add(doctor['address'])
+
+    submitted = [
+        ([doctor['address']], sender.submit(
+            contract.functions.registerDoctor(
+                doctor['address'], doctor['name'], doctor['specialization'],
+                doctor['licenseNumber'], doctor['email']
+            ),
+            {'from': admin}
+        ))
+        for doctor in doctors if doctor['address'] not in registered
+    ]
+    doctor_results = _wait(submitted, cancel_event)
+    registered.update(result['item'] for result in doctor_results if result['status'] == 'confirmed')
+
+    # Approvals can only be estimated once the registrations are mined
+    to_approve = [
+        doctor['address'] for doctor in doctors
+        if doctor['isApproved'] and doctor['address'] in registered and doctor['address'] not in approved
+    ]
+    submitted = [
+        (chunk, sender.submit(contract_function, {'from': admin}))
+        for chunk, contract_function in (approval_calls(contract, to_approve) if to_approve else [])
+    ]
+    approval_results = _wait(submitted, cancel_event)
+    approved.update(result['item'] for result in approval_results if result['status'] == 'confirmed')
+
+    # Every doctor's batches are queued before waiting for any receipt
+    importers = []
+    skipped = 0
+    for doctor_address, rows in _patients_by_doctor(read_snapshot(path, key)):
+        if doctor_address not in approved:
+            skipped += len(rows)
+            continue
+        importer = PatientImporter(w3, contract, doctor_address, batch_size=batch_size, sender=sender)
+        results = importer.prepare(enumerate(rows, start=1))
+        importer.submit(results, cancel_event)
+        importers.append((importer, results))
+
+    patient_results = []
+    for importer, results in importers:
+        importer.collect_receipts(results, cancel_event)
+        patient_results.extend(results)
+
+    patients = summarize(patient_results)
+    if skipped:
+        patients['doctor not approved'] = skipped
+    return {
+        'doctors': dict(summarize(doctor_results), existing=len(doctors) - len(doctor_results)),
+        'approvals': summarize(approval_results),
+        'patients': patients,
+    }
+
+
+def _patients_by_doctor(records):
+    """Yield (doctor address, importer rows), the snapshot lists each doctor's patients together"""
+    doctor_address, rows = None, []
+    for kind, record in records:
+        if kind != 'patient':
+            continue
+        if record['doctorAddress'] != doctor_address:
+            if rows:
+                yield doctor_address, rows
+            doctor_address, rows = record['doctorAddress'], []
+        row = {'wallet': record['address'], 'name': record['name'], 'age': record['age'],
+               'medicalId': record['medicalId']}
+        if record.get('recordHash'):
+            row['recordHash'] = record['recordHash']
+        rows.append(row)
+    if rows:
+        yield doctor_address, rows
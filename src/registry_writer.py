@@ -0,0 +1,90 @@
+from src.registry_reader import has_function
+from src.rpc_batch import send_batch, BatchCallError, DEFAULT_BATCH_SIZE
+
+# Must match MAX_PATIENT_BATCH / MAX_APPROVAL_BATCH / MAX_RECORD_BATCH in MedicalRegistry.sol
+MAX_PATIENT_BATCH = 50
+MAX_APPROVAL_BATCH = 200
+MAX_RECORD_BATCH = 100
+
+# Safety margin added on top of gas estimates
+GAS_BUFFER = 1.2
+
+
+def chunked(items, size):
+    """Split a list into consecutive chunks of at most size items"""
+    items = list(items)
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def patient_batch_size(contract):
+    """Largest number of patients one transaction can register on this contract"""
+    return MAX_PATIENT_BATCH if has_function(contract, 'registerPatients') else 1
+
+
+def approval_batch_size(contract):
+    """Largest number of doctors one transaction can approve on this contract"""
+    return MAX_APPROVAL_BATCH if has_function(contract, 'approveDoctors') else 1
+
+
+def supports_records(contract):
+    """Whether patients can be registered by the hash of an off-chain record"""
+    return has_function(contract, 'registerPatientRecords')
+
+
+def register_patients_function(contract, patients):
+    """Build the call registering (wallet, name, age, medicalId) patients in one transaction"""
+    if len(patients) == 1:
+        return contract.functions.registerPatient(*patients[0])
+
+    wallets, names, ages, medical_ids = zip(*patients)
+    return contract.functions.registerPatients(
+        list(wallets), list(names), list(ages), list(medical_ids)
+    )
+
+
+def register_records_function(contract, wallets, record_hashes):
+    """Build the call registering patients by record hash in one transaction"""
+    if len(wallets) == 1:
+        return contract.functions.registerPatientRecord(wallets[0], record_hashes[0])
+    return contract.functions.registerPatientRecords(list(wallets), list(record_hashes))
+
+
+def approve_doctors_function(contract, doctor_addresses):
+    """Build the call approving doctors in one transaction"""
+    if len(doctor_addresses) == 1:
+        return contract.functions.approveDoctor(doctor_addresses[0])
+    return contract.functions.approveDoctors(list(doctor_addresses))
+
+
+def approval_calls(contract, doctor_addresses):
+    """Split approvals into (addresses, contract function) pairs the contract accepts"""
+    return [
+        (chunk, approve_doctors_function(contract, chunk))
+        for chunk in chunked(doctor_addresses, approval_batch_size(contract))
+    ]
+
+
+def estimate_gas(w3, contract, contract_functions, sender, batch_size=DEFAULT_BATCH_SIZE):
+    """Estimate gas for many calls in batched round trips, buffered by GAS_BUFFER.
+
+    A call that would revert yields a BatchCallError in its position.
+    """
+    calls = []
+    for contract_function in contract_functions:
+        data = contract.encode_abi(
+            fn_name=contract_function.fn_name, args=list(contract_function.args)
+        )
+        calls.append(('eth_estimateGas', [{
+            'from': sender,
+            'to': contract.address,
+            'data': data
+        }]))
+
+    estimates = []
+    for result in send_batch(w3, calls, batch_size):
+        if isinstance(result, BatchCallError):
+            estimates.append(result)
+        else:
+            gas = int(result, 16) if isinstance(result, str) else int(result)
+            estimates.append(int(gas * GAS_BUFFER))
+    return estimates
@@ -0,0 +1,153 @@
+import itertools
+import json
+import time
+
+import requests
+from eth_abi import decode
+from eth_utils.abi import collapse_if_tuple
+from hexbytes import HexBytes
+from web3 import HTTPProvider, Web3
+
+from src.metrics import METRICS
+
+# Number of JSON-RPC requests packed into a single HTTP round trip
+DEFAULT_BATCH_SIZE = 100
+
+_request_ids = itertools.count(1)
+
+
+class BatchCallError(Exception):
+    """Error returned for a single request inside a batch, code is the JSON-RPC error code if any"""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+def _chunks(items, size):
+    """Split a list into consecutive chunks of at most size items"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _post_batch(provider, chunk):
+    """Post one JSON-RPC batch over HTTP and return results in request order"""
+    payload = [
+        {'jsonrpc': '2.0', 'id': next(_request_ids), 'method': method, 'params': params}
+        for method, params in chunk
+    ]
+    start = time.perf_counter()
+    if hasattr(provider, 'post_json'):
+        # Pooled provider with endpoint failover
+        response = provider.post_json(payload)
+    else:
+        http_response = requests.post(
+            provider.endpoint_uri,
+            data=json.dumps(payload),
+            **dict(provider.get_request_kwargs())
+        )
+        http_response.raise_for_status()
+        response = http_response.json()
+    # A batch is one round trip, the calls inside are counted per method
+    METRICS.observe_rpc('batch', time.perf_counter() - start)
+
+    # Nodes that refuse the batch as a whole, e.g. without batch support, answer with one error object
+    if not isinstance(response, list):
+        error = response.get('error') if isinstance(response, dict) else None
+        raise BatchCallError(
+            f"Batch rejected: {error.get('message', str(error)) if isinstance(error, dict) else response}"
+        )
+
+    # Nodes may answer a batch in any order, match responses back by id
+    by_id = {item.get('id'): item for item in response}
+    results = []
+    for request in payload:
+        METRICS.count_batched(request['method'])
+        item = by_id.get(request['id'])
+        if item is None:
+            results.append(BatchCallError("Missing response in batch"))
+        elif 'error' in item:
+            METRICS.count_error(request['method'])
+            results.append(BatchCallError(item['error'].get('message', str(item['error'])), item['error'].get('code')))
+        else:
+            results.append(item['result'])
+    return results
+
+
+def _send_sequential(w3, chunk):
+    """Fallback for providers without batch support (IPC, eth-tester)"""
+    results = []
+    for method, params in chunk:
+        try:
+            results.append(w3.manager.request_blocking(method, params))
+        except Exception as e:
+            # web3 raises JSON-RPC errors with the error object as the argument
+            error = e.args[0] if e.args and isinstance(e.args[0], dict) else {}
+            results.append(BatchCallError(error.get('message', str(e)), error.get('code')))
+    return results
+
+
+def send_batch(w3, calls, batch_size=DEFAULT_BATCH_SIZE):
+    """Send (method, params) pairs as JSON-RPC batches of batch_size requests"""
+    if batch_size < 1:
+        raise ValueError("Batch size must be a positive number")
+
+    results = []
+    for chunk in _chunks(list(calls), batch_size):
+        if isinstance(w3.provider, HTTPProvider):
+            try:
+                results.extend(_post_batch(w3.provider, chunk))
+            except BatchCallError:
+                # The requests may still succeed one by one
+                results.extend(_send_sequential(w3, chunk))
+        else:
+            results.extend(_send_sequential(w3, chunk))
+    return results
+
+
+def _normalize(abi_type, value):
+    """Match web3's call() output: checksummed addresses, lists for arrays"""
+    if abi_type == 'address':
+        return Web3.to_checksum_address(value)
+    if abi_type.endswith(']'):
+        item_type = abi_type[:abi_type.rindex('[')]
+        return [_normalize(item_type, item) for item in value]
+    return value
+
+
+def batch_call(w3, contract, fn_name, args_list, tx_params=None,
+               batch_size=DEFAULT_BATCH_SIZE, block='latest', blocks=None):
+    """Call a contract view function once per args tuple using batched eth_call requests.
+
+    blocks, when given, holds the block to call at for each args tuple.
+    Results are returned in the order of args_list. A call that reverts or
+    fails yields a BatchCallError in its position instead of raising.
+    """
+    fn_abi = contract.get_function_by_name(fn_name).abi
+    output_types = [collapse_if_tuple(output) for output in fn_abi['outputs']]
+
+    calls = []
+    for index, args in enumerate(args_list):
+        # Raw JSON-RPC expects quantities as hex strings
+        transaction = {
+            key: hex(value) if isinstance(value, int) else value
+            for key, value in (tx_params or {}).items()
+        }
+        transaction['to'] = contract.address
+        transaction['data'] = contract.encode_abi(fn_name=fn_name, args=list(args))
+        call_block = blocks[index] if blocks is not None else block
+        calls.append(('eth_call', [transaction, hex(call_block) if isinstance(call_block, int) else call_block]))
+
+    results = []
+    for raw in send_batch(w3, calls, batch_size):
+        if isinstance(raw, BatchCallError):
+            results.append(raw)
+            continue
+        try:
+            decoded = decode(output_types, HexBytes(raw))
+        except Exception as e:
+            results.append(BatchCallError(f"Cannot decode {fn_name} result: {str(e)}"))
+            continue
+        values = [_normalize(t, v) for t, v in zip(output_types, decoded)]
+        results.append(values[0] if len(values) == 1 else values)
+    return results
@@ -0,0 +1,261 @@
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import HTTPProvider, Web3
+
+from config.network_config import NETWORK_CONFIG, get_network_config, network_for_chain
+from src.metrics import METRICS, metrics_middleware
+
+# Seconds for connecting / reading a response
+DEFAULT_TIMEOUT = (5, 30)
+
+# Extra attempts after the first one, spread over the available endpoints
+DEFAULT_RETRIES = 3
+
+# First backoff delay in seconds, doubled after every full pass over the endpoints
+DEFAULT_BACKOFF = 0.25
+MAX_BACKOFF = 8.0
+
+# A failing endpoint is skipped for this long, doubled per consecutive failure
+FAILURE_COOLDOWN = 2.0
+MAX_COOLDOWN = 60.0
+
+# Weight of the newest sample in the moving latency average
+LATENCY_SMOOTHING = 0.3
+
+# Keep-alive connections kept open per endpoint
+POOL_SIZE = 16
+
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+
+# A timeout does not say whether the node accepted the transaction, resending could send it twice
+SEND_METHODS = ('eth_sendTransaction', 'eth_sendRawTransaction')
+
+
+class WrongChain(ConnectionError):
+    """Raised when an endpoint serves a different chain than the expected one"""
+
+
+class EndpointUnavailable(ConnectionError):
+    """Raised when no endpoint answered within the retry budget"""
+
+
+class Endpoint:
+    """Health and latency bookkeeping for one RPC URL"""
+
+    def __init__(self, url):
+        self.url = url
+        self.latency = None
+        self.failures = 0
+        self.retry_at = 0.0
+        self.requests = 0
+        self.errors = 0
+        # Checked before first use when there are several endpoints
+        self.chain_id = None
+        self.wrong_chain = False
+
+    @property
+    def healthy(self):
+        return not self.wrong_chain and time.monotonic() >= self.retry_at
+
+    def record_success(self, seconds):
+        self.requests += 1
+        self.failures = 0
+        self.retry_at = 0.0
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += LATENCY_SMOOTHING * (seconds - self.latency)
+
+    def record_failure(self):
+        self.requests += 1
+        self.errors += 1
+        self.failures += 1
+        cooldown = min(FAILURE_COOLDOWN * 2 ** (self.failures - 1), MAX_COOLDOWN)
+        self.retry_at = time.monotonic() + cooldown
+
+    def stats(self):
+        return {
+            'url': self.url,
+            'chainId': self.chain_id,
+            'healthy': self.healthy,
+            'latency': self.latency,
+            'requests': self.requests,
+            'errors': self.errors,
+        }
+
+
+class FailoverHTTPProvider(HTTPProvider):
+    """HTTP provider over several endpoints sharing one pooled keep-alive session.
+
+    Each request goes to the healthy endpoint with the lowest average latency.
+    Connection errors, timeouts and overload responses put the endpoint in a
+    growing cooldown and the request is retried on the next one, backing off
+    once every endpoint has been tried. Requests sending transactions are
+    never retried. Each endpoint's eth_chainId is checked before its first
+    use against chain_id, or with several endpoints and no chain_id against
+    the first one checked. Endpoints on another chain are never used.
+    """
+
+    # Retries are handled here across endpoints, not by web3's per-URL middleware
+    _middlewares = ()
+
+    def __init__(self, endpoint_uris, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                 backoff=DEFAULT_BACKOFF, request_kwargs=None, chain_id=None):
+        if isinstance(endpoint_uris, str):
+            endpoint_uris = [endpoint_uris]
+        if not endpoint_uris:
+            raise ValueError("At least one RPC endpoint is required")
+
+        self.endpoints = [Endpoint(url) for url in endpoint_uris]
+        # Expected chain, without one the first endpoint checked sets it
+        self.chain_id = chain_id
+        self.check_chain = chain_id is not None or len(self.endpoints) > 1
+        self.retries = retries
+        self.backoff = backoff
+        self.lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.endpoints), pool_maxsize=POOL_SIZE)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        super().__init__(endpoint_uris[0], request_kwargs=dict(request_kwargs or {}, timeout=timeout))
+
+    def __str__(self):
+        return f"RPC connection {', '.join(endpoint.url for endpoint in self.endpoints)}"
+
+    def ranked_endpoints(self):
+        """Healthy endpoints by latency (untried first), then the rest by when they recover"""
+        with self.lock:
+            healthy = [endpoint for endpoint in self.endpoints if endpoint.healthy]
+            cooling = [endpoint for endpoint in self.endpoints
+                       if not endpoint.healthy and not endpoint.wrong_chain]
+            healthy.sort(key=lambda endpoint: endpoint.latency or 0.0)
+            cooling.sort(key=lambda endpoint: endpoint.retry_at)
+        return healthy + cooling
+
+    def _check_chain(self, endpoint, kwargs):
+        """Record the endpoint's chain id, raise WrongChain if it differs from the expected one"""
+        response = self.session.post(endpoint.url, data=json.dumps(
+            {'jsonrpc': '2.0', 'method': 'eth_chainId', 'params': [], 'id': 0}
+        ), **kwargs)
+        response.raise_for_status()
+        chain_id = int(response.json()['result'], 16)
+        with self.lock:
+            if self.chain_id is None:
+                self.chain_id = chain_id
+            endpoint.chain_id = chain_id
+            if chain_id != self.chain_id:
+                endpoint.wrong_chain = True
+                raise WrongChain(f"{endpoint.url} serves chain {chain_id}, expected {self.chain_id}")
+
+    def post_json(self, payload):
+        """POST a JSON-RPC request or batch and return the decoded JSON response"""
+        data = json.dumps(payload)
+        kwargs = dict(self.get_request_kwargs())
+        requests_sent = payload if isinstance(payload, list) else [payload]
+        sends = any(request.get('method') in SEND_METHODS for request in requests_sent)
+        last_error = None
+        tried = set()
+        passes = 0
+
+        for _ in range(1 if sends else self.retries + 1):
+            candidates = [e for e in self.ranked_endpoints() if e not in tried]
+            if not candidates and tried:
+                # Every endpoint failed once, wait before the next pass
+                time.sleep(min(self.backoff * 2 ** passes, MAX_BACKOFF))
+                tried.clear()
+                passes += 1
+                candidates = self.ranked_endpoints()
+            if not candidates:
+                break
+            endpoint = candidates[0]
+            tried.add(endpoint)
+
+            start = time.perf_counter()
+            try:
+                if self.check_chain and endpoint.chain_id is None:
+                    self._check_chain(endpoint, kwargs)
+                response = self.session.post(endpoint.url, data=data, **kwargs)
+                if response.status_code in RETRY_STATUS_CODES:
+                    raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+                response.raise_for_status()
+                result = response.json()
+            except WrongChain as e:
+                self.logger.warning(str(e))
+                last_error = e
+                continue
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError, ValueError, KeyError) as e:
+                with self.lock:
+                    endpoint.record_failure()
+                self.logger.debug(f"RPC request to {endpoint.url} failed: {str(e)}")
+                last_error = e
+                continue
+
+            with self.lock:
+                endpoint.record_success(time.perf_counter() - start)
+            METRICS.add_bytes(
+                payload['method'] if isinstance(payload, dict) else 'batch', len(data), len(response.content)
+            )
+            return result
+
+        raise EndpointUnavailable(f"No RPC endpoint answered: {str(last_error)}")
+
+    def make_request(self, method, params):
+        return self.post_json({
+            'jsonrpc': '2.0',
+            'method': method,
+            'params': params,
+            'id': next(self.request_counter)
+        })
+
+    def endpoint_stats(self):
+        """Current health and latency of every endpoint"""
+        with self.lock:
+            return [endpoint.stats() for endpoint in self.endpoints]
+
+
+def network_rpc_urls(network_name):
+    """RPC URLs configured for a network, in preference order"""
+    config = get_network_config(network_name)
+    return list(config.get('rpc_urls') or [config['rpc_url']])
+
+
+def create_provider(network_name='local', urls=None, **options):
+    """Failover provider for a configured network, urls replaces the configured list.
+
+    The configured URLs must serve the network's chain_id. URLs given here
+    are only checked against chain_id when it is passed in options.
+    """
+    if not urls:
+        options.setdefault('chain_id', get_network_config(network_name)['chain_id'])
+    return FailoverHTTPProvider(urls or network_rpc_urls(network_name), **options)
+
+
+def create_web3(network_name='local', urls=None, **options):
+    """Web3 instance on top of create_provider, with per-method request metrics"""
+    w3 = Web3(create_provider(network_name, urls, **options))
+    w3.middleware_onion.add(metrics_middleware, 'metrics')
+    return w3
+
+
+def connect_network(network=None, urls=None, default_network='local', **options):
+    """(web3, network name) for a script's --network / --rpc-url options.
+
+    PROVIDER_URL is only used when neither is given. The network is then
+    named after the chain the node reports, so deployment records made
+    through it never land under another network's name.
+    """
+    if network is None and urls is None and os.getenv('PROVIDER_URL'):
+        w3 = create_web3(default_network, urls=os.getenv('PROVIDER_URL').split(','), **options)
+        return w3, network_for_chain(w3.eth.chain_id)
+    if urls and network in NETWORK_CONFIG:
+        # URLs given for a configured network must serve that network's chain
+        options.setdefault('chain_id', NETWORK_CONFIG[network]['chain_id'])
+    network = network or default_network
+    return create_web3(network, urls=urls, **options), network
@@ -0,0 +1,135 @@
+import threading
+
+# Terms at least this long match anywhere in a field, shorter ones match the start of a word
+GRAM_SIZE = 3
+
+# Searchable values of the service's doctor and patient rows, the names double as field: qualifiers
+DOCTOR_SEARCH_FIELDS = ('address', 'name', 'specialization', 'license', 'status')
+PATIENT_SEARCH_FIELDS = ('address', 'name', 'age', 'medicalid')
+
+_EMPTY = frozenset()
+
+
+def doctor_search_values(row):
+    address, name, specialization, license_number, is_approved = row
+    return (address, name, specialization, license_number, 'approved' if is_approved else 'pending')
+
+
+def patient_search_values(row):
+    address, name, age, medical_id, _ = row
+    return (address, name, age, medical_id)
+
+
+def _grams(text):
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def _word_prefixes(text):
+    return {word[:length] for word in text.split() for length in range(1, GRAM_SIZE)}
+
+
+class SearchIndex:
+    """In-memory index of table rows for prefix and substring filtering.
+
+    Rows are keyed by their first value, like VirtualTable. A query is split
+    into terms that must all match. A term matches a field containing it, or
+    with 'field:term' only that field (any prefix of the field name works,
+    e.g. 'spec:cardio' or 'status:pending'). Terms of GRAM_SIZE characters or
+    more are answered from a trigram index and checked against the field,
+    shorter terms from an index of word prefixes. update() re-indexes only
+    rows that changed, so it is cheap to call after every refresh.
+    """
+
+    def __init__(self, fields, extract=None):
+        self.fields = tuple(fields)
+        self.extract = extract or (lambda row: row)
+        self.lock = threading.Lock()
+        # key -> lower-cased field values
+        self.values = {}
+        # (field index, gram or word prefix) -> keys
+        self.postings = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def _tokens(self, values):
+        for field, value in enumerate(values):
+            for token in _grams(value) | _word_prefixes(value):
+                yield field, token
+
+    def _add(self, key, values):
+        self.values[key] = values
+        for posting in self._tokens(values):
+            self.postings.setdefault(posting, set()).add(key)
+
+    def _remove(self, key):
+        for posting in self._tokens(self.values.pop(key)):
+            keys = self.postings[posting]
+            keys.discard(key)
+            if not keys:
+                del self.postings[posting]
+
+    def update(self, rows):
+        """Bring the index in line with rows, only new, changed and removed rows are touched"""
+        current = {
+            str(row[0]): tuple(str(value).lower() for value in self.extract(row))
+            for row in rows
+        }
+        with self.lock:
+            for key in self.values.keys() - current.keys():
+                self._remove(key)
+            for key, values in current.items():
+                old = self.values.get(key)
+                if old == values:
+                    continue
+                if old is not None:
+                    self._remove(key)
+                self._add(key, values)
+
+    def _parse(self, query):
+        """(field indexes, text) per query term"""
+        terms = []
+        for term in query.lower().split():
+            name, separator, text = term.partition(':')
+            fields = [i for i, field in enumerate(self.fields) if field.startswith(name)] if separator else []
+            if fields:
+                # A qualifier still being typed ('status:') filters nothing yet
+                if text:
+                    terms.append((fields, text))
+            else:
+                terms.append((range(len(self.fields)), term))
+        return terms
+
+    def _match(self, fields, text):
+        keys = set()
+        for field in fields:
+            if len(text) < GRAM_SIZE:
+                keys |= self.postings.get((field, text), _EMPTY)
+                continue
+            postings = sorted((self.postings.get((field, gram), _EMPTY) for gram in _grams(text)), key=len)
+            candidates = postings[0].intersection(*postings[1:])
+            # Grams can match out of order, confirm the whole term
+            keys.update(key for key in candidates if text in self.values[key][field])
+        return keys
+
+    def search(self, query):
+        """Keys of the rows matching every term of query, None for an empty query"""
+        terms = self._parse(query)
+        if not terms:
+            return None
+        with self.lock:
+            # Most selective terms first, so the running set stays small
+            matches = None
+            for fields, text in sorted(terms, key=lambda term: -len(term[1])):
+                keys = self._match(fields, text)
+                matches = keys if matches is None else matches & keys
+                if not matches:
+                    break
+            return matches
+
+    def filter(self, rows, query):
+        """The rows matching query, in their original order"""
+        keys = self.search(query)
+        if keys is None:
+            return rows
+        return [row for row in rows if str(row[0]) in keys]
@@ -0,0 +1,140 @@
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.metrics import METRICS
+
+DEFAULT_WORKERS = 4
+
+# How often the Tk loop collects finished work, in milliseconds
+POLL_INTERVAL_MS = 50
+
+
+class TaskCancelled(Exception):
+    """Raised inside a worker when its task was cancelled"""
+
+
+class Task:
+    """A unit of background work and its cancellation flag"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, label, on_success=None, on_error=None, metric=None, on_cancel=None):
+        self.id = next(self._ids)
+        self.label = label
+        self.on_success = on_success
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self.metric = metric
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.submitted_at = time.perf_counter()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        """Cancel the task; work already running is asked to stop and its result is discarded"""
+        self.cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()
+
+
+class TaskRunner:
+    """Runs blocking RPC work on a thread pool and hands results back on the Tk thread"""
+
+    def __init__(self, root, max_workers=DEFAULT_WORKERS, on_change=None):
+        self.root = root
+        self.on_change = on_change
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='rpc-worker')
+        self.finished = queue.Queue()
+        self.pending = {}
+        self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    def submit(self, label, fn, *args, on_success=None, on_error=None, cancellable=False, metric=None,
+               on_cancel=None):
+        """Run fn(*args) on a worker thread.
+
+        on_success(result) and on_error(exception) are called on the Tk thread,
+        on_cancel() too when the task was cancelled instead.
+        With cancellable=True, fn also receives cancel_event= so long waits can stop early.
+        With metric, time spent queued, working and in the Tk callback is
+        recorded as metric.queued / .work / .ui, and the whole as metric.total.
+        """
+        task = Task(label, on_success, on_error, metric, on_cancel)
+        kwargs = {'cancel_event': task.cancel_event} if cancellable else {}
+
+        task.future = self.executor.submit(self._run, task, fn, args, kwargs)
+        self.pending[task.id] = task
+        # Done callbacks run on the worker thread, only hand the task over through the queue
+        task.future.add_done_callback(lambda future: self.finished.put(task))
+
+        self._notify()
+        return task
+
+    def _run(self, task, fn, args, kwargs):
+        if task.metric is None:
+            return fn(*args, **kwargs)
+        started = time.perf_counter()
+        METRICS.observe(f"{task.metric}.queued", started - task.submitted_at)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            METRICS.observe(f"{task.metric}.work", time.perf_counter() - started)
+
+    def cancel_all(self):
+        """Cancel every pending task"""
+        for task in list(self.pending.values()):
+            task.cancel()
+
+    def shutdown(self):
+        """Stop accepting work and drop queued tasks"""
+        self.cancel_all()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _poll(self):
+        """Deliver results of finished tasks on the Tk thread"""
+        changed = False
+        while True:
+            try:
+                task = self.finished.get_nowait()
+            except queue.Empty:
+                break
+
+            changed = True
+            self.pending.pop(task.id, None)
+            if task.cancelled:
+                if task.on_cancel is not None:
+                    try:
+                        task.on_cancel()
+                    except Exception as e:
+                        print(f"Error handling cancellation of {task.label}: {str(e)}")
+                continue
+
+            error = task.future.exception()
+            handled_at = time.perf_counter()
+            try:
+                if error is not None:
+                    if task.on_error is not None:
+                        task.on_error(error)
+                    else:
+                        print(f"{task.label} failed: {str(error)}")
+                elif task.on_success is not None:
+                    task.on_success(task.future.result())
+            except Exception as e:
+                print(f"Error handling result of {task.label}: {str(e)}")
+            if task.metric is not None:
+                finished_at = time.perf_counter()
+                METRICS.observe(f"{task.metric}.ui", finished_at - handled_at)
+                METRICS.observe(f"{task.metric}.total", finished_at - task.submitted_at)
+
+        if changed:
+            self._notify()
+        self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    def _notify(self):
+        if self.on_change is not None:
+            self.on_change(list(self.pending.values()))
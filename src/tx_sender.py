@@ -0,0 +1,326 @@
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from web3 import Web3
+from web3.exceptions import TimeExhausted
+
+from src.metrics import METRICS
+from src.rpc_batch import DEFAULT_BATCH_SIZE
+from src.registry_writer import GAS_BUFFER
+from src.receipt_watcher import ReceiptWatcher
+
+# Seconds to wait for a receipt before giving up on a transaction
+RECEIPT_TIMEOUT = 120
+
+# A transaction without a receipt after this many seconds is resent with higher fees
+REPLACE_AFTER = 60
+# Nodes only accept a replacement paying at least 10% more
+FEE_BUMP = 1.125
+MAX_REPLACEMENTS = 3
+
+# Fee data is reused for this many seconds
+FEE_CACHE_SECONDS = 5
+
+# eth_feeHistory window and reward percentiles, the priority fee uses the middle one by default
+FEE_HISTORY_BLOCKS = 10
+FEE_PERCENTILES = (25, 50, 75)
+DEFAULT_PERCENTILE_INDEX = 1
+# Priority fee used when recent blocks paid no tips
+MIN_PRIORITY_FEE = Web3.to_wei(1, 'gwei')
+
+# Threads running blocking RPC calls for the event loop
+RPC_WORKERS = 8
+
+
+def quantity(value):
+    """Integer from a raw hex quantity or an already formatted int"""
+    return int(value, 16) if isinstance(value, str) else int(value)
+
+
+def fees_from_history(fee_history, percentile_index=DEFAULT_PERCENTILE_INDEX):
+    """EIP-1559 fees from an eth_feeHistory result, None when it has no base fee.
+
+    The priority fee is the median over the window of each block's reward at
+    FEE_PERCENTILES[percentile_index]. maxFeePerGas leaves room for the next
+    block's base fee to double.
+    """
+    base_fees = fee_history.get('baseFeePerGas') or []
+    if not base_fees or not quantity(base_fees[-1]):
+        return None
+    next_base_fee = quantity(base_fees[-1])
+
+    rewards = sorted(
+        quantity(block[percentile_index])
+        for block in fee_history.get('reward') or [] if len(block) > percentile_index
+    )
+    priority_fee = (rewards[len(rewards) // 2] if rewards else 0) or MIN_PRIORITY_FEE
+    return {'maxFeePerGas': 2 * next_base_fee + priority_fee, 'maxPriorityFeePerGas': priority_fee}
+
+
+class TransactionRejected(Exception):
+    """The node refused the transaction before it was mined, its nonce was not used"""
+
+
+class PendingTransaction:
+    """Handle for a submitted transaction, resolves to its receipt"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, transaction, tx_params):
+        self.id = next(self._ids)
+        self.transaction = transaction
+        self.tx_params = dict(tx_params)
+        self.account = Web3.to_checksum_address(tx_params['from'])
+        self.nonce = None
+        self.sent_params = None
+        self.tx_hashes = []
+        self.created_at = time.monotonic()
+        self.sent_at = None
+        self.replacements = 0
+        # concurrent.futures.Future set by TransactionSender.submit
+        self.future = None
+
+    @property
+    def tx_hash(self):
+        """Hash of the latest broadcast, None until the transaction was sent"""
+        return self.tx_hashes[-1] if self.tx_hashes else None
+
+    def result(self, timeout=None):
+        """Block until the receipt is available"""
+        return self.future.result(timeout)
+
+    def done(self):
+        return self.future.done()
+
+
+class TransactionSender:
+    """Submits transactions concurrently from an asyncio loop on a background thread.
+
+    Nonces are tracked locally per account so many transactions can be in
+    flight at once. Accounts added with a private key are signed locally,
+    any other sender is left to the node (eth_sendTransaction) with our nonce.
+    Receipts come from a shared ReceiptWatcher, stuck transactions are resent
+    with bumped fees.
+    """
+
+    def __init__(self, w3, private_keys=(), timeout=RECEIPT_TIMEOUT, replace_after=REPLACE_AFTER,
+                 batch_size=DEFAULT_BATCH_SIZE, watcher=None):
+        self.w3 = w3
+        self.timeout = timeout
+        self.replace_after = replace_after
+        self.batch_size = batch_size
+        self.owns_watcher = watcher is None
+        self.watcher = watcher or ReceiptWatcher(w3, batch_size=batch_size)
+
+        self.accounts = {}
+        for private_key in private_keys:
+            self.add_account(private_key)
+
+        # Touched only from the event loop thread
+        self.nonces = {}
+        # Per account queue of transactions waiting to send, in submission order
+        self.send_queues = {}
+        self.send_turn = asyncio.Condition()
+        self.pending = {}
+        self.fees = None
+        self.fees_at = 0.0
+        self.chain_id = None
+
+        self.executor = ThreadPoolExecutor(max_workers=RPC_WORKERS, thread_name_prefix='tx-rpc')
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='tx-sender', daemon=True)
+        self.thread.start()
+        self.fee_lock = asyncio.Lock()
+
+    def add_account(self, private_key):
+        """Sign transactions from this key's address locally, returns the address"""
+        account = self.w3.eth.account.from_key(private_key)
+        self.accounts[account.address] = account
+        return account.address
+
+    def close(self):
+        """Stop the event loop, pending transactions are abandoned"""
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.executor.shutdown(wait=False)
+        if self.owns_watcher:
+            self.watcher.close()
+
+    def submit(self, transaction, tx_params):
+        """Queue a contract function or constructor call, returns a PendingTransaction.
+
+        tx_params needs 'from'. Gas is estimated and fees are filled in when
+        they are not given. A 'nonce' only counts for the first transaction
+        of an account, later ones follow the local count. Safe to call from
+        any thread except the loop's own.
+        """
+        pending = PendingTransaction(transaction, tx_params)
+        pending.future = asyncio.run_coroutine_threadsafe(self._process(pending), self.loop)
+        return pending
+
+    def submit_many(self, items):
+        """Queue (transaction, tx_params) pairs, nonces follow the given order per account"""
+        return [self.submit(transaction, tx_params) for transaction, tx_params in items]
+
+    async def send(self, transaction, tx_params):
+        """Coroutine form of submit for code running on this sender's loop"""
+        return await self._process(PendingTransaction(transaction, tx_params))
+
+    async def _call(self, fn, *args):
+        return await self.loop.run_in_executor(self.executor, fn, *args)
+
+    async def _process(self, pending):
+        # Take a place in line before the first await so nonces follow submission order
+        queue = self.send_queues.setdefault(pending.account, deque())
+        queue.append(pending)
+        try:
+            params = await self._prepare(pending)
+            async with self.send_turn:
+                await self.send_turn.wait_for(lambda: queue[0] is pending)
+            # Other accounts keep sending meanwhile, this one waits until we leave the queue
+            await self._send_first(pending, params)
+        finally:
+            queue.remove(pending)
+            async with self.send_turn:
+                self.send_turn.notify_all()
+
+        METRICS.observe('transaction.send', pending.sent_at - pending.created_at)
+        self.pending[pending.id] = pending
+        try:
+            receipt = await self._await_receipt(pending)
+        finally:
+            del self.pending[pending.id]
+        METRICS.observe('transaction.confirm', time.monotonic() - pending.sent_at)
+        return receipt
+
+    async def _prepare(self, pending):
+        """Fill in gas, fees and chain id, these run concurrently across transactions"""
+        params = dict(pending.tx_params, **{'from': pending.account})
+        if 'gas' not in params:
+            try:
+                gas = await self._call(pending.transaction.estimate_gas, dict(params))
+            except Exception as e:
+                raise TransactionRejected(f"Gas estimation failed: {str(e)}") from e
+            params['gas'] = int(gas * GAS_BUFFER)
+        if not any(key in params for key in ('gasPrice', 'maxFeePerGas')):
+            params.update(await self._current_fees())
+        if pending.account in self.accounts and 'chainId' not in params:
+            if self.chain_id is None:
+                self.chain_id = await self._call(lambda: self.w3.eth.chain_id)
+            params['chainId'] = self.chain_id
+        return params
+
+    async def _send_first(self, pending, params):
+        """Broadcast with the account's next nonce, called in submission order"""
+        if pending.account not in self.nonces:
+            # A nonce the caller already read starts the account, saving the round trip
+            nonce = params.get('nonce')
+            if nonce is None:
+                nonce = await self._call(self.w3.eth.get_transaction_count, pending.account, 'pending')
+            self.nonces[pending.account] = nonce
+        params['nonce'] = self.nonces[pending.account]
+        try:
+            tx_hash = await self._call(self._broadcast, pending.transaction, params)
+        except Exception as e:
+            # The nonce was not used, re-read it from the node for the next transaction
+            self.nonces.pop(pending.account, None)
+            raise TransactionRejected(str(e)) from e
+        self.nonces[pending.account] = params['nonce'] + 1
+
+        pending.nonce = params['nonce']
+        pending.sent_params = params
+        pending.sent_at = time.monotonic()
+        pending.tx_hashes.append(tx_hash)
+
+    def _broadcast(self, transaction, params):
+        """Sign locally when we hold the key, otherwise let the node sign"""
+        account = self.accounts.get(params['from'])
+        if account is None:
+            return transaction.transact(params)
+        signed = account.sign_transaction(transaction.build_transaction(params))
+        return self.w3.eth.send_raw_transaction(signed.rawTransaction)
+
+    async def _current_fees(self):
+        """EIP-1559 fees when the chain has a base fee, legacy gas price otherwise"""
+        async with self.fee_lock:
+            if self.fees is None or time.monotonic() - self.fees_at > FEE_CACHE_SECONDS:
+                self.fees = await self._call(self._fetch_fees)
+                self.fees_at = time.monotonic()
+            return dict(self.fees)
+
+    def _fetch_fees(self):
+        try:
+            fees = fees_from_history(
+                self.w3.eth.fee_history(FEE_HISTORY_BLOCKS, 'latest', list(FEE_PERCENTILES))
+            )
+        except Exception:
+            # Nodes without eth_feeHistory
+            fees = None
+        if fees is not None:
+            return fees
+
+        block = self.w3.eth.get_block('latest')
+        base_fee = block.get('baseFeePerGas')
+        if base_fee is None:
+            return {'gasPrice': self.w3.eth.gas_price}
+        priority_fee = self.w3.eth.max_priority_fee
+        return {'maxFeePerGas': 2 * base_fee + priority_fee, 'maxPriorityFeePerGas': priority_fee}
+
+    def _watch(self, tx_hash):
+        return asyncio.wrap_future(self.watcher.watch(tx_hash), loop=self.loop)
+
+    async def _await_receipt(self, pending):
+        """Wait until any broadcast of the transaction is mined, replacing it while stuck"""
+        waiting = {self._watch(pending.tx_hash)}
+        try:
+            while True:
+                now = time.monotonic()
+                remaining = self.timeout - (now - pending.created_at)
+                if remaining <= 0:
+                    raise TimeExhausted(
+                        f"Transaction {Web3.to_hex(pending.tx_hash)} is not in the chain "
+                        f"after {self.timeout} seconds"
+                    )
+                can_replace = pending.replacements < MAX_REPLACEMENTS
+                if can_replace:
+                    remaining = min(remaining, self.replace_after - (now - pending.sent_at))
+
+                done, waiting = await asyncio.wait(
+                    waiting, timeout=max(remaining, 0), return_when=asyncio.FIRST_COMPLETED
+                )
+                for future in done:
+                    if not future.cancelled():
+                        return future.result()
+
+                if can_replace and time.monotonic() - pending.sent_at >= self.replace_after:
+                    if await self._replace(pending):
+                        waiting.add(self._watch(pending.tx_hash))
+        finally:
+            for tx_hash in pending.tx_hashes:
+                self.watcher.unwatch(tx_hash)
+
+    async def _replace(self, pending):
+        """Resend with the same nonce and bumped fees so a stuck transaction gets mined"""
+        params = dict(pending.sent_params)
+        current = await self._current_fees()
+        for key in ('gasPrice', 'maxFeePerGas', 'maxPriorityFeePerGas'):
+            if key in params:
+                params[key] = max(int(params[key] * FEE_BUMP), current.get(key, 0))
+        pending.replacements += 1
+        pending.sent_at = time.monotonic()
+        try:
+            tx_hash = await self._call(self._broadcast, pending.transaction, params)
+        except Exception as e:
+            # Usually means the original was mined meanwhile, the watcher will tell
+            print(f"Replacing transaction nonce {pending.nonce} failed: {str(e)}")
+            return False
+        pending.sent_params = params
+        pending.tx_hashes.append(tx_hash)
+        return True
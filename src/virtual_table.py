@@ -0,0 +1,146 @@
+import tkinter as tk
+from tkinter import ttk
+
+# Rows materialized per page
+DEFAULT_PAGE_SIZE = 200
+
+# Load the next page once the view is scrolled past this fraction of the loaded rows
+LOAD_MORE_THRESHOLD = 0.9
+
+
+class VirtualTable:
+    """Treeview that holds the full row list but only materializes what was scrolled to.
+
+    Rows are tuples keyed by their first value (the address), which is also
+    the Treeview item id. The first page is inserted right away and more
+    pages are added as the view scrolls toward the end. set_rows() diffs the
+    new rows against the current ones, so Tk work follows what changed rather
+    than the size of the table.
+    """
+
+    def __init__(self, parent, columns, widths=None, formatter=None,
+                 page_size=DEFAULT_PAGE_SIZE, **tree_options):
+        self.columns = columns
+        self.formatter = formatter or (lambda row: row)
+        self.page_size = page_size
+
+        # Full model, in display order
+        self.rows = []
+        self.positions = {}
+        # Number of leading rows present in the Treeview
+        self.materialized = 0
+        self._loading = False
+
+        self.frame = ttk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=columns, show='headings', **tree_options)
+        for index, col in enumerate(columns):
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=widths[index] if widths else 120)
+
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.scrollbar.pack(side='right', fill='y')
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _key(self, row):
+        return str(row[0])
+
+    def _insert(self, index, row):
+        self.tree.insert('', index, iid=self._key(row), values=self.formatter(row))
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if float(last) >= LOAD_MORE_THRESHOLD and self.materialized < len(self.rows) and not self._loading:
+            # Insert outside the scroll callback, Tk is mid-redraw here
+            self._loading = True
+            self.tree.after_idle(self.load_more)
+
+    def load_more(self):
+        """Materialize the next page of rows"""
+        self._loading = False
+        if not self.tree.winfo_exists():
+            return
+        end = min(self.materialized + self.page_size, len(self.rows))
+        for row in self.rows[self.materialized:end]:
+            self._insert('end', row)
+        self.materialized = end
+
+    def clear(self):
+        self.tree.delete(*self.tree.get_children())
+        self.rows = []
+        self.positions = {}
+        self.materialized = 0
+
+    def _rebuild(self, rows):
+        """Replace the materialized window, used when the row order changed"""
+        keep = max(self.materialized, min(self.page_size, len(rows)))
+        self.tree.delete(*self.tree.get_children())
+        self.materialized = 0
+        self._set_model(rows)
+        for row in rows[:keep]:
+            self._insert('end', row)
+        self.materialized = min(keep, len(rows))
+
+    def _set_model(self, rows):
+        self.rows = rows
+        self.positions = {self._key(row): index for index, row in enumerate(rows)}
+
+    def set_rows(self, rows):
+        """Show rows, touching only Treeview items that were added, changed or removed"""
+        rows = list(rows)
+        new_keys = {self._key(row): row for row in rows}
+        if len(new_keys) != len(rows):
+            raise ValueError("Table rows must have unique keys")
+
+        # Rows kept from before must still be in the same relative order,
+        # otherwise (e.g. a new sort order) rebuild just the visible window
+        kept_old = [self._key(row) for row in self.rows if self._key(row) in new_keys]
+        kept_new = [key for key in new_keys if key in self.positions]
+        if kept_old != kept_new:
+            self._rebuild(rows)
+            return
+
+        # Removals
+        removed = [self._key(row) for row in self.rows[:self.materialized]
+                   if self._key(row) not in new_keys]
+        if removed:
+            self.tree.delete(*removed)
+        kept_materialized = self.materialized - len(removed)
+        limit = max(self.materialized, min(self.page_size, len(rows)))
+
+        # Walk the new rows through the materialized prefix, updating and inserting in place
+        position = 0
+        seen = 0
+        for row in rows:
+            key = self._key(row)
+            old_index = self.positions.get(key)
+            if old_index is not None:
+                if seen == kept_materialized:
+                    # First kept row that was never materialized
+                    break
+                seen += 1
+                if self.rows[old_index] != row:
+                    self.tree.item(key, values=self.formatter(row))
+            else:
+                if seen == kept_materialized and position >= limit:
+                    break
+                self._insert(position, row)
+            position += 1
+
+        self.materialized = position
+        self._set_model(rows)
+
+    def refresh(self, keys):
+        """Re-format rows whose display depends on state outside the row"""
+        for key in keys:
+            index = self.positions.get(str(key))
+            if index is not None and index < self.materialized:
+                self.tree.item(str(key), values=self.formatter(self.rows[index]))
+
+    def selected_keys(self):
+        """Keys (addresses) of the selected rows"""
+        return list(self.tree.selection())
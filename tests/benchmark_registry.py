@@ -0,0 +1,148 @@
+import argparse
+import json
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+
+import web3
+
+from src.artifacts import find_artifact
+from src.registry_reader import has_function, load_doctors, load_patients
+from tests.local_chain import TX_GAS, deploy_registry, entity_address, new_chain
+
+DEFAULT_SIZES = (10, 1000, 10000)
+
+# מספר חזרות לכל קריאת view
+VIEW_REPEATS = 20
+
+
+def describe(values):
+    """סטטיסטיקה בסיסית לרשימת מדידות"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {
+        'count': len(ordered),
+        'min': ordered[0],
+        'max': ordered[-1],
+        'mean': statistics.fmean(ordered),
+        'p50': ordered[len(ordered) // 2],
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'total': sum(ordered),
+    }
+
+
+def measure_transactions(w3, calls, sender):
+    """שליחת טרנזקציות אחת אחרי השנייה ומדידת גז וזמן לכל אחת"""
+    gas, seconds = [], []
+    for contract_function in calls:
+        start = time.perf_counter()
+        tx_hash = contract_function.transact({'from': sender, 'gas': TX_GAS})
+        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+        seconds.append(time.perf_counter() - start)
+        if receipt['status'] != 1:
+            raise Exception(f"טרנזקציה נכשלה: {contract_function.fn_name}")
+        gas.append(receipt['gasUsed'])
+    return {'gas': describe(gas), 'seconds': describe(seconds)}
+
+
+def measure_view(w3, contract_function, caller, repeats=VIEW_REPEATS):
+    """מדידת גז (לפי estimate_gas) וזמן לקריאת view"""
+    gas = contract_function.estimate_gas({'from': caller})
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        contract_function.call({'from': caller})
+        seconds.append(time.perf_counter() - start)
+    return {'gas': gas, 'seconds': describe(seconds)}
+
+
+def measure_loader(loader, repeats=VIEW_REPEATS):
+    """מדידת זמן לטעינת טבלה מלאה כפי שהממשק עושה"""
+    seconds = []
+    rows = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        rows = len(loader())
+        seconds.append(time.perf_counter() - start)
+    return {'rows': rows, 'seconds': describe(seconds)}
+
+
+def benchmark_size(size, artifact_path):
+    """פריסה נקייה ומדידת כל הפעולות עבור size רופאים ו-size מטופלים"""
+    w3 = new_chain()
+    admin, doctor = w3.eth.accounts[0], w3.eth.accounts[1]
+    contract, deploy_receipt = deploy_registry(w3, artifact_path)
+    functions = contract.functions
+
+    # רופא אחד עם חשבון שולח, השאר כתובות סינתטיות
+    doctors = [doctor] + [entity_address('doctor', i) for i in range(1, size)]
+    patients = [entity_address('patient', i) for i in range(size)]
+
+    result = {'deploy_gas': deploy_receipt['gasUsed']}
+    result['registerDoctor'] = measure_transactions(w3, [
+        functions.registerDoctor(address, f"Doctor {i}", "Cardiology", f"LIC-{i:06d}", f"doctor{i}@clinic.org")
+        for i, address in enumerate(doctors)
+    ], admin)
+    result['approveDoctor'] = measure_transactions(w3, [
+        functions.approveDoctor(address) for address in doctors
+    ], admin)
+    result['registerPatient'] = measure_transactions(w3, [
+        functions.registerPatient(address, f"Patient {i}", 30 + i % 60, f"MID-{i:06d}")
+        for i, address in enumerate(patients)
+    ], doctor)
+
+    views = {
+        'getAllDoctors': (functions.getAllDoctors(), admin),
+        'getDoctorPatients': (functions.getDoctorPatients(doctor), doctor),
+        'getDoctorDetails': (functions.getDoctorDetails(doctor), admin),
+        'getPatientDetails': (functions.getPatientDetails(patients[-1]), doctor),
+    }
+    if has_function(contract, 'getDoctorsPage'):
+        views['getDoctorsPage'] = (functions.getDoctorsPage(0, min(size, 200)), admin)
+        views['getPatientsPage'] = (functions.getPatientsPage(doctor, 0, min(size, 200)), doctor)
+    result['views'] = {name: measure_view(w3, fn, caller) for name, (fn, caller) in views.items()}
+
+    # טעינה מלאה של הטבלאות, פעם אחת כי זו הפעולה הכבדה
+    result['load_doctors'] = measure_loader(lambda: load_doctors(w3, contract), repeats=1)
+    result['load_patients'] = measure_loader(lambda: load_patients(w3, contract, doctor), repeats=1)
+    return result
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, artifact_path=None):
+    artifact_path = artifact_path or find_artifact()
+    report = {
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'artifact': str(artifact_path),
+        'python': platform.python_version(),
+        'web3': web3.__version__,
+        'sizes': {},
+    }
+    for size in sizes:
+        print(f"מריץ מדידות עבור {size} ישויות...", flush=True)
+        start = time.perf_counter()
+        report['sizes'][str(size)] = benchmark_size(size, artifact_path)
+        print(f"  הסתיים תוך {time.perf_counter() - start:.1f} שניות", flush=True)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="מדידת גז וזמן על רשת מקומית (הרצה: python -m tests.benchmark_registry)"
+    )
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="מספרי ישויות מופרדים בפסיק")
+    parser.add_argument('--artifact', help="נתיב לקובץ החוזה המקומפל")
+    parser.add_argument('--output', help="נתיב לדוח JSON (ברירת מחדל: פלט רגיל)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    report = run_benchmarks(sizes, args.artifact)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"הדוח נשמר ב: {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
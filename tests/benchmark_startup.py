@@ -0,0 +1,77 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from src.artifacts import ROOT_DIR
+
+# זמן מקסימלי מהטעינה ועד שמסך הכניסה מצויר, בשניות
+FIRST_PAINT_TARGET = 0.5
+
+DEFAULT_RUNS = 5
+
+# נמדד בתהליך נפרד כדי שכל ריצה תתחיל "קרה", בלי מודולים טעונים מראש.
+# החיבור לרשת מנוטרל, המדידה היא של הממשק בלבד
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import src.medical_gui as gui
+result = {'import_seconds': time.perf_counter() - started,
+          'web3_imported': 'web3' in sys.modules}
+try:
+    gui.MedicalInterface.start_connection = lambda self: None
+    app = gui.MedicalInterface()
+    app.root.update()
+    result['first_paint_seconds'] = app.first_paint_seconds
+    app.close()
+except gui.tk.TclError as e:
+    result['error'] = str(e)
+print(json.dumps(result))
+"""
+
+
+def measure_once():
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def benchmark_startup(runs=DEFAULT_RUNS, target=FIRST_PAINT_TARGET):
+    """מדידת זמן טעינה וזמן עד ציור ראשון, מחזיר True אם בתוך היעד"""
+    samples = [measure_once() for _ in range(runs)]
+
+    imports = [sample['import_seconds'] for sample in samples]
+    print(f"טעינת src.medical_gui: חציון {statistics.median(imports) * 1000:.0f}ms")
+
+    if any(sample['web3_imported'] for sample in samples):
+        print("❌ web3 נטען כבר בזמן טעינת הממשק")
+        return False
+
+    paints = [sample['first_paint_seconds'] for sample in samples if 'first_paint_seconds' in sample]
+    if not paints:
+        print(f"⚠️ אין תצוגה זמינה, מדידת ציור ראשון דולגה: {samples[0].get('error')}")
+        return True
+
+    median = statistics.median(paints)
+    print(f"ציור ראשון: חציון {median * 1000:.0f}ms, מקסימום {max(paints) * 1000:.0f}ms "
+          f"(יעד {target * 1000:.0f}ms)")
+    if median > target:
+        print("❌ זמן העלייה חורג מהיעד")
+        return False
+    print("✅ זמן העלייה בתוך היעד")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="מדידת זמן עלייה של הממשק (הרצה: python -m tests.benchmark_startup)"
+    )
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS)
+    parser.add_argument('--target', type=float, default=FIRST_PAINT_TARGET,
+                        help="יעד זמן עד ציור ראשון בשניות")
+    args = parser.parse_args()
+
+    sys.exit(0 if benchmark_startup(args.runs, args.target) else 1)
@@ -1,7 +1,12 @@
 from web3 import Web3
+from web3.exceptions import TimeExhausted
 from dotenv import load_dotenv
 import os
-import time
+
+from src.receipt_watcher import ReceiptWatcher
+
+# זמן המתנה מקסימלי לאישור, בשניות
+RECEIPT_TIMEOUT = 100
 
 def check_deployment_status(tx_hash):
     load_dotenv()
@@ -11,47 +16,45 @@ def check_deployment_status(tx_hash):
     print(f"Hash: {tx_hash}")
     
     try:
-        max_attempts = 20
-        for attempt in range(max_attempts):
-            # קבלת קבלה
-            tx_receipt = w3.eth.get_transaction_receipt(tx_hash)
+        print("ממתין לאישור הטרנזקציה...")
+        # עוקב אחרי בלוקים חדשים במקום לשאול על הקבלה שוב ושוב
+        watcher = ReceiptWatcher(w3)
+        try:
+            tx_receipt = watcher.wait(tx_hash, timeout=RECEIPT_TIMEOUT)
+        except TimeExhausted:
+            print("\nתם הזמן המוקצב לאישור הטרנזקציה")
+            return None
+        finally:
+            watcher.close()
+
+        print("\nפרטי הטרנזקציה:")
+        print(f"סטטוס: {'✅ הצליח' if tx_receipt['status'] == 1 else '❌ נכשל'}")
+        print(f"בלוק מספר: {tx_receipt['blockNumber']}")
+        print(f"גז שנוצל: {tx_receipt['gasUsed']} ({(tx_receipt['gasUsed']/2764490)*100:.1f}% מהגז שהוקצה)")
+        
+        if tx_receipt['status'] == 1:
+            contract_address = tx_receipt['contractAddress']
+            print("\n🎉 החוזה הותקן בהצלחה!")
+            print(f"כתובת החוזה: {contract_address}")
             
-            if tx_receipt is None:
-                print(f"\rממתין לאישור הטרנזקציה... ניסיון {attempt + 1}/{max_attempts}", end='')
-                time.sleep(5)
-                continue
+            # בדיקת קוד בכתובת
+            code = w3.eth.get_code(contract_address)
+            print(f"גודל קוד החוזה: {len(code)} bytes")
             
-            print("\n\nפרטי הטרנזקציה:")
-            print(f"סטטוס: {'✅ הצליח' if tx_receipt['status'] == 1 else '❌ נכשל'}")
-            print(f"בלוק מספר: {tx_receipt['blockNumber']}")
-            print(f"גז שנוצל: {tx_receipt['gasUsed']} ({(tx_receipt['gasUsed']/2764490)*100:.1f}% מהגז שהוקצה)")
+            # שמירת הכתובת ב-.env
+            if not os.getenv('CONTRACT_ADDRESS'):
+                with open('.env', 'a') as f:
+                    f.write(f'\nCONTRACT_ADDRESS={contract_address}')
+                print("✅ כתובת החוזה נשמרה בקובץ .env")
             
-            if tx_receipt['status'] == 1:
-                contract_address = tx_receipt['contractAddress']
-                print(f"\n🎉 החוזה הותקן בהצלחה!")
-                print(f"כתובת החוזה: {contract_address}")
-                
-                # בדיקת קוד בכתובת
-                code = w3.eth.get_code(contract_address)
-                print(f"גודל קוד החוזה: {len(code)} bytes")
-                
-                # שמירת הכתובת ב-.env
-                if not os.getenv('CONTRACT_ADDRESS'):
-                    with open('.env', 'a') as f:
-                        f.write(f'\nCONTRACT_ADDRESS={contract_address}')
-                    print("✅ כתובת החוזה נשמרה בקובץ .env")
-                
-                # הצגת כתובת ה-etherscan לבדיקה
-                print(f"\nניתן לראות את החוזה ב-Etherscan:")
-                print(f"https://sepolia.etherscan.io/address/{contract_address}")
-                
-                return contract_address
-            else:
-                print("\n❌ התקנת החוזה נכשלה")
-                return None
-                
-        print("\nתם הזמן המוקצב לאישור הטרנזקציה")
-        return None
+            # הצגת כתובת ה-etherscan לבדיקה
+            print("\nניתן לראות את החוזה ב-Etherscan:")
+            print(f"https://sepolia.etherscan.io/address/{contract_address}")
+            
+            return contract_address
+        else:
+            print("\n❌ התקנת החוזה נכשלה")
+            return None
         
     except Exception as e:
         print(f"\nשגיאה בבדיקת הסטטוס: {str(e)}")
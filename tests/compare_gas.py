@@ -0,0 +1,140 @@
+import argparse
+import json
+import subprocess
+import tempfile
+from pathlib import Path
+from web3 import Web3
+
+from src.artifacts import ROOT_DIR
+from src.registry_reader import has_function
+from tests.local_chain import TX_GAS, compile_registry, deploy_registry, new_chain
+
+# חוזה מקומפל ישן מול חדש
+BASELINE_ARTIFACT = ROOT_DIR / 'src' / 'MedicalRegistry.json'
+NEW_ARTIFACT = ROOT_DIR / 'build' / 'MedicalRegistry.json'
+
+# נתונים קבועים כדי שההשוואה תהיה הוגנת
+DOCTOR = ('Dr. Dana Levi', 'Cardiology', 'LIC-{:06d}', 'doctor{}@clinic.org')
+PATIENT = ('Noa Cohen', 42, 'MID-{:06d}')
+
+
+def measure(artifact_path, patients=5):
+    """פריסה על רשת מקומית בזיכרון ומדידת גז לכל פעולה"""
+    w3 = new_chain()
+    accounts = w3.eth.accounts
+
+    def gas_used(tx_hash):
+        return w3.eth.wait_for_transaction_receipt(tx_hash)['gasUsed']
+
+    results = {}
+    contract, receipt = deploy_registry(w3, artifact_path)
+    results['deploy'] = receipt['gasUsed']
+
+    name, specialization, license_number, email = DOCTOR
+    results['registerDoctor'] = [
+        gas_used(contract.functions.registerDoctor(
+            accounts[i], name, specialization, license_number.format(i), email.format(i)
+        ).transact({'from': accounts[0], 'gas': TX_GAS}))
+        for i in (1, 2)
+    ]
+    results['approveDoctor'] = gas_used(
+        contract.functions.approveDoctor(accounts[1]).transact({'from': accounts[0], 'gas': TX_GAS})
+    )
+
+    patient_name, age, medical_id = PATIENT
+    results['registerPatient'] = [
+        gas_used(contract.functions.registerPatient(
+            Web3.to_checksum_address('0x%040x' % (1000 + i)), patient_name, age, medical_id.format(i)
+        ).transact({'from': accounts[1], 'gas': TX_GAS}))
+        for i in range(patients)
+    ]
+
+    # פונקציות אצווה, רק בחוזים שיש בהם אותן. הגז מחולק למטופל / רופא אחד
+    if has_function(contract, 'registerPatients'):
+        wallets = [Web3.to_checksum_address('0x%040x' % (2000 + i)) for i in range(patients)]
+        results['registerPatients'] = gas_used(contract.functions.registerPatients(
+            wallets, [patient_name] * patients, [age] * patients,
+            [medical_id.format(100 + i) for i in range(patients)]
+        ).transact({'from': accounts[1], 'gas': TX_GAS})) // patients
+    if has_function(contract, 'approveDoctors'):
+        for i in (3, 4):
+            contract.functions.registerDoctor(
+                accounts[i], name, specialization, license_number.format(i), email.format(i)
+            ).transact({'from': accounts[0], 'gas': TX_GAS})
+        results['approveDoctors'] = gas_used(contract.functions.approveDoctors(
+            [accounts[3], accounts[4]]
+        ).transact({'from': accounts[0], 'gas': TX_GAS})) // 2
+    return results
+
+
+def compare_gas(baseline_path=BASELINE_ARTIFACT, new_path=NEW_ARTIFACT, output_path=None):
+    print("משווה צריכת גז בין גרסאות החוזה...\n")
+    print(f"גרסה ישנה: {baseline_path}")
+    print(f"גרסה חדשה: {new_path}\n")
+
+    baseline = measure(baseline_path)
+    new = measure(new_path)
+
+    print(f"{'פעולה':<28}{'ישן':>12}{'חדש':>12}{'שינוי':>10}")
+    rows = [
+        ('deploy', baseline['deploy'], new['deploy']),
+        ('registerDoctor (ראשון)', baseline['registerDoctor'][0], new['registerDoctor'][0]),
+        ('registerDoctor (נוסף)', baseline['registerDoctor'][1], new['registerDoctor'][1]),
+        ('approveDoctor', baseline['approveDoctor'], new['approveDoctor']),
+        ('registerPatient (ראשון)', baseline['registerPatient'][0], new['registerPatient'][0]),
+        ('registerPatient (נוסף)', baseline['registerPatient'][-1], new['registerPatient'][-1]),
+    ]
+    for key, label in (('registerPatients', 'registerPatients (למטופל)'), ('approveDoctors', 'approveDoctors (לרופא)')):
+        if key in new:
+            rows.append((label, baseline.get(key), new[key]))
+    for label, old_gas, new_gas in rows:
+        if old_gas is None:
+            print(f"{label:<28}{'-':>12}{new_gas:>12}")
+            continue
+        change = (new_gas - old_gas) / old_gas * 100
+        print(f"{label:<28}{old_gas:>12}{new_gas:>12}{change:>9.1f}%")
+
+    results = {'baseline': baseline, 'new': new}
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nהתוצאות נשמרו ב: {output_path}")
+    return results
+
+
+def artifact_at(ref, directory):
+    """ה-artifact שבמאגר כפי שהיה ב-ref של git (למשל לפני שינוי בחוזה)"""
+    path = Path(directory) / 'baseline.json'
+    path.write_bytes(subprocess.run(
+        ['git', 'show', f'{ref}:{BASELINE_ARTIFACT.relative_to(ROOT_DIR).as_posix()}'],
+        check=True, capture_output=True, cwd=ROOT_DIR
+    ).stdout)
+    return path
+
+
+def new_artifact(directory):
+    """build/ אם קיים, אחרת קומפילציה של הקוד הנוכחי (דורש solc מותקן)"""
+    if NEW_ARTIFACT.exists():
+        return NEW_ARTIFACT
+    path = compile_registry(directory)
+    if path is None:
+        raise SystemExit("אין build/MedicalRegistry.json ו-solc לא מותקן, יש להריץ python -m scripts.compile_contract")
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="השוואת גז בין שני קבצי חוזה מקומפלים (הרצה: python -m tests.compare_gas)"
+    )
+    parser.add_argument('--baseline', help=f"ברירת מחדל: {BASELINE_ARTIFACT}")
+    parser.add_argument('--baseline-ref', help=f"גרסת git שממנה נלקח {BASELINE_ARTIFACT}, למשל main")
+    parser.add_argument('--new', help=f"ברירת מחדל: {NEW_ARTIFACT}, או קומפילציה של הקוד הנוכחי")
+    parser.add_argument('--output', help="קובץ JSON לשמירת הגז לכל פונקציה בשתי הגרסאות")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.baseline_ref:
+            baseline = artifact_at(args.baseline_ref, directory)
+        else:
+            baseline = args.baseline or BASELINE_ARTIFACT
+        compare_gas(baseline, args.new or new_artifact(directory), args.output)
@@ -0,0 +1,94 @@
+import shutil
+
+import pytest
+
+from tests import local_chain
+from tests.local_chain import Devnet, compile_registry
+
+# סקריפטים ידניים מול רשתות חיות, לא רצים בלי --run-network
+NETWORK_SCRIPTS = {'test_alchemy.py', 'test_connection.py'}
+
+
+def pytest_addoption(parser):
+    parser.addoption('--run-network', action='store_true',
+                     help="הרצת בדיקות החיבור לרשתות חיות (Sepolia, Infura, Alchemy)")
+    parser.addoption('--seed-doctors', type=int, default=3, help="מספר רופאים ברשת הבדיקה")
+    parser.addoption('--seed-patients', type=int, default=5, help="מספר מטופלים לכל רופא מאושר")
+    parser.addoption('--require-current-contract', action='store_true',
+                     help="כישלון במקום דילוג כשלחוזה חסרות פונקציות או שה-artifact ישן (ל-CI)")
+
+
+def pytest_configure(config):
+    local_chain.REQUIRE_CURRENT_CONTRACT = config.getoption('--require-current-contract')
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--run-network'):
+        return
+    skip_network = pytest.mark.skip(reason="בדיקת רשת חיה, הרצה עם --run-network")
+    for item in items:
+        if item.path.name in NETWORK_SCRIPTS:
+            item.add_marker(skip_network)
+
+
+@pytest.fixture(scope='session')
+def compiled_artifact(tmp_path_factory):
+    """החוזה מקומפל מהמקור כש-solc מותקן, אחרת None"""
+    return compile_registry(tmp_path_factory.mktemp('contract'))
+
+
+@pytest.fixture(scope='session')
+def seeded_devnet(request, compiled_artifact):
+    """רשת EVM בזיכרון עם החוזה והנתונים הזרועים, נבנית פעם אחת לכל הריצה.
+
+    החוזה מקומפל מהמקור כשאפשר, אחרת נפרס ה-artifact שבמאגר.
+    """
+    return Devnet(
+        doctors=request.config.getoption('--seed-doctors'),
+        patients_per_doctor=request.config.getoption('--seed-patients'),
+        artifact_path=compiled_artifact,
+    )
+
+
+@pytest.fixture
+def devnet(seeded_devnet):
+    """הרשת הזרועה, כל שינוי של הבדיקה מבוטל בסופה"""
+    snapshot_id = seeded_devnet.snapshot()
+    yield seeded_devnet
+    seeded_devnet.revert(snapshot_id)
+
+
+@pytest.fixture
+def service(devnet):
+    """RegistryService שקורא ישירות מהחוזה"""
+    from src.registry_service import RegistryService
+
+    service = RegistryService(devnet.w3, devnet.contract)
+    yield service
+    service.close()
+
+
+@pytest.fixture(scope='session')
+def seeded_index_path(seeded_devnet, tmp_path_factory):
+    """אינדקס אירועים של מצב הזריעה, נבנה פעם אחת ומועתק לכל בדיקה"""
+    from src.registry_indexer import RegistryIndexer
+
+    path = tmp_path_factory.mktemp('index') / 'index.sqlite'
+    indexer = RegistryIndexer(seeded_devnet.w3, seeded_devnet.contract, db_path=path)
+    indexer.sync()
+    indexer.close()
+    return path
+
+
+@pytest.fixture
+def indexed_service(devnet, seeded_index_path, tmp_path):
+    """RegistryService שקורא מאינדקס אירועים מקומי בתיקייה זמנית"""
+    from src.registry_indexer import RegistryIndexer
+    from src.registry_service import RegistryService
+
+    db_path = tmp_path / 'index.sqlite'
+    shutil.copyfile(seeded_index_path, db_path)
+    indexer = RegistryIndexer(devnet.w3, devnet.contract, db_path=db_path)
+    service = RegistryService(devnet.w3, devnet.contract, indexer=indexer)
+    yield service
+    service.close()
@@ -1,12 +1,13 @@
 import json
-from pathlib import Path
+
+from src.artifacts import ROOT_DIR, get_artifact
 
 def extract_abi():
     print("מחלץ ABI מהחוזה המקומפל...")
     
     try:
         # יצירת תיקיית build אם לא קיימת
-        build_dir = Path("build")
+        build_dir = ROOT_DIR / "build"
         build_dir.mkdir(exist_ok=True)
         
         # בדיקה אם קובץ החוזה המקומפל קיים
@@ -14,12 +15,8 @@ def extract_abi():
         if not contract_file.exists():
             raise FileNotFoundError("קובץ החוזה המקומפל לא נמצא. הרץ קודם compile_contract.py")
         
-        # קריאת הקובץ המקומפל
-        with open(contract_file, 'r') as f:
-            compiled_contract = json.load(f)
-        
-        # חילוץ ה-ABI
-        contract_abi = compiled_contract['contracts']['MedicalRegistry.sol']['MedicalRegistry']['abi']
+        # חילוץ ה-ABI (נטען פעם אחת דרך מטמון התוצרים)
+        contract_abi = get_artifact(contract_file).abi
         
         # שמירת ה-ABI בקובץ נפרד
         abi_file = build_dir / "contract_abi.json"
@@ -0,0 +1,141 @@
+import json
+from pathlib import Path
+
+import pytest
+from web3 import Web3, EthereumTesterProvider
+
+from src.artifacts import get_artifact, ROOT_DIR, SOURCE_NAME, CONTRACT_NAME
+from src.registry_reader import has_function
+from src.registry_writer import approval_calls, chunked, patient_batch_size, register_patients_function
+
+# מגבלת גז קבועה לטרנזקציות, חוסכת הערכת גז לפני כל שליחה
+TX_GAS = 3000000
+
+# יתרה התחלתית לכל חשבון רופא שנוצר לבדיקות
+ACCOUNT_FUNDING = Web3.to_wei(10, 'ether')
+
+# נקבע מ---require-current-contract: חוזה ישן מכשיל את הבדיקות במקום לדלג עליהן
+REQUIRE_CURRENT_CONTRACT = False
+
+
+def load_artifact(path=None):
+    artifact = get_artifact(path)
+    return artifact.abi, artifact.bytecode
+
+
+def compile_registry(directory):
+    """קומפילציה של החוזה מהמקור אל directory, כך שהבדיקות רצות מול הקוד הנוכחי.
+
+    רק כש-solc בגרסה הנדרשת כבר מותקן (הבדיקות לא מורידות קומפיילר),
+    אחרת None והבדיקות משתמשות ב-artifact שבמאגר.
+    """
+    try:
+        from solcx import compile_standard, get_installed_solc_versions
+        from scripts.compile_contract import SOLC_VERSION, compile_settings
+    except ImportError:
+        return None
+    if SOLC_VERSION not in [str(version) for version in get_installed_solc_versions()]:
+        return None
+
+    source = (ROOT_DIR / 'contracts' / SOURCE_NAME).read_text(encoding='utf-8')
+    compiled = compile_standard(
+        {
+            'language': 'Solidity',
+            'sources': {SOURCE_NAME: {'content': source}},
+            'settings': compile_settings(),
+        },
+        solc_version=SOLC_VERSION,
+    )
+    path = Path(directory) / f'{CONTRACT_NAME}.json'
+    path.write_text(json.dumps(compiled), encoding='utf-8')
+    return path
+
+
+def require_function(contract, fn_name):
+    """דילוג על בדיקה כשהחוזה הפרוס ישן מדי עבורה, או כישלון עם --require-current-contract"""
+    if not has_function(contract, fn_name):
+        message = f"לחוזה הפרוס אין {fn_name}: יש להתקין solc או להריץ python -m scripts.compile_contract --bundle"
+        if REQUIRE_CURRENT_CONTRACT:
+            pytest.fail(message)
+        pytest.skip(message)
+
+
+def new_chain():
+    """רשת EVM מקומית בזיכרון, ללא תלות ברשת"""
+    return Web3(EthereumTesterProvider())
+
+
+def deploy_registry(w3, artifact_path=None):
+    """פריסת MedicalRegistry מהחשבון הראשון, מחזיר את החוזה ואת הקבלה"""
+    abi, bytecode = load_artifact(artifact_path)
+    factory = w3.eth.contract(abi=abi, bytecode=bytecode)
+    tx_hash = factory.constructor().transact({'from': w3.eth.accounts[0]})
+    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+    return w3.eth.contract(address=receipt['contractAddress'], abi=abi), receipt
+
+
+def entity_address(kind, index):
+    """כתובת דטרמיניסטית לישות בדיקה (רופא / מטופל)"""
+    prefix = {'doctor': 0xD0C, 'patient': 0xBA7}[kind]
+    return Web3.to_checksum_address('0x%03x%037x' % (prefix, index))
+
+
+def funded_account(w3, kind, index):
+    """חשבון בדיקה דטרמיניסטי: נפתח לשליחה ב-eth-tester וממומן מהחשבון הראשון"""
+    private_key = Web3.keccak(text=f"{kind}-{index}")
+    address = Web3.to_checksum_address(w3.provider.ethereum_tester.add_account(private_key.hex()))
+    w3.eth.send_transaction({'from': w3.eth.accounts[0], 'to': address, 'value': ACCOUNT_FUNDING})
+    return address
+
+
+def seed_registry(w3, contract, doctors, patients_per_doctor, pending=1):
+    """רישום רופאים ומטופלים דטרמיניסטיים.
+
+    כל הרופאים נרשמים ע"י המנהל, כולם מאושרים מלבד pending האחרונים,
+    ולכל רופא מאושר נרשמים patients_per_doctor מטופלים (בקבוצות כשהחוזה תומך).
+    מחזיר מילון עם רשימות approved / pending ומיפוי רופא -> כתובות מטופלים.
+    """
+    admin = w3.eth.accounts[0]
+    addresses = [funded_account(w3, 'doctor', i) for i in range(doctors)]
+    for i, address in enumerate(addresses):
+        contract.functions.registerDoctor(
+            address, f"Doctor {i}", "Cardiology" if i % 2 else "Neurology", f"LIC-{i:06d}", f"doctor{i}@clinic.org"
+        ).transact({'from': admin, 'gas': TX_GAS})
+
+    approved = addresses[:max(doctors - pending, 0)]
+    for _, contract_function in approval_calls(contract, approved) if approved else []:
+        contract_function.transact({'from': admin, 'gas': TX_GAS})
+
+    patients = {}
+    for d, doctor in enumerate(approved):
+        rows = [
+            (entity_address('patient', d * patients_per_doctor + i), f"Patient {d}-{i}", 20 + i % 60, f"MID-{d}-{i}")
+            for i in range(patients_per_doctor)
+        ]
+        for chunk in chunked(rows, patient_batch_size(contract)):
+            register_patients_function(contract, chunk).transact({'from': doctor, 'gas': TX_GAS})
+        patients[doctor] = [row[0] for row in rows]
+
+    return {'approved': approved, 'pending': addresses[len(approved):], 'patients': patients}
+
+
+class Devnet:
+    """רשת מקומית עם חוזה פרוס ונתונים זרועים, עם צילום מצב וחזרה אליו"""
+
+    def __init__(self, doctors=3, patients_per_doctor=5, pending=1, artifact_path=None):
+        self.w3 = new_chain()
+        self.admin = self.w3.eth.accounts[0]
+        self.contract, self.deploy_receipt = deploy_registry(self.w3, artifact_path)
+        seeded = seed_registry(self.w3, self.contract, doctors, patients_per_doctor, pending)
+        self.approved = seeded['approved']
+        self.pending = seeded['pending']
+        self.doctors = self.approved + self.pending
+        self.patients = seeded['patients']
+
+    def snapshot(self):
+        """צילום מצב ה-EVM, מחזיר מזהה לחזרה"""
+        return self.w3.provider.make_request('evm_snapshot', [])['result']
+
+    def revert(self, snapshot_id):
+        """חזרה למצב שצולם, כולל בלוקים, יתרות ו-nonce"""
+        self.w3.provider.make_request('evm_revert', [snapshot_id])
@@ -0,0 +1,585 @@
+import asyncio
+
+import pytest
+from eth_tester.exceptions import TransactionFailed
+from web3 import Web3
+
+from src.registry_reader import load_doctors, load_patients
+from tests import local_chain
+from tests.local_chain import TX_GAS, entity_address, require_function
+
+ZERO_ADDRESS = '0x' + '00' * 20
+
+
+def test_seeded_registry(devnet):
+    rows = load_doctors(devnet.w3, devnet.contract)
+    assert [row[0] for row in rows] == devnet.doctors
+    assert [row[4] for row in rows] == [True] * len(devnet.approved) + [False] * len(devnet.pending)
+
+    for doctor, patients in devnet.patients.items():
+        assert [row[0] for row in load_patients(devnet.w3, devnet.contract, doctor)] == patients
+
+
+def test_devnet_reverts_to_snapshot(devnet):
+    snapshot_id = devnet.snapshot()
+    devnet.contract.functions.registerDoctor(
+        entity_address('doctor', 999), "Temporary", "Surgery", "LIC-TEMP", "temp@clinic.org"
+    ).transact({'from': devnet.admin, 'gas': TX_GAS})
+    assert len(devnet.contract.functions.getAllDoctors().call()) == len(devnet.doctors) + 1
+
+    devnet.revert(snapshot_id)
+    assert devnet.contract.functions.getAllDoctors().call() == devnet.doctors
+
+
+def test_admin_address(devnet, monkeypatch):
+    from eth_account import Account
+    from src.registry_service import admin_address
+
+    monkeypatch.delenv('ADMIN_PRIVATE_KEY', raising=False)
+    assert admin_address(devnet.w3) == devnet.admin
+    # מפתח מקומי קודם לחשבונות הצומת
+    key = Web3.keccak(text="admin").hex()
+    monkeypatch.setenv('ADMIN_PRIVATE_KEY', key)
+    assert admin_address(devnet.w3) == Account.from_key(key).address
+
+
+def test_pending_doctors(service, indexed_service, devnet):
+    for registry in (service, indexed_service):
+        assert [row[0] for row in registry.doctor_rows(pending_only=True)] == devnet.pending
+        assert len(registry.doctor_rows()) == len(devnet.doctors)
+
+
+def test_pages_match_full_reads(service, indexed_service, devnet):
+    doctor = devnet.approved[0]
+    for registry in (service, indexed_service):
+        assert registry.doctors_page(1, 2) == (len(devnet.doctors), registry.doctor_rows()[1:3])
+        assert registry.doctors_page(0, 10, pending_only=True) == (len(devnet.pending), registry.doctor_rows(True))
+        assert registry.patients_page(doctor, 2, 2) == (len(devnet.patients[doctor]), registry.patient_rows(doctor)[2:4])
+        with pytest.raises(PermissionError):
+            registry.patients_page(doctor, 0, 2, caller=devnet.approved[1])
+
+
+def test_approve_doctors(indexed_service, devnet):
+    submitted = indexed_service.approve_doctors(devnet.pending)
+    assert all(pending.result(timeout=30).status == 1 for _, pending in submitted)
+    assert indexed_service.doctor_rows(pending_only=True) == []
+    # נשמר במטמון לפני האישור, מתעדכן כשהקבלה מגיעה
+    assert indexed_service.get_doctor_details(devnet.pending[0])[4] is True
+
+
+def test_register_patient(service, devnet):
+    doctor = devnet.approved[0]
+    wallet = entity_address('patient', 10**6)
+    receipt = service.register_patient(doctor, wallet, "New Patient", 41, "MID-NEW").result(timeout=30)
+    assert receipt.status == 1
+
+    rows = service.patient_rows(doctor)
+    assert rows[-1][:4] == (wallet, "New Patient", 41, "MID-NEW")
+    assert len(rows) == len(devnet.patients[doctor]) + 1
+
+
+def test_bulk_registration_statuses(service, devnet):
+    doctor = devnet.approved[0]
+    rows = [
+        {'wallet': entity_address('patient', 10**6 + i), 'name': f"Bulk {i}", 'age': 30, 'medicalId': f"B{i}"}
+        for i in range(3)
+    ]
+    rows.append({'wallet': devnet.patients[doctor][0], 'name': "Again", 'age': 30, 'medicalId': "X"})
+    rows.append({'wallet': "not an address", 'name': "Bad", 'age': 30, 'medicalId': "Y"})
+    # הגיל נשמר כ-uint8 בחוזה
+    rows.append({'wallet': entity_address('patient', 10**6 + 9), 'name': "Old", 'age': 256, 'medicalId': "Z"})
+
+    results = service.register_patients(doctor, rows)
+    assert [result['status'] for result in results] == ['confirmed'] * 3 + ['skipped', 'invalid', 'invalid']
+    assert results[-1]['error'] == "Age must be at most 255"
+
+
+def test_import_reports_malformed_lines(service, devnet, tmp_path):
+    path = tmp_path / 'patients.jsonl'
+    path.write_text('\n'.join([
+        '{"wallet": "%s", "name": "Line One", "age": 30, "medicalId": "J1"}' % entity_address('patient', 10**6),
+        '{"wallet": "%s", "name": "Broken"' % entity_address('patient', 10**6 + 1),
+        '["not", "an", "object"]',
+        '{"wallet": "%s", "name": "Line Four", "age": 40, "medicalId": "J4"}' % entity_address('patient', 10**6 + 2),
+    ]), encoding='utf-8')
+
+    results = service.patient_importer(devnet.approved[0]).run(path)
+    assert [result['status'] for result in results] == ['confirmed', 'invalid', 'invalid', 'confirmed']
+    assert results[1]['error'].startswith("Invalid JSON")
+
+
+def test_unapproved_doctor_cannot_register_patients(service, devnet):
+    doctor, wallet = devnet.pending[0], entity_address('patient', 10**6)
+    with pytest.raises(TransactionFailed, match="Only registered and approved doctors"):
+        devnet.contract.functions.registerPatient(wallet, "Nobody", 30, "MID-X").call({'from': doctor})
+
+    # נשלחת עם גז קבוע, נכרית ונכשלת
+    receipt = service.register_patient(doctor, wallet, "Nobody", 30, "MID-X").result(timeout=30)
+    assert receipt.status == 0
+    assert devnet.contract.functions.getPatientDetails(wallet).call({'from': devnet.admin})[3] == ZERO_ADDRESS
+
+
+def test_paged_reads(devnet):
+    require_function(devnet.contract, 'getDoctorsPage')
+    from src.registry_reader import MAX_PAGE_SIZE
+
+    functions = devnet.contract.functions
+    assert functions.MAX_PAGE_SIZE().call() == MAX_PAGE_SIZE
+    assert functions.getDoctorsPage(1, 2).call()[0] == devnet.doctors[1:3]
+    assert functions.getDoctorsPage(len(devnet.doctors), 2).call()[0] == []
+    with pytest.raises(TransactionFailed, match="Page size too large"):
+        functions.getDoctorsPage(0, MAX_PAGE_SIZE + 1).call()
+
+    assert [row[0] for row in load_doctors(devnet.w3, devnet.contract, page_size=1)] == devnet.doctors
+    doctor, other_doctor = devnet.approved[:2]
+    rows = load_patients(devnet.w3, devnet.contract, doctor, page_size=2)
+    assert [row[0] for row in rows] == devnet.patients[doctor]
+    assert rows[0][1:4] == ("Patient 0-0", 20, "MID-0-0")
+    with pytest.raises(TransactionFailed):
+        functions.getPatientsPage(doctor, 0, 2).call({'from': other_doctor})
+
+
+def test_batch_registration(service, devnet):
+    require_function(devnet.contract, 'registerPatients')
+    require_function(devnet.contract, 'approveDoctors')
+    from src.registry_writer import MAX_PATIENT_BATCH
+
+    doctor = devnet.approved[0]
+    rows = [
+        {'wallet': entity_address('patient', 10**6 + i), 'name': f"Batch {i}", 'age': 30 + i, 'medicalId': f"B{i}"}
+        for i in range(3)
+    ]
+    results = service.register_patients(doctor, rows)
+    assert [result['status'] for result in results] == ['confirmed'] * 3
+    # כל השורות בטרנזקציה אחת
+    assert len({result['tx_hash'] for result in results}) == 1
+    assert [row[1:4] for row in service.patient_rows(doctor)[-3:]] == [
+        (row['name'], row['age'], row['medicalId']) for row in rows
+    ]
+
+    too_many = [entity_address('patient', 2 * 10**6 + i) for i in range(MAX_PATIENT_BATCH + 1)]
+    with pytest.raises(TransactionFailed, match="Batch too large"):
+        devnet.contract.functions.registerPatients(
+            too_many, ["X"] * len(too_many), [30] * len(too_many), ["M"] * len(too_many)
+        ).call({'from': doctor})
+
+    new_doctors = [entity_address('doctor', 1000 + i) for i in range(3)]
+    for i, address in enumerate(new_doctors):
+        service.register_doctor(address, f"New {i}", "Surgery", f"LIC-NEW-{i}", f"new{i}@clinic.org").result(timeout=30)
+    submitted = service.approve_doctors(devnet.pending + new_doctors)
+    assert [chunk for chunk, _ in submitted] == [devnet.pending + new_doctors]
+    assert all(pending.result(timeout=30).status == 1 for _, pending in submitted)
+    assert service.doctor_rows(pending_only=True) == []
+
+
+def test_record_hash_registration(devnet, tmp_path):
+    require_function(devnet.contract, 'registerPatientRecords')
+    from cryptography.fernet import Fernet
+    from src.record_store import RecordStore
+    from src.registry_service import RegistryService
+
+    doctor = devnet.approved[0]
+    # נרשם עם פרטים על השרשרת: גיבוב הרשומה נשאר ריק
+    details = devnet.contract.functions.getPatientDetails(devnet.patients[doctor][0]).call({'from': doctor})
+    assert details[5] == bytes(32)
+
+    key_path = tmp_path / 'encryption.key'
+    key_path.write_bytes(Fernet.generate_key())
+    store = RecordStore(db_path=tmp_path / 'records.sqlite', key_path=key_path)
+    service = RegistryService(devnet.w3, devnet.contract, record_store=store)
+    try:
+        wallet = entity_address('patient', 10**6)
+        assert service.register_patient(doctor, wallet, "Dana", 33, "MID-REC").result(timeout=30).status == 1
+
+        name, age, medical_id, doctor_address, _, record_hash = \
+            devnet.contract.functions.getPatientDetails(wallet).call({'from': doctor})
+        assert (name, age, medical_id, doctor_address) == ("", 0, "", doctor)
+        assert store.get_many([record_hash])[Web3.to_hex(record_hash)]['name'] == "Dana"
+        assert service.patient_rows(doctor)[-1][:4] == (wallet, "Dana", 33, "MID-REC")
+
+        results = service.register_patients(doctor, [
+            {'wallet': entity_address('patient', 10**6 + i), 'name': f"Record {i}", 'age': 40, 'medicalId': f"R{i}"}
+            for i in range(1, 4)
+        ])
+        assert [result['status'] for result in results] == ['confirmed'] * 3
+        assert len({result['tx_hash'] for result in results}) == 1
+        assert [row[1] for row in service.patient_rows(doctor)[-3:]] == ["Record 1", "Record 2", "Record 3"]
+    finally:
+        service.close()
+
+
+def test_import_stores_records_only_when_mined(devnet, tmp_path):
+    require_function(devnet.contract, 'registerPatientRecords')
+    from cryptography.fernet import Fernet
+    from src.bulk_import import PatientImporter
+    from src.record_store import RecordStore
+
+    key_path = tmp_path / 'encryption.key'
+    key_path.write_bytes(Fernet.generate_key())
+    store = RecordStore(db_path=tmp_path / 'records.sqlite', key_path=key_path)
+    rows = [(1, {'wallet': entity_address('patient', 10**6), 'name': "Dana", 'age': 33, 'medicalId': "MID-1"})]
+    try:
+        # רופא שלא אושר: הטרנזקציה נכשלת ולא נשארת רשומה יתומה במאגר
+        importer = PatientImporter(devnet.w3, devnet.contract, devnet.pending[0], record_store=store)
+        results = importer.collect_receipts(importer.submit(importer.prepare(rows)))
+        importer.sender.close()
+        assert results[0]['status'] == 'failed'
+        assert store.db.execute("SELECT COUNT(*) FROM records").fetchone() == (0,)
+
+        importer = PatientImporter(devnet.w3, devnet.contract, devnet.approved[0], record_store=store)
+        results = importer.collect_receipts(importer.submit(importer.prepare(rows)))
+        importer.sender.close()
+        assert results[0]['status'] == 'confirmed'
+        assert store.db.execute("SELECT COUNT(*) FROM records").fetchone() == (1,)
+    finally:
+        store.close()
+
+
+def test_import_rejects_key_of_another_account(devnet):
+    from eth_account import Account
+    from src.bulk_import import PatientImporter
+
+    with pytest.raises(ValueError, match="does not belong"):
+        PatientImporter(devnet.w3, devnet.contract, devnet.approved[0], private_key=Account.create().key)
+
+
+def test_bundled_artifact_is_current(compiled_artifact):
+    """ה-artifact שבמאגר תואם לקוד החוזה, אחרת יש להריץ compile_contract --bundle"""
+    import json
+    from src.artifacts import get_artifact, source_hash, ARTIFACT_PATHS, ROOT_DIR, SOURCE_NAME
+
+    if compiled_artifact is None:
+        # בלי solc: השוואה לגיבוב המקור ש-compile_contract --bundle רושם
+        recorded = json.loads(ARTIFACT_PATHS[-1].read_text(encoding='utf-8')).get('sourceHash')
+        if recorded is None:
+            message = "solc לא מותקן וה-artifact נבנה לפני שנרשם בו גיבוב המקור"
+            if local_chain.REQUIRE_CURRENT_CONTRACT:
+                pytest.fail(message)
+            pytest.skip(message)
+        assert recorded == source_hash((ROOT_DIR / 'contracts' / SOURCE_NAME).read_text(encoding='utf-8'))
+        return
+
+    bundled, compiled = get_artifact(ARTIFACT_PATHS[-1]), get_artifact(compiled_artifact)
+    assert bundled.abi == compiled.abi
+    assert bundled.bytecode == compiled.bytecode
+
+
+def test_http_api(indexed_service, devnet):
+    from aiohttp.test_utils import TestClient, TestServer
+    from src.registry_api import create_app
+
+    doctor, other_doctor = devnet.approved[:2]
+    tokens = {'admin-token': devnet.admin, 'doctor-token': doctor, 'other-token': other_doctor}
+
+    def auth(token):
+        return {'Authorization': f'Bearer {token}'}
+
+    async def run():
+        async with TestClient(TestServer(create_app(indexed_service, tokens))) as client:
+            status = await (await client.get('/status')).json()
+            assert status['contract'] == devnet.contract.address
+
+            assert (await client.get('/doctors')).status == 401
+            assert (await client.get('/doctors', headers=auth('wrong-token'))).status == 401
+
+            page = await (await client.get('/doctors?pending=true', headers=auth('admin-token'))).json()
+            assert [doctor['address'] for doctor in page['doctors']] == devnet.pending
+
+            response = await client.get('/doctors?limit=0', headers=auth('admin-token'))
+            assert response.status == 400
+
+            for token in ('admin-token', 'doctor-token'):
+                page = await (await client.get(f'/doctors/{doctor}/patients?limit=2', headers=auth(token))).json()
+                assert page['total'] == len(devnet.patients[doctor])
+                assert len(page['patients']) == 2
+
+            # רופא אחר לא קורא ולא רושם מטופלים בשם הרופא
+            response = await client.get(f'/doctors/{doctor}/patients', headers=auth('other-token'))
+            assert response.status == 403
+            response = await client.post(f'/doctors/{doctor}/patients', headers=auth('other-token'),
+                                         json={'patients': []})
+            assert response.status == 403
+            patient = {'wallet': entity_address('patient', 9999), 'name': "Dana", 'age': 33, 'medicalId': "MID-API"}
+            body = await (await client.post(f'/doctors/{doctor}/patients', headers=auth('doctor-token'),
+                                            json={'patients': [patient]})).json()
+            assert [result['status'] for result in body['results']] == ['confirmed']
+
+            # רק המנהל רושם ומאשר רופאים
+            response = await client.post('/doctors/approve', headers=auth('doctor-token'),
+                                         json={'addresses': devnet.pending})
+            assert response.status == 403
+
+            metrics = await (await client.get('/metrics')).text()
+            assert 'medical_operation_seconds_count{operation="api GET /doctors"}' in metrics
+
+    asyncio.run(run())
+
+
+def test_api_tokens():
+    from src.registry_api import parse_api_tokens
+
+    address = entity_address('doctor', 1)
+    assert parse_api_tokens(f' a-token={address.lower()} ,') == {'a-token': address}
+    assert parse_api_tokens(None) == {}
+    with pytest.raises(ValueError):
+        parse_api_tokens('a-token')
+
+
+def test_search_index(service):
+    from src.search_index import SearchIndex, DOCTOR_SEARCH_FIELDS, doctor_search_values
+
+    rows = service.doctor_rows()
+    index = SearchIndex(DOCTOR_SEARCH_FIELDS, extract=doctor_search_values)
+    index.update(rows)
+
+    assert [row[1] for row in index.filter(rows, 'spec:cardio')] == [row[1] for row in rows if row[2] == "Cardiology"]
+    assert [row[0] for row in index.filter(rows, 'status:pending')] == [row[0] for row in rows if not row[4]]
+    assert index.filter(rows, 'doctor 0 lic-000000') == rows[:1]
+    assert index.filter(rows, 'no such doctor') == []
+
+
+def test_export_matches_index(devnet, indexed_service, tmp_path):
+    from functools import partial
+    from src.registry_export import doctor_pages, index_pages, export_rows
+    from src.registry_reader import MAX_PAGE_SIZE
+
+    chain_path, index_path = tmp_path / 'chain.csv', tmp_path / 'index.csv'
+    export_rows(partial(doctor_pages, devnet.w3, devnet.contract, devnet.admin), 'doctors', chain_path)
+    rows = export_rows(partial(index_pages, indexed_service.indexer, 'doctors'), 'doctors', index_path)
+    assert rows == len(devnet.doctors)
+    assert chain_path.read_text() == index_path.read_text()
+
+    # נדחה לפני כל קריאה לחוזה, ולא באמצע הייצוא
+    with pytest.raises(ValueError):
+        next(doctor_pages(devnet.w3, devnet.contract, devnet.admin, page_size=MAX_PAGE_SIZE + 1))
+
+
+def test_parquet_export_round_trip(tmp_path, monkeypatch):
+    pq = pytest.importorskip('pyarrow.parquet')
+    from src import registry_export
+    from src.registry_export import export_rows, PATIENT_FIELDS
+
+    monkeypatch.setattr(registry_export, 'PARQUET_ROWS_PER_PART', 2)
+    rows = [
+        dict(zip(PATIENT_FIELDS, (entity_address('doctor', 1), entity_address('patient', i),
+                                  f"Patient {i}", 30 + i, f"MID-{i}", 1700000000 + i, None)))
+        for i in range(4)
+    ]
+    # החלק השני מכיל רק מטופלים שנרשמו לפי גיבוב
+    for row in rows[2:]:
+        row.update(name="", age=0, medicalId="", recordHash='0x' + '22' * 32)
+
+    path = tmp_path / 'patients.parquet'
+    assert export_rows(lambda start: iter([(2, rows[:2]), (4, rows[2:])]), 'patients', path, 'parquet') == 4
+    assert len(list(path.glob('part-*.parquet'))) == 2
+    assert pq.read_table(path).to_pylist() == rows
+
+
+def test_record_store(tmp_path):
+    from cryptography.fernet import Fernet
+    from src.record_store import RecordStore, RecordIntegrityError
+    from src.registry_export import decrypted_pages
+
+    key_path = tmp_path / 'encryption.key'
+    key_path.write_bytes(Fernet.generate_key())
+    store = RecordStore(db_path=tmp_path / 'records.sqlite', key_path=key_path)
+    try:
+        record = {'name': "Dana", 'age': 33, 'medicalId': "MID-1"}
+        record_hash = store.put(entity_address('patient', 1), entity_address('doctor', 1), record)
+        assert store.get_many([Web3.to_bytes(hexstr=record_hash)]) == {record_hash: record}
+
+        # ייצוא: מטופל שנרשם לפי גיבוב מקבל את פרטיו מהמאגר, גיבוב לא מוכר נשאר ריק
+        rows = [{'name': "", 'age': 0, 'medicalId': "", 'recordHash': record_hash},
+                {'name': "", 'age': 0, 'medicalId': "", 'recordHash': '0x' + '11' * 32}]
+        [(position, rows)] = decrypted_pages([(1, rows)], store)
+        assert rows[0] == dict(record, recordHash=record_hash)
+        assert rows[1]['name'] == ""
+
+        # רשומה שהטרנזקציה שלה נכשלה נמחקת
+        other = store.put(entity_address('patient', 2), entity_address('doctor', 1), record)
+        store.delete([other])
+        assert store.get_many([other]) == {}
+
+        store.db.execute("UPDATE records SET ciphertext = ?", (b'tampered',))
+        with pytest.raises(RecordIntegrityError):
+            store.get_many([record_hash])
+    finally:
+        store.close()
+
+
+def test_snapshot_restore(devnet, indexed_service, tmp_path):
+    from src.registry_snapshot import chain_records, index_records, write_snapshot, read_snapshot, restore_snapshot
+    from src.tx_sender import TransactionSender
+    from tests.local_chain import deploy_registry
+
+    chain_path, index_path = tmp_path / 'chain.jsonl.gz', tmp_path / 'index.jsonl.gz'
+    header = write_snapshot(chain_records(devnet.w3, devnet.contract, devnet.admin), chain_path)
+    assert header['counts'] == {'doctor': len(devnet.doctors), 'patient': sum(map(len, devnet.patients.values()))}
+    write_snapshot(index_records(indexed_service.indexer), index_path)
+    assert list(read_snapshot(chain_path)) == list(read_snapshot(index_path))
+
+    target, _ = deploy_registry(devnet.w3)
+    sender = TransactionSender(devnet.w3)
+    try:
+        summary = restore_snapshot(devnet.w3, target, chain_path, devnet.admin, sender)
+        assert summary['patients'] == {'confirmed': header['counts']['patient']}
+        write_snapshot(chain_records(devnet.w3, target, devnet.admin), tmp_path / 'target.jsonl.gz')
+        assert list(read_snapshot(tmp_path / 'target.jsonl.gz')) == list(read_snapshot(chain_path))
+
+        # שחזור חוזר לא שולח דבר
+        summary = restore_snapshot(devnet.w3, target, chain_path, devnet.admin, sender)
+        assert summary['doctors'] == {'existing': len(devnet.doctors)}
+        assert summary['patients'] == {'skipped': header['counts']['patient']}
+    finally:
+        sender.close()
+
+
+def test_encrypted_snapshot(devnet, tmp_path):
+    import gzip
+    from cryptography.fernet import Fernet
+    from src.registry_snapshot import chain_records, write_snapshot, read_snapshot, verify_snapshot
+
+    key = Fernet.generate_key()
+    plain_path, encrypted_path = tmp_path / 'plain.jsonl.gz', tmp_path / 'encrypted.jsonl.gz'
+    write_snapshot(chain_records(devnet.w3, devnet.contract, devnet.admin), plain_path)
+    header = write_snapshot(chain_records(devnet.w3, devnet.contract, devnet.admin), encrypted_path, key=key)
+    assert header['encryption'] == 'fernet'
+    assert list(read_snapshot(encrypted_path, key)) == list(read_snapshot(plain_path))
+
+    # שמות המטופלים לא מופיעים בקובץ
+    patient_name = next(record['name'] for kind, record in read_snapshot(plain_path) if kind == 'patient')
+    assert patient_name not in gzip.decompress(encrypted_path.read_bytes()).decode('utf-8')
+
+    with pytest.raises(ValueError):
+        verify_snapshot(encrypted_path)
+    with pytest.raises(ValueError):
+        verify_snapshot(encrypted_path, Fernet.generate_key())
+
+
+def test_details_cache_is_per_caller(service, devnet):
+    from src.rpc_batch import BatchCallError
+
+    doctor, other_doctor = devnet.approved[:2]
+    patient = devnet.patients[doctor][0]
+    assert service.details_cache.get_patient_details(patient, devnet.admin)[0] == "Patient 0-0"
+    assert service.details_cache.get_patient_details(patient, doctor)[0] == "Patient 0-0"
+    # החוזה מגביל למנהל ולרופא של המטופל, גם כשהתוצאה כבר במטמון
+    with pytest.raises(BatchCallError):
+        service.details_cache.get_patient_details(patient, other_doctor)
+
+
+def test_details_cache_keeps_pages(devnet):
+    require_function(devnet.contract, 'getDoctorsPage')
+    from src.details_cache import DetailsCache
+
+    cache = DetailsCache(devnet.w3, devnet.contract, poll_interval=0)
+    rows = load_doctors(devnet.w3, devnet.contract, page_size=2, cache=cache)
+    misses = cache.misses
+    assert load_doctors(devnet.w3, devnet.contract, page_size=2, cache=cache) == rows
+    assert cache.misses == misses
+
+    # רופא חדש מבטל את כל הדפים השמורים של רשימת הרופאים
+    wallet = entity_address('doctor', 999)
+    devnet.contract.functions.registerDoctor(
+        wallet, "Temporary", "Surgery", "LIC-TEMP", "temp@clinic.org"
+    ).transact({'from': devnet.admin, 'gas': TX_GAS})
+    assert [row[0] for row in load_doctors(devnet.w3, devnet.contract, page_size=2, cache=cache)] == \
+        devnet.doctors + [wallet]
+
+
+def test_indexer_rewinds_reorganized_blocks(devnet, seeded_index_path, tmp_path):
+    import shutil
+    from src.registry_indexer import RegistryIndexer
+
+    def register(index, empty_blocks):
+        devnet.contract.functions.registerDoctor(
+            entity_address('doctor', index), f"Doctor {index}", "Surgery", f"LIC-{index}", "doc@clinic.org"
+        ).transact({'from': devnet.admin, 'gas': TX_GAS})
+        for _ in range(empty_blocks):
+            devnet.w3.provider.make_request('evm_mine', [])
+
+    db_path = tmp_path / 'index.sqlite'
+    shutil.copyfile(seeded_index_path, db_path)
+    indexer = RegistryIndexer(devnet.w3, devnet.contract, db_path=db_path, confirmations=1)
+    try:
+        fork_point = devnet.snapshot()
+        # הבלוק האחרון עוד לא אושר, רק הרישום שלפניו נקרא
+        register(900, empty_blocks=1)
+        register(901, empty_blocks=0)
+        assert indexer.sync() == {entity_address('doctor', 900)}
+
+        # שרשרת חלופית מאותה נקודה: הרופא 900 נעלם מהאינדקס
+        devnet.revert(fork_point)
+        register(902, empty_blocks=2)
+        assert {entity_address('doctor', 900), entity_address('doctor', 902)} <= indexer.sync()
+        assert [row[0] for row in indexer.get_doctors()] == devnet.doctors + [entity_address('doctor', 902)]
+    finally:
+        indexer.close()
+
+
+def test_batch_rejected_as_a_whole(monkeypatch):
+    from web3 import HTTPProvider
+    from src import rpc_batch
+    from src.rpc_batch import BatchCallError
+
+    class Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32600, 'message': "Batch not supported"}}
+
+    w3 = Web3(HTTPProvider('http://127.0.0.1:9'))
+    monkeypatch.setattr(rpc_batch.requests, 'post', lambda *args, **kwargs: Response())
+    with pytest.raises(BatchCallError, match="Batch not supported"):
+        rpc_batch._post_batch(w3.provider, [('eth_chainId', [])])
+
+    # הבקשות נשלחות אחת אחת במקום
+    monkeypatch.setattr(w3.manager, 'request_blocking', lambda method, params: method)
+    assert rpc_batch.send_batch(w3, [('eth_chainId', []), ('eth_blockNumber', [])]) == \
+        ['eth_chainId', 'eth_blockNumber']
+
+
+def test_provider_checks_configured_chain(monkeypatch):
+    from src.rpc_provider import FailoverHTTPProvider
+
+    class Response:
+        status_code = 200
+        content = b''
+
+        def __init__(self, result):
+            self.result = result
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {'jsonrpc': '2.0', 'id': 0, 'result': self.result}
+
+    # הכתובת הראשונה שעונה נמצאת על רשת אחרת, והיא לא קובעת מה הרשת הנכונה
+    chains = {'http://wrong': '0x7', 'http://right': '0x5'}
+    provider = FailoverHTTPProvider(['http://wrong', 'http://right'], chain_id=5, retries=1)
+    monkeypatch.setattr(provider.session, 'post', lambda url, data, **kwargs: Response(
+        chains[url] if '"eth_chainId"' in data else url
+    ))
+    assert provider.make_request('eth_blockNumber', [])['result'] == 'http://right'
+    assert [endpoint.wrong_chain for endpoint in provider.endpoints] == [True, False]
+
+
+def test_receipt_watcher_keeps_block_receipts_after_transient_errors(devnet, monkeypatch):
+    from src import receipt_watcher
+    from src.receipt_watcher import ReceiptWatcher
+    from src.rpc_batch import BatchCallError
+
+    watcher = ReceiptWatcher(devnet.w3)
+    monkeypatch.setattr(receipt_watcher, 'send_batch', lambda w3, calls, batch_size: [
+        BatchCallError("Too many requests", -32005) for _ in calls
+    ])
+    with pytest.raises(BatchCallError):
+        watcher._block_receipts(range(1, 3))
+    assert watcher.block_receipts_supported is None
+
+    # רק צומת שאין לו את המתודה עובר לקריאת בלוקים
+    monkeypatch.undo()
+    watcher._block_receipts(range(1, 3))
+    assert watcher.block_receipts_supported is False